@@ -0,0 +1,52 @@
+"""
+Benchmark of checking GeoNode region codes against countries using
+Country.get_country_name_from_iso3 for every region compared with the
+precomputed CountryIndex used by GeoNodeToHDX.get_countries.
+
+Usage: python benchmarks/benchmark_countries.py [number of regions]
+"""
+import sys
+import timeit
+
+from hdx.location.country import Country
+
+from hdx.scraper.geonode.countryindex import CountryIndex
+
+
+def get_regions(number):
+    iso3s = list(Country.countriesdata(use_live=False)["countries"])
+    # Regional servers list many regions that are not countries
+    noncountries = ["SAF", "EAF", "WAF", "LAC", "MENA", "ASIA", "GLO"]
+    codes = iso3s + noncountries
+    return [codes[i % len(codes)] for i in range(number)]
+
+
+def before(regions):
+    return [Country.get_country_name_from_iso3(x) for x in regions]
+
+
+def after(regions):
+    return [CountryIndex.get_country_name(x) for x in regions]
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    regions = get_regions(number)
+    start = timeit.default_timer()
+    CountryIndex.get(use_live=False)
+    build_time = timeit.default_timer() - start
+    assert before(regions) == after(regions)
+    repeat = 100
+    before_time = timeit.timeit(lambda: before(regions), number=repeat)
+    after_time = timeit.timeit(lambda: after(regions), number=repeat)
+    print(f"Regions per listing: {number}")
+    print(f"One off index build: {build_time * 1000:.3f} ms")
+    print(
+        f"get_country_name_from_iso3: {before_time / repeat * 1000:.3f} ms per listing"
+    )
+    print(f"CountryIndex: {after_time / repeat * 1000:.3f} ms per listing")
+    print(f"Speed up: {before_time / after_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark of start-up time, as paid by each short lived process. Each case is
+timed in fresh Python processes: importing the scraper module alone, importing
+it along with the HDX modules it used to import eagerly (its start-up cost
+before they were deferred until first use) and constructing a GeoNodeToHDX
+object with the configuration parsed from YAML or loaded from a ConfigCache
+folder. Results are written as JSON so that runs can be compared.
+
+Usage: python benchmarks/benchmark_import.py [--repeat 10]
+    [--output results.json]
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from os import environ
+from typing import Dict, Optional
+
+from hdx.scraper.geonode import __version__
+
+eager_imports = (
+    "hdx.data.dataset",
+    "hdx.data.dataset_title_helper",
+    "hdx.data.organization",
+    "hdx.data.resource",
+    "hdx.data.showcase",
+    "hdx.location.country",
+    "hdx.utilities.downloader",
+    "hdx.utilities.loader",
+    "slugify",
+)
+
+cases = {
+    "import": "import hdx.scraper.geonode.geonodetohdx",
+    "import_eager": "import hdx.scraper.geonode.geonodetohdx\n"
+    + "\n".join(f"import {x}" for x in eager_imports),
+    "construct": "from hdx.scraper.geonode.geonodetohdx import GeoNodeToHDX\n"
+    "GeoNodeToHDX('http://xxx', None)",
+}
+
+template = """import time
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+"""
+
+
+def time_case(code: str, config_cache: Optional[str] = None) -> float:
+    env = dict(environ)
+    env.pop("HDX_GEONODE_CONFIG_CACHE", None)
+    if config_cache:
+        env["HDX_GEONODE_CONFIG_CACHE"] = config_cache
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", template.format(code=code)],
+        capture_output=True,
+        check=True,
+        env=env,
+        text=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def run(name: str, repeat: int, config_cache: Optional[str] = None) -> Dict:
+    code = cases[name.split(":")[0]]
+    # The first run may compile modules to bytecode or save the configuration
+    time_case(code, config_cache)
+    timings = [time_case(code, config_cache) for _ in range(repeat)]
+    return {
+        "median_seconds": statistics.median(timings),
+        "min_seconds": min(timings),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", default="benchmark_import.json")
+    args = parser.parse_args()
+    results = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "started": datetime.now(timezone.utc).isoformat(),
+        "cases": dict(),
+    }
+    with tempfile.TemporaryDirectory() as folder:
+        for name, config_cache in (
+            ("import", None),
+            ("import_eager", None),
+            ("construct", None),
+            ("construct:config_cache", folder),
+        ):
+            result = run(name, args.repeat, config_cache)
+            results["cases"][name] = result
+            print(f"{name}: {result['median_seconds'] * 1000:.1f} ms")
+    cases_results = results["cases"]
+    reduction = (
+        cases_results["import_eager"]["median_seconds"]
+        - cases_results["import"]["median_seconds"]
+    )
+    results["import_reduction_seconds"] = reduction
+    print(f"Import is {reduction * 1000:.1f} ms faster with deferred imports")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=1)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
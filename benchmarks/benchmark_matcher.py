@@ -0,0 +1,98 @@
+"""
+Micro-benchmark of KeywordMatcher.find on synthetic layer titles and abstracts.
+For each number of keywords, starting with the terms of the default title and
+abstract mapping and padded with made up terms, find is timed with keywords
+checked one by one (substring) and with the Aho-Corasick automaton, and with
+the default max_substring_keywords (chosen). Results are written as JSON so
+that runs can be compared and show where the automaton starts to pay off.
+
+Usage: python benchmarks/benchmark_matcher.py [--texts 2000] [--repeat 5]
+    [--output results.json]
+"""
+import argparse
+import json
+import platform
+import random
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from synthetic import get_countries, get_layers
+
+from hdx.scraper.geonode import __version__
+from hdx.scraper.geonode.geonodetohdx import GeoNodeToHDX
+from hdx.scraper.geonode.matcher import KeywordMatcher
+
+sizes = (10, 26, 50, 100, 150, 200, 400, 800, 1600)
+
+
+def get_terms(number: int) -> List[str]:
+    geonodetohdx = GeoNodeToHDX("http://xxx", None)
+    terms = sorted(set(geonodetohdx.compile_titleabstract_mapping().keywords))
+    rng = random.Random(1)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    while len(terms) < number:
+        length = rng.randint(4, 12)
+        terms.append("".join(rng.choice(letters) for _ in range(length)))
+    return terms[:number]
+
+
+def time_find(matcher: KeywordMatcher, texts: List[str], repeat: int) -> float:
+    timings = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            matcher.find(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings) / len(texts)
+
+
+def run(number: int, texts: List[str], repeat: int) -> Dict:
+    terms = get_terms(number)
+    matchers = {
+        "substring": KeywordMatcher(terms, max_substring_keywords=number),
+        "automaton": KeywordMatcher(terms, max_substring_keywords=0),
+        "chosen": KeywordMatcher(terms),
+    }
+    result = {
+        f"{name}_microseconds": time_find(matcher, texts, repeat) * 1000000
+        for name, matcher in matchers.items()
+    }
+    result["speedup"] = (
+        result["automaton_microseconds"] / result["chosen_microseconds"]
+    )
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="benchmark_matcher.json")
+    args = parser.parse_args()
+    layers = get_layers(args.texts, get_countries(10))
+    texts = [f"{x['title']} {x['abstract']}".lower() for x in layers]
+    results = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "started": datetime.now(timezone.utc).isoformat(),
+        "mean_text_length": sum(len(x) for x in texts) / len(texts),
+        "sizes": dict(),
+    }
+    for number in sizes:
+        result = run(number, texts, args.repeat)
+        results["sizes"][number] = result
+        print(
+            f"{number} keywords: "
+            f"substring {result['substring_microseconds']:.1f} us, "
+            f"automaton {result['automaton_microseconds']:.1f} us, "
+            f"chosen {result['chosen_microseconds']:.1f} us "
+            f"({result['speedup']:.1f}x automaton)"
+        )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=1)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Benchmark of the full pipeline against a local stub GeoNode API and a stub HDX
+using synthetic layers. For each number of layers, it measures get_layers for
+every country, generate_dataset_and_showcase for every layer and the whole of
+generate_datasets_and_showcases followed by delete_other_datasets, reporting
+layers per second, peak RSS and the per stage timings recorded by Metrics.
+Each number of layers is run in its own process so that its peak RSS is not
+that of an earlier, larger run. Results are written as JSON so that runs can be
+compared.
+
+Usage: python benchmarks/benchmark_pipeline.py [--layers 1000 10000 200000]
+    [--countries 50] [--page-size 1000] [--output results.json]
+"""
+import argparse
+import json
+import logging
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+from hdx.api.configuration import Configuration
+from hdx.api.locations import Locations
+from hdx.data.dataset import Dataset
+from hdx.data.resource import Resource
+from hdx.data.vocabulary import Vocabulary
+from hdx.location.country import Country
+from hdx.utilities.downloader import Download
+from stub_geonode import StubGeoNode
+from synthetic import get_countries, get_layers
+
+from hdx.scraper.geonode import __version__
+from hdx.scraper.geonode.countryindex import CountryIndex
+from hdx.scraper.geonode.geonodetohdx import GeoNodeToHDX
+from hdx.scraper.geonode.metrics import Metrics
+
+metadata = {
+    "maintainerid": "196196be-6037-4488-8b71-d786adf4c081",
+    "orgid": "bde18602-2e92-462a-8e88-a0018a7b13f9",
+    "orgname": "benchmark",
+}
+
+
+class StubHDX:
+    """
+    In memory stand in for the HDX API. Created datasets are serialised as they
+    would be for the HDX API and can be searched and deleted.
+    """
+
+    def __init__(self) -> None:
+        self.datasets: Dict[str, Dict] = dict()
+        self.bytes_sent = 0
+
+    def create_dataset_showcase(
+        self, dataset: Dataset, showcase: Any, **kwargs: Any
+    ) -> None:
+        resources = [x.data for x in dataset.get_resources()]
+        payload = dict(dataset.data, resources=resources)
+        self.bytes_sent += len(json.dumps(payload, default=str))
+        self.bytes_sent += len(json.dumps(showcase.data, default=str))
+        self.datasets[dataset["name"]] = {
+            "id": dataset["name"],
+            "name": dataset["name"],
+            "title": dataset["title"],
+            "maintainer": dataset["maintainer"],
+            "res_url": [x["url"] for x in dataset.get_resources()],
+        }
+
+    def call_remoteckan(self, action: str, data: Dict) -> Dict:
+        start = data["start"]
+        datasets = list(self.datasets.values())[start : start + data["rows"]]
+        return {
+            "count": len(self.datasets),
+            "results": [{x: y[x] for x in data["fl"]} for y in datasets],
+        }
+
+    def delete_from_hdx(self, dataset: Dataset) -> None:
+        del self.datasets[dataset["name"]]
+
+
+def setup_hdx(geonodetohdx: GeoNodeToHDX) -> None:
+    Configuration._create(hdx_read_only=True, user_agent="benchmark")
+    CountryIndex.get(use_live=False)
+    Locations.set_validlocations(
+        [
+            {"name": x.lower(), "title": x}
+            for x in Country.countriesdata(use_live=False)["countries"]
+        ]
+    )
+    Resource.set_formatsdict(
+        {"zipped shapefile": "shp", "shp": "shp", "geojson": "geojson"}
+    )
+    tags = {"geodata"}
+    tags.update(geonodetohdx.category_mapping.values())
+    for mapping in geonodetohdx.titleabstract_mapping.values():
+        if isinstance(mapping, dict):
+            for subtags in mapping.values():
+                tags.update(subtags)
+        else:
+            tags.update(mapping)
+    # Synthetic layers include the unmapped category Society
+    Vocabulary.set_tagsdict(
+        {"society": {"Action to Take": "delete", "New Tag(s)": ""}}
+    )
+    Vocabulary._approved_vocabulary = {
+        "id": "approved",
+        "name": "Topics",
+        "tags": [{"name": x} for x in tags],
+    }
+
+
+def get_peak_rss() -> int:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if platform.system() == "Darwin":
+        return peak
+    return peak * 1024
+
+
+def run(number: int, countries: int, page_size: int) -> Dict:
+    regions = get_countries(countries)
+    layers = get_layers(number, regions)
+    result = {"layers": number, "countries": countries}
+    with StubGeoNode(regions, layers) as stub_geonode:
+        with Download(user_agent="benchmark") as downloader:
+            metrics = Metrics()
+            geonodetohdx = GeoNodeToHDX(
+                stub_geonode.url, downloader, metrics=metrics
+            )
+            setup_hdx(geonodetohdx)
+            stub_hdx = StubHDX()
+            configuration = Configuration.read()
+            configuration.call_remoteckan = stub_hdx.call_remoteckan
+            try:
+                run_stages(
+                    geonodetohdx, stub_geonode, stub_hdx, page_size, result
+                )
+            finally:
+                # Restore the real HDX API call
+                del configuration.call_remoteckan
+    result["peak_rss_bytes"] = get_peak_rss()
+    return result
+
+
+def run_stages(
+    geonodetohdx: GeoNodeToHDX,
+    stub_geonode: StubGeoNode,
+    stub_hdx: StubHDX,
+    page_size: int,
+    result: Dict,
+) -> None:
+    metrics = geonodetohdx.metrics
+    start = time.perf_counter()
+    country_layers = dict()
+    for countrydata in geonodetohdx.get_countries():
+        country_layers[countrydata["iso3"]] = geonodetohdx.get_layers(
+            countrydata["layers"], page_size
+        )
+    elapsed = time.perf_counter() - start
+    fetched = sum(len(x) for x in country_layers.values())
+    result["get_layers"] = {
+        "seconds": elapsed,
+        "layers_per_second": fetched / elapsed,
+        "requests": stub_geonode.requests,
+    }
+
+    # Date parsing imports quantulum3 and its en_US parser lazily the first time
+    # a title is parsed for dates, so warm up with a layer that isn't ignored,
+    # as ignored layers are never parsed, and whose title has a date to keep
+    # that import out of the timings
+    countryiso, layers = next(iter(country_layers.items()))
+    layer = next(x for x in layers if not geonodetohdx.get_ignored_terms(x))
+    layer = dict(layer)
+    layer["title"] = f"{layer['title']} (2020)"
+    geonodetohdx.generate_dataset_and_showcase(
+        countryiso, layer, metadata, get_date_from_title=True
+    )
+    start = time.perf_counter()
+    for countryiso, layers in country_layers.items():
+        for layer in layers:
+            geonodetohdx.generate_dataset_and_showcase(
+                countryiso, layer, metadata, get_date_from_title=True
+            )
+    elapsed = time.perf_counter() - start
+    result["generate_dataset_and_showcase"] = {
+        "seconds": elapsed,
+        "layers_per_second": fetched / elapsed,
+    }
+    del country_layers
+    metrics.clear()
+
+    start = time.perf_counter()
+    names = geonodetohdx.generate_datasets_and_showcases(
+        metadata,
+        create_dataset_showcase=stub_hdx.create_dataset_showcase,
+        get_date_from_title=True,
+        page_size=page_size,
+    )
+    elapsed = time.perf_counter() - start
+    result["generate_datasets_and_showcases"] = {
+        "seconds": elapsed,
+        "layers_per_second": fetched / elapsed,
+        "datasets": len(names),
+        "bytes_sent": stub_hdx.bytes_sent,
+    }
+
+    # Keep 90% so that the rest are deleted
+    start = time.perf_counter()
+    summary = geonodetohdx.delete_other_datasets(
+        names[: len(names) * 9 // 10],
+        metadata,
+        delete_from_hdx=stub_hdx.delete_from_hdx,
+    )
+    result["delete_other_datasets"] = {
+        "seconds": time.perf_counter() - start,
+        "deleted": len(summary["deleted"]),
+    }
+    result["stages"] = metrics.get_summary()
+
+
+def run_in_process(number: int, countries: int, page_size: int) -> Dict:
+    # ru_maxrss is the peak of the whole process so each run needs its own
+    output = subprocess.run(
+        [
+            sys.executable,
+            __file__,
+            "--single",
+            "--layers",
+            str(number),
+            "--countries",
+            str(countries),
+            "--page-size",
+            str(page_size),
+        ],
+        check=True,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--layers", type=int, nargs="+", default=[1000])
+    parser.add_argument("--countries", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--output", default="benchmark_pipeline.json")
+    parser.add_argument(
+        "--single", action="store_true", help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    if args.single:
+        result = run(args.layers[0], args.countries, args.page_size)
+        print(json.dumps(result))
+        return
+    results = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "started": datetime.now(timezone.utc).isoformat(),
+        "runs": list(),
+    }
+    for number in args.layers:
+        result = run_in_process(number, args.countries, args.page_size)
+        results["runs"].append(result)
+        print(
+            f"{number} layers: get_layers {result['get_layers']['layers_per_second']:.0f}/s, "
+            f"generate_dataset_and_showcase {result['generate_dataset_and_showcase']['layers_per_second']:.0f}/s, "
+            f"generate_datasets_and_showcases {result['generate_datasets_and_showcases']['layers_per_second']:.0f}/s, "
+            f"peak RSS {result['peak_rss_bytes'] / 1048576:.0f} MB"
+        )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=1)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Local stub GeoNode API for benchmarks serving /api/regions and /api/layers with
+regions__code__in filtering and limit/offset paging like the tastypie API of
+GeoNode.
+"""
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Any, Dict, List
+from urllib.parse import parse_qsl, urlsplit
+
+
+class StubGeoNode:
+    """
+    GeoNode API served from memory on a local port in a background thread. Can
+    be used as a context manager which stops the server on exit.
+
+    Args:
+        regions (List[Dict]): GeoNode regions
+        layers (List[Dict]): GeoNode layers
+    """
+
+    def __init__(self, regions: List[Dict], layers: List[Dict]) -> None:
+        self.regions = regions
+        self.layers = layers
+        uris = {x["resource_uri"]: x["code"] for x in regions}
+        self.region_layers: Dict[str, List[Dict]] = dict()
+        for layer in layers:
+            for region in layer["regions"]:
+                if isinstance(region, dict):
+                    code = region["code"]
+                else:
+                    code = uris[region]
+                self.region_layers.setdefault(code, list()).append(layer)
+        for region in regions:
+            region["count"] = len(self.region_layers.get(region["code"], ()))
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                stub.requests += 1
+                body = json.dumps(stub.get_response(self.path)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def get_response(self, path: str) -> Dict:
+        parts = urlsplit(path)
+        if parts.path.rstrip("/") == "/api/regions":
+            return {
+                "meta": {"total_count": len(self.regions)},
+                "objects": self.regions,
+            }
+        query = dict(parse_qsl(parts.query))
+        code = query.get("regions__code__in")
+        if code is None:
+            layers = self.layers
+        else:
+            layers = self.region_layers.get(code, list())
+        if "limit" not in query:
+            return {"meta": {"total_count": len(layers)}, "objects": layers}
+        limit = int(query["limit"])
+        offset = int(query.get("offset", 0))
+        if offset + limit < len(layers):
+            region = f"regions__code__in={code}&" if code else ""
+            next = (
+                f"/api/layers/?{region}limit={limit}&offset={offset + limit}"
+            )
+        else:
+            next = None
+        return {
+            "meta": {
+                "limit": limit,
+                "next": next,
+                "offset": offset,
+                "total_count": len(layers),
+            },
+            "objects": layers[offset : offset + limit],
+        }
+
+    def start(self) -> "StubGeoNode":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "StubGeoNode":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
@@ -0,0 +1,155 @@
+"""
+Synthetic GeoNode payloads for benchmarks. Layers have varied titles with and
+without dates, abstracts that trigger the ignore list and title/abstract tag
+mapping, categories from the default configuration, remote GeoNode hosts in
+some detail urls and repeated titles with different dates so that the
+deduplication path is exercised.
+"""
+import random
+from typing import Dict, List
+
+from hdx.location.country import Country
+
+topics = [
+    "Administrative Boundaries",
+    "Roads",
+    "Airports",
+    "Health Facilities",
+    "Schools",
+    "Land Cover",
+    "Forest Loss",
+    "Flood Extent",
+    "Drought Index",
+    "Landslide Susceptibility",
+    "Food Distribution Points",
+    "IDP Camps",
+    "Refugee Settlements",
+    "Malnutrition Prevalence",
+    "Populated Places",
+    "River Network",
+    "Emergency Levels",
+    "Livelihood Zones",
+]
+categories = [
+    "Elevation",
+    "Boundaries",
+    "Location",
+    "Transportation",
+    "Structure",
+    "Environment",
+    "Inland Waters",
+    "Physical Features, Land Cover, Land Use, DEM",
+    "Farming",
+    "Natural Hazards",
+    "Society",
+    None,
+]
+abstracts = [
+    "This layer contains {topic} for {country}.",
+    "Layer showing {topic} in {country} compiled from field surveys and "
+    "partner reports. Includes camp and shelter locations where relevant.",
+    "{topic} of {country} derived from satellite imagery. Used for drought "
+    "and flood monitoring and food security analysis.",
+    "Deprecated: {topic} for {country}. Superseded by a newer layer.",
+    "Dataset of {topic}, {country}. Source: national mapping agency.",
+]
+remote_hosts = ["ogcserver.gis.wfp.org", "geoserver.example.org"]
+
+
+def get_countries(number: int) -> List[Dict]:
+    """
+    Get GeoNode regions including some that are not countries
+
+    Args:
+        number (int): Number of country regions
+
+    Returns:
+        List[Dict]: GeoNode regions
+    """
+    iso3s = sorted(Country.countriesdata(use_live=False)["countries"])
+    regions = list()
+    for i, iso3 in enumerate(iso3s[:number]):
+        regions.append(
+            {
+                "code": iso3,
+                "count": 1,
+                "id": i + 1,
+                "name_en": iso3,
+                "resource_uri": f"/api/regions/{i + 1}/",
+            }
+        )
+    for i, code in enumerate(("SAF", "EAF", "WAF", "GLO")):
+        regions.append(
+            {
+                "code": code,
+                "count": 1,
+                "id": 1000 + i,
+                "name_en": code,
+                "resource_uri": f"/api/regions/{1000 + i}/",
+            }
+        )
+    return regions
+
+
+def get_layers(number: int, regions: List[Dict], seed: int = 1) -> List[Dict]:
+    """
+    Get synthetic GeoNode layers spread over the country regions
+
+    Args:
+        number (int): Number of layers
+        regions (List[Dict]): GeoNode regions from get_countries
+        seed (int): Random seed. Defaults to 1.
+
+    Returns:
+        List[Dict]: GeoNode layers
+    """
+    rng = random.Random(seed)
+    countries = [x for x in regions if len(x["code"]) == 3]
+    layers = list()
+    for i in range(number):
+        country = countries[i % len(countries)]
+        topic = rng.choice(topics)
+        # Reuse a small set of topic variants so that some titles repeat with
+        # different dates
+        variant = rng.randrange(max(1, number // len(countries) // 3))
+        title = f"{country['code']} {topic} {variant}"
+        kind = rng.random()
+        if kind < 0.4:
+            start = rng.randint(1990, 2020)
+            title = f"{title}, {start}-{start + rng.randint(0, 5)}"
+        elif kind < 0.6:
+            title = f"{title} ({rng.randint(1990, 2023)})"
+        name = (
+            f"{country['code'].lower()}_{topic.lower().replace(' ', '_')}_{i}"
+        )
+        if rng.random() < 0.1:
+            host = rng.choice(remote_hosts)
+            detail_url = f"/layers/{host}%3Ageonode%3A{name}"
+        else:
+            detail_url = f"/layers/geonode%3A{name}"
+        regions_field = [country["resource_uri"]]
+        if rng.random() < 0.2:
+            regions_field.append({"code": "SAF"})
+        layers.append(
+            {
+                "abstract": rng.choice(abstracts).format(
+                    topic=topic, country=country["name_en"]
+                ),
+                "category__gn_description": rng.choice(categories),
+                "date": f"{rng.randint(2010, 2023)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T12:00:00",
+                "detail_url": detail_url,
+                "id": i + 1,
+                "regions": regions_field,
+                "srid": rng.choice(("EPSG:4326", "EPSG:3857")),
+                "supplemental_information": rng.choice(
+                    (
+                        "No information provided",
+                        "Contact the GIS unit for details.",
+                    )
+                ),
+                "thumbnail_url": f"https://geonode.example.org/uploaded/thumbs/{name}.png",
+                "title": title,
+                "uuid": f"00000000-0000-0000-0000-{i:012d}",
+            }
+        )
+    return layers
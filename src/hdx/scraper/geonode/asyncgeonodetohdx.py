@@ -0,0 +1,213 @@
+"""
+Asyncio GeoNode Utilities:
+--------------------------
+
+Reads from GeoNode servers and creates datasets on an asyncio event loop.
+
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from hdx.utilities.uuid import get_uuid
+
+from . import __version__
+from .geonodetohdx import GeoNodeToHDX, create_dataset_showcase
+from .metrics import Metrics
+
+if TYPE_CHECKING:
+    from hdx.data.dataset import Dataset
+    from hdx.data.showcase import Showcase
+    from hdx.utilities.downloader import Download
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncGeoNodeToHDX:
+    """
+    Asyncio counterpart of GeoNodeToHDX. It wraps a GeoNodeToHDX object, kept
+    in geonodetohdx so that its synchronous methods can still be called, and
+    provides get_countries, get_layers and generate_datasets_and_showcases as
+    coroutines so that many GeoNode servers can be driven from one event loop.
+    It is a facade over a thread pool: the Download object and the HDX API are
+    blocking so their calls are run in a thread pool of max_concurrency
+    threads. Each thread downloads with its own copy of the Download object,
+    sharing its connection pool, as the wrapped GeoNodeToHDX wraps it in a
+    ThreadLocalDownload. Call close, or use the object as an async context
+    manager, to shut the thread pool down. Requires Python 3.7 or later.
+
+    Args:
+        geonode_url (str): GeoNode server url
+        downloader (Download): Download object from HDX Python Utilities
+        hdx_geonode_config_yaml (Optional[str]): Configuration file for scraper
+        max_concurrency (int): Maximum number of GeoNode requests and HDX uploads in progress at once. Defaults to 10.
+        metrics (Optional[Metrics]): Metrics to record counters and timings in. Defaults to None (new Metrics).
+    """
+
+    def __init__(
+        self,
+        geonode_url: str,
+        downloader: "Download",
+        hdx_geonode_config_yaml: Optional[str] = None,
+        max_concurrency: int = 10,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.geonodetohdx = GeoNodeToHDX(
+            geonode_url, downloader, hdx_geonode_config_yaml, metrics
+        )
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    async def __aenter__(self) -> "AsyncGeoNodeToHDX":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Shut down thread pool waiting for calls in progress to finish
+
+        Returns:
+            None
+        """
+        self.executor.shutdown(wait=True)
+
+    async def run_blocking(
+        self, function: Callable, *args: Any, **kwargs: Any
+    ) -> Any:
+        """
+        Run blocking function in thread pool. Calls beyond max_concurrency wait
+        for a thread to be free.
+
+        Args:
+            function (Callable): Function to run
+            *args: Positional arguments to pass to function
+            **kwargs: Keyword arguments to pass to function
+
+        Returns:
+            Any: Return value of function
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, partial(function, *args, **kwargs)
+        )
+
+    async def get_countries(self, use_count: bool = True) -> List[Dict]:
+        """
+        Get countries from GeoNode
+
+        Args:
+            use_count (bool): Whether to use null count metadata to exclude countries. Defaults to True.
+
+        Returns:
+            List[Dict]: List of countries in form (iso3 code, name)
+
+        """
+        return await self.run_blocking(
+            self.geonodetohdx.get_countries, use_count
+        )
+
+    async def get_layers(
+        self, countryiso: Optional[str] = None, page_size: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Get layers from GeoNode optionally for a particular country
+
+        Args:
+            countryiso (Optional[str]): ISO 3 code of country from which to get layers. Defaults to None (all countries).
+            page_size (Optional[int]): Number of layers to request per page. Defaults to None (no paging).
+
+        Returns:
+            List[Dict]: List of layers
+        """
+        return await self.run_blocking(
+            self.geonodetohdx.get_layers, countryiso, page_size
+        )
+
+    async def generate_datasets_and_showcases(
+        self,
+        metadata: Dict,
+        create_dataset_showcase: Callable[
+            ["Dataset", "Showcase", Any], None
+        ] = create_dataset_showcase,
+        countrydata: Dict[str, Optional[str]] = None,
+        get_date_from_title: bool = False,
+        process_dataset_name: Callable[[str], str] = lambda x: x,
+        dataset_tags_mapping: Dict[str, List] = dict(),
+        page_size: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """
+        Generate datasets and showcases for all GeoNode layers. Layers for all
+        countries are requested concurrently, then planned with plan_uploads in
+        the thread pool so that each dataset name is uploaded once from its
+        newest layer, and the datasets are built and uploaded concurrently. The
+        plan is kept in the upload_plan of the wrapped GeoNodeToHDX object.
+
+        Args:
+            metadata (Dict): Dictionary containing keys: maintainerid, orgid, updatefreq, subnational
+            create_dataset_showcase (Callable[["Dataset", "Showcase", Any], None]): Function to call to create dataset and showcase
+            countrydata (Dict[str, Optional[str]]): Dictionary of countrydata. Defaults to None (read from GeoNode).
+            get_date_from_title (bool): Whether to remove dates from title. Defaults to False.
+            process_dataset_name (Callable[[str], str]): Function to change the dataset name. Defaults to lambda x: x.
+            dataset_tags_mapping (Dict[str, List]): Mapping from dataset name to additional tags. Defaults to empty dictionary.
+            page_size (Optional[int]): Number of layers to request per page. Defaults to None (no paging).
+            **kwargs: Args to pass to dataset create_in_hdx call
+
+        Returns:
+            List[str]: List of names of datasets added or updated
+
+        """
+        logger.info("--------------------------------------------------")
+        logger.info(f"> Using HDX Python GeoNode Library {__version__}")
+        if countrydata:
+            countries = [countrydata]
+        else:
+            countries = await self.get_countries()
+            logger.info(f"Number of countries: {len(countries)}")
+        if "batch" not in kwargs:
+            kwargs["batch"] = get_uuid()
+        countries_layers = await asyncio.gather(
+            *[
+                self.get_layers(country["layers"], page_size)
+                for country in countries
+            ]
+        )
+        # Organisation lookups and title parsing are blocking
+        plan = await self.run_blocking(
+            self.geonodetohdx.plan_uploads,
+            zip(countries, countries_layers),
+            metadata,
+            get_date_from_title,
+            process_dataset_name,
+        )
+        self.geonodetohdx.upload_plan = plan
+        country_winners = plan.get_country_winners()
+        for countrydata in countries:
+            winners = country_winners.get(countrydata["iso3"], list())
+            logger.info(
+                f'Number of datasets to upload in {countrydata["name"]}: {len(winners)}'
+            )
+        metrics = self.geonodetohdx.metrics
+
+        async def upload(planned):
+            try:
+                await self.run_blocking(
+                    self.geonodetohdx.create_from_record,
+                    planned.record,
+                    metadata,
+                    create_dataset_showcase,
+                    dataset_tags_mapping,
+                    **kwargs,
+                )
+            finally:
+                planned.release()
+            metrics.increment("layers_written")
+
+        await asyncio.gather(
+            *[upload(planned) for planned in plan.winners.values()]
+        )
+        return plan.get_names()
@@ -0,0 +1,528 @@
+"""
+HTTP Cache Utilities:
+---------------------
+
+On disk caches of GeoNode API responses that wrap a Download object.
+
+"""
+import hashlib
+import json
+import logging
+import time
+from contextlib import contextmanager
+from os import makedirs, remove, replace
+from os.path import exists, join
+from threading import RLock
+from typing import Any, Dict, Iterator, Optional
+
+from hdx.utilities.downloader import Download, DownloadError
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse:
+    """
+    Response served from a cache offering the parts of requests.Response used
+    with GeoNode API responses
+
+    Args:
+        url (str): Url of response
+        content (bytes): Body of response
+        headers (Optional[Dict]): Headers of response. Defaults to None.
+    """
+
+    status_code = 200
+
+    def __init__(
+        self, url: str, content: bytes, headers: Optional[Dict] = None
+    ) -> None:
+        self.url = url
+        self.content = content
+        self.headers = headers or dict()
+
+    @property
+    def text(self) -> str:
+        """
+        Get body of response as text
+
+        Returns:
+            str: Body of response decoded as UTF-8
+        """
+        return self.content.decode("utf-8")
+
+    def json(self) -> Any:
+        """
+        Get body of response as JSON
+
+        Returns:
+            Any: Body of response parsed as JSON
+        """
+        return json.loads(self.content)
+
+
+class DiskStore:
+    """
+    Store of url keyed response bodies and metadata in a folder. Entries are
+    evicted least recently used first when there are more than max_entries or
+    their bodies total more than max_size bytes.
+
+    Times entries were last used are saved with the index every save_every
+    uses and by flush. Several processes can share a folder: the index is
+    saved under a lock on a file in the folder (on platforms with fcntl) after
+    merging in the entries other processes have saved.
+
+    Args:
+        folder (str): Folder in which to store responses. Created if it doesn't exist.
+        max_entries (Optional[int]): Maximum number of entries. Defaults to None (no maximum).
+        max_size (Optional[int]): Maximum total size of bodies in bytes. Defaults to None (no maximum).
+        save_every (int): Number of uses of entries after which the index is saved. Defaults to 100.
+    """
+
+    index_filename = "index.json"
+    lock_filename = "index.lock"
+
+    def __init__(
+        self,
+        folder: str,
+        max_entries: Optional[int] = None,
+        max_size: Optional[int] = None,
+        save_every: int = 100,
+    ) -> None:
+        self.folder = folder
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.save_every = save_every
+        self.lock = RLock()
+        self.index_locked = False
+        makedirs(folder, exist_ok=True)
+        self.index_path = join(folder, self.index_filename)
+        self.lock_path = join(folder, self.lock_filename)
+        self.index: Dict[str, Dict] = self.load_index()
+        # Keys deleted since the index was last saved mapped to when
+        self.deleted: Dict[str, float] = dict()
+        self.unsaved_uses = 0
+
+    @staticmethod
+    def get_key(url: str) -> str:
+        """
+        Get key of entry for url
+
+        Args:
+            url (str): Url
+
+        Returns:
+            str: Key of entry
+        """
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def get_body_path(self, key: str) -> str:
+        """
+        Get path of file holding body of entry
+
+        Args:
+            key (str): Key of entry
+
+        Returns:
+            str: Path of body file
+        """
+        return join(self.folder, f"{key}.body")
+
+    def load_index(self) -> Dict[str, Dict]:
+        """
+        Load saved index of entries
+
+        Returns:
+            Dict[str, Dict]: Saved index or empty dictionary if there is none
+        """
+        if not exists(self.index_path):
+            return dict()
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except ValueError:
+            logger.warning(f"Ignoring corrupt cache index in {self.folder}!")
+            return dict()
+
+    @contextmanager
+    def lock_index(self) -> Iterator[None]:
+        """
+        Context manager holding the lock on the index for this process and, where
+        fcntl is available, the lock file shared with other processes. It can be
+        entered again while held.
+
+        Returns:
+            Iterator[None]: Context in which index is locked
+        """
+        with self.lock:
+            if self.index_locked:
+                yield
+                return
+            with open(self.lock_path, "a") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                self.index_locked = True
+                try:
+                    yield
+                finally:
+                    self.index_locked = False
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+    def merge_index(self) -> None:
+        """
+        Merge entries saved by other processes into index. The most recently
+        stored version of an entry is kept with the latest time it was used.
+        Entries deleted by this process stay deleted unless they have been
+        stored again since and entries whose bodies another process has evicted
+        are dropped. Must be called with the index locked.
+
+        Returns:
+            None
+        """
+        saved_index = self.load_index()
+        for key in list(self.index):
+            if key not in saved_index and not exists(self.get_body_path(key)):
+                del self.index[key]
+        for key, saved in saved_index.items():
+            deleted = self.deleted.get(key)
+            if deleted is not None and saved["stored"] <= deleted:
+                continue
+            entry = self.index.get(key)
+            if entry is None or saved["stored"] > entry["stored"]:
+                self.index[key] = saved
+            elif saved["last_used"] > entry["last_used"]:
+                entry["last_used"] = saved["last_used"]
+
+    def save_index(self) -> None:
+        """
+        Merge in entries saved by other processes, evict entries if needed and
+        save index of entries atomically
+
+        Returns:
+            None
+        """
+        with self.lock_index():
+            self.merge_index()
+            self.evict()
+            temp_path = f"{self.index_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.index, f)
+            replace(temp_path, self.index_path)
+            self.deleted = dict()
+            self.unsaved_uses = 0
+
+    def flush(self) -> None:
+        """
+        Save index if any entries have been used since it was last saved
+
+        Returns:
+            None
+        """
+        with self.lock:
+            if self.unsaved_uses:
+                self.save_index()
+
+    def get(self, url: str) -> Optional[Dict]:
+        """
+        Get metadata of entry for url marking it as recently used
+
+        Args:
+            url (str): Url
+
+        Returns:
+            Optional[Dict]: Metadata of entry or None if url isn't in store
+        """
+        with self.lock:
+            entry = self.index.get(self.get_key(url))
+            if entry is not None:
+                entry["last_used"] = time.time()
+                self.unsaved_uses += 1
+                if self.unsaved_uses >= self.save_every:
+                    self.save_index()
+            return entry
+
+    def get_body(self, url: str) -> Optional[bytes]:
+        """
+        Get body of entry for url
+
+        Args:
+            url (str): Url
+
+        Returns:
+            Optional[bytes]: Body of entry or None if it is missing
+        """
+        path = self.get_body_path(self.get_key(url))
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, url: str, body: bytes, **metadata: Any) -> None:
+        """
+        Store body and metadata for url evicting old entries if needed
+
+        Args:
+            url (str): Url
+            body (bytes): Body of response
+            **metadata: Metadata to store with entry
+
+        Returns:
+            None
+        """
+        key = self.get_key(url)
+        with self.lock:
+            with open(self.get_body_path(key), "wb") as f:
+                f.write(body)
+            now = time.time()
+            metadata.update(
+                {
+                    "url": url,
+                    "size": len(body),
+                    "stored": now,
+                    "last_used": now,
+                }
+            )
+            self.index[key] = metadata
+            self.deleted.pop(key, None)
+            self.save_index()
+
+    def delete_entry(self, key: str) -> None:
+        """
+        Delete entry and its body file
+
+        Args:
+            key (str): Key of entry
+
+        Returns:
+            None
+        """
+        del self.index[key]
+        self.deleted[key] = time.time()
+        try:
+            remove(self.get_body_path(key))
+        except OSError:
+            pass
+
+    def evict(self) -> None:
+        """
+        Evict least recently used entries while there are too many or they are too
+        big
+
+        Returns:
+            None
+        """
+        if self.max_entries is None and self.max_size is None:
+            return
+        with self.lock:
+            keys = sorted(self.index, key=lambda x: self.index[x]["last_used"])
+            entries = len(keys)
+            size = sum(entry["size"] for entry in self.index.values())
+            for key in keys:
+                too_many = self.max_entries is not None and (
+                    entries > self.max_entries
+                )
+                too_big = self.max_size is not None and size > self.max_size
+                if not too_many and not too_big:
+                    break
+                size -= self.index[key]["size"]
+                entries -= 1
+                self.delete_entry(key)
+
+    def clear(self) -> None:
+        """
+        Delete all entries
+
+        Returns:
+            None
+        """
+        with self.lock_index():
+            self.index = self.load_index()
+            for key in list(self.index):
+                self.delete_entry(key)
+            self.save_index()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+class ConditionalGetCache:
+    """
+    Wrapper around a Download object that can be passed to GeoNodeToHDX in its
+    place. Response bodies are stored on disk with their ETag and Last-Modified
+    validators. Later requests for the same url send If-None-Match and
+    If-Modified-Since and reuse the stored body if the server responds with 304 Not
+    Modified. hits counts reused responses and misses counts full downloads.
+
+    Args:
+        downloader (Download): Download object from HDX Python Utilities
+        folder (str): Folder in which to store responses
+        max_entries (Optional[int]): Maximum number of stored responses. Defaults to 1000.
+    """
+
+    def __init__(
+        self,
+        downloader: Download,
+        folder: str,
+        max_entries: Optional[int] = 1000,
+    ) -> None:
+        self.downloader = downloader
+        self.store = DiskStore(folder, max_entries)
+        self.hits = 0
+        self.misses = 0
+
+    def download(self, url: str, **kwargs: Any) -> Any:
+        """
+        Download url, reusing the stored body if the server says it is unchanged
+
+        Args:
+            url (str): Url to download
+            **kwargs: Other arguments to pass to downloader's download method
+
+        Returns:
+            Any: Response object
+        """
+        entry = self.store.get(url)
+        headers = dict(kwargs.pop("headers", None) or dict())
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        response = self.downloader.download(url, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            body = self.store.get_body(url)
+            if body is not None:
+                with self.store.lock:
+                    self.hits += 1
+                return CachedResponse(url, body, response.headers)
+            # Body has gone so download without validators
+            headers.pop("If-None-Match", None)
+            headers.pop("If-Modified-Since", None)
+            response = self.downloader.download(url, headers=headers, **kwargs)
+        with self.store.lock:
+            self.misses += 1
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self.store.put(
+                url,
+                response.content,
+                etag=etag,
+                last_modified=last_modified,
+            )
+        return response
+
+    def flush(self) -> None:
+        """
+        Save when stored responses were last used
+
+        Returns:
+            None
+        """
+        self.store.flush()
+
+    def clear(self) -> None:
+        """
+        Delete all stored responses and reset counters
+
+        Returns:
+            None
+        """
+        self.store.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class ResponseCache:
+    """
+    Opt-in wrapper around a Download object that can be passed to GeoNodeToHDX in
+    its place. Responses are stored on disk keyed by url and served from there
+    without touching the network until they are older than ttl seconds. The least
+    recently used responses are evicted once their total size exceeds max_size
+    bytes. In replay only mode, responses are only ever served from the cache and
+    a url that isn't cached is an error, giving deterministic offline replays. hits
+    counts responses served from the cache and misses counts downloads.
+
+    Args:
+        downloader (Optional[Download]): Download object from HDX Python Utilities. Can be None in replay only mode.
+        folder (str): Folder in which to store responses
+        ttl (Optional[float]): Seconds for which a stored response is used. Defaults to None (forever).
+        max_size (Optional[int]): Maximum total size of stored responses in bytes. Defaults to None (no maximum).
+        replay_only (bool): Whether to only serve responses from the cache. Defaults to False.
+    """
+
+    def __init__(
+        self,
+        downloader: Optional[Download],
+        folder: str,
+        ttl: Optional[float] = None,
+        max_size: Optional[int] = None,
+        replay_only: bool = False,
+    ) -> None:
+        self.downloader = downloader
+        self.store = DiskStore(folder, max_size=max_size)
+        self.ttl = ttl
+        self.replay_only = replay_only
+        self.hits = 0
+        self.misses = 0
+
+    def download(self, url: str, **kwargs: Any) -> Any:
+        """
+        Download url or serve it from the cache if it is there and not expired
+
+        Args:
+            url (str): Url to download
+            **kwargs: Other arguments to pass to downloader's download method
+
+        Returns:
+            Any: Response object
+        """
+        entry = self.store.get(url)
+        if entry is not None:
+            fresh = (
+                self.ttl is None or time.time() - entry["stored"] < self.ttl
+            )
+            if fresh or self.replay_only:
+                body = self.store.get_body(url)
+                if body is not None:
+                    with self.store.lock:
+                        self.hits += 1
+                    return CachedResponse(url, body, entry.get("headers"))
+        if self.replay_only:
+            raise DownloadError(f"{url} is not in cache {self.store.folder}!")
+        response = self.downloader.download(url, **kwargs)
+        with self.store.lock:
+            self.misses += 1
+        headers = {
+            x: response.headers[x]
+            for x in ("Content-Type", "ETag", "Last-Modified")
+            if x in response.headers
+        }
+        self.store.put(url, response.content, headers=headers)
+        return response
+
+    def flush(self) -> None:
+        """
+        Save when stored responses were last used
+
+        Returns:
+            None
+        """
+        self.store.flush()
+
+    def clear(self) -> None:
+        """
+        Delete all stored responses and reset counters
+
+        Returns:
+            None
+        """
+        self.store.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,85 @@
+"""
+Checkpoint:
+-----------
+
+Records the progress of a generate_datasets_and_showcases run so that it can be
+resumed after a crash.
+
+"""
+import json
+import logging
+from os import remove, replace
+from os.path import exists
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Checkpoint:
+    """
+    JSON file holding the countries whose layers have all been pushed to HDX, the
+    batch id and the GeoNode server urls discovered so far. It is written
+    atomically so that a crash while saving leaves the previous checkpoint
+    intact.
+
+    Args:
+        path (str): Path to checkpoint file
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def load(self) -> Optional[Dict]:
+        """
+        Load checkpoint if there is one. The returned dictionary has keys
+        countries (list of ISO3 codes), batch and geonode_urls.
+
+        Returns:
+            Optional[Dict]: Checkpoint or None if there is no checkpoint
+        """
+        if not exists(self.path):
+            return None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except ValueError:
+            logger.warning(f"Ignoring corrupt checkpoint {self.path}!")
+            return None
+        return checkpoint
+
+    def save(
+        self,
+        countries: Iterable[str],
+        batch: str,
+        geonode_urls: List[str],
+    ) -> None:
+        """
+        Save checkpoint
+
+        Args:
+            countries (Iterable[str]): ISO3 codes of countries that are done
+            batch (str): Batch id of run
+            geonode_urls (List[str]): GeoNode server urls
+
+        Returns:
+            None
+        """
+        checkpoint = {
+            "countries": list(countries),
+            "batch": batch,
+            "geonode_urls": list(geonode_urls),
+        }
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+        replace(temp_path, self.path)
+
+    def delete(self) -> None:
+        """
+        Delete checkpoint if there is one
+
+        Returns:
+            None
+        """
+        if exists(self.path):
+            remove(self.path)
@@ -0,0 +1,196 @@
+"""
+HDX Comparison Utilities:
+-------------------------
+
+Compares generated datasets and showcases with those in HDX so that only those
+that differ are written.
+
+"""
+import logging
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Type
+
+if TYPE_CHECKING:
+    from hdx.data.dataset import Dataset
+    from hdx.data.showcase import Showcase
+
+logger = logging.getLogger(__name__)
+
+dataset_fields = (
+    "title",
+    "notes",
+    "dataset_date",
+    "maintainer",
+    "owner_org",
+    "data_update_frequency",
+    "subnational",
+)
+resource_fields = ("name", "url", "description", "format")
+showcase_fields = ("title", "notes", "url", "image_url")
+
+
+def normalise_tags(tags: Optional[List[Dict]]) -> List[str]:
+    """
+    Normalise tags to a sorted list of tag names
+
+    Args:
+        tags (Optional[List[Dict]]): Tags as stored in dataset or showcase
+
+    Returns:
+        List[str]: Sorted list of tag names
+    """
+    if not tags:
+        return list()
+    return sorted(tag["name"] for tag in tags)
+
+
+def normalise_value(value: Any) -> Any:
+    """
+    Normalise a field value so that values stored differently by HDX compare equal
+
+    Args:
+        value (Any): Field value
+
+    Returns:
+        Any: Normalised value
+    """
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, bool):
+        return str(int(value))
+    return str(value)
+
+
+def normalise_dataset(dataset: "Dataset") -> Dict:
+    """
+    Normalise the fields of a dataset that the scraper sets: notes, tags,
+    resources and their urls, dates, maintainer, organisation, locations and
+    update frequency
+
+    Args:
+        dataset (Dataset): Dataset to normalise
+
+    Returns:
+        Dict: Normalised dataset
+    """
+    normalised = {x: normalise_value(dataset.get(x)) for x in dataset_fields}
+    normalised["tags"] = normalise_tags(dataset.get("tags"))
+    normalised["groups"] = sorted(
+        group["name"].lower() for group in dataset.get("groups", list())
+    )
+    resources = list()
+    for resource in dataset.get_resources():
+        normalised_resource = {
+            x: normalise_value(resource.get(x)) for x in resource_fields
+        }
+        normalised_resource["format"] = normalised_resource["format"].lower()
+        resources.append(normalised_resource)
+    normalised["resources"] = resources
+    return normalised
+
+
+def normalise_showcase(showcase: "Showcase") -> Dict:
+    """
+    Normalise the fields of a showcase that the scraper sets: title, notes, urls
+    and tags
+
+    Args:
+        showcase (Showcase): Showcase to normalise
+
+    Returns:
+        Dict: Normalised showcase
+    """
+    normalised = {x: normalise_value(showcase.get(x)) for x in showcase_fields}
+    normalised["tags"] = normalise_tags(showcase.get("tags"))
+    return normalised
+
+
+def get_differences(generated: Dict, existing: Dict) -> List[str]:
+    """
+    Get the keys whose values differ between two normalised objects
+
+    Args:
+        generated (Dict): Normalised generated object
+        existing (Dict): Normalised existing object
+
+    Returns:
+        List[str]: Keys whose values differ
+    """
+    return [x for x in generated if generated[x] != existing.get(x)]
+
+
+def create_changed_dataset_showcase(
+    dataset: "Dataset",
+    showcase: "Showcase",
+    datasetclass: Optional[Type] = None,
+    showcaseclass: Optional[Type] = None,
+    **kwargs: Any,
+) -> Dict[str, str]:
+    """
+    Create or update dataset and showcase only if they differ from those in HDX.
+    Can be passed to generate_datasets_and_showcases instead of
+    create_dataset_showcase. The decision for each of dataset and showcase is one
+    of created, updated or unchanged.
+
+    Args:
+        dataset (Dataset): Dataset to create
+        showcase (Showcase): Showcase to create
+        datasetclass (Optional[Type]): Class to use for look up. Defaults to None (Dataset).
+        showcaseclass (Optional[Type]): Class to use for look up. Defaults to None (Showcase).
+        **kwargs: Args to pass to dataset create_in_hdx call
+
+    Returns:
+        Dict[str,str]: Decisions for dataset and showcase
+    """
+    if datasetclass is None:
+        from hdx.data.dataset import Dataset
+
+        datasetclass = Dataset
+    if showcaseclass is None:
+        from hdx.data.showcase import Showcase
+
+        showcaseclass = Showcase
+    dataset.update_from_yaml()
+    existing_dataset = datasetclass.read_from_hdx(dataset["name"])
+    if existing_dataset is None:
+        dataset_decision = "created"
+    else:
+        differences = get_differences(
+            normalise_dataset(dataset), normalise_dataset(existing_dataset)
+        )
+        if differences:
+            dataset_decision = "updated"
+            logger.info(
+                f"Dataset {dataset['name']} differs in {', '.join(differences)}"
+            )
+        else:
+            dataset_decision = "unchanged"
+    if dataset_decision == "unchanged":
+        dataset["id"] = existing_dataset["id"]
+    else:
+        dataset.create_in_hdx(
+            remove_additional_resources=True, hxl_update=False, **kwargs
+        )
+    existing_showcase = showcaseclass.read_from_hdx(showcase["name"])
+    if existing_showcase is None:
+        showcase_decision = "created"
+    else:
+        differences = get_differences(
+            normalise_showcase(showcase), normalise_showcase(existing_showcase)
+        )
+        if differences:
+            showcase_decision = "updated"
+            logger.info(
+                f"Showcase {showcase['name']} differs in {', '.join(differences)}"
+            )
+        else:
+            showcase_decision = "unchanged"
+    if showcase_decision != "unchanged":
+        showcase.create_in_hdx()
+    if dataset_decision == "created" or showcase_decision == "created":
+        showcase.add_dataset(dataset)
+    logger.info(
+        f"Dataset {dataset['name']} {dataset_decision}, showcase {showcase['name']} {showcase_decision}"
+    )
+    return {"dataset": dataset_decision, "showcase": showcase_decision}
@@ -0,0 +1,159 @@
+"""
+Configuration Cache:
+--------------------
+
+Merged scraper configuration cached by the paths and modification times of the
+YAML files it is read from.
+
+"""
+import hashlib
+import json
+import logging
+import pickle
+from os import environ, getpid, makedirs, replace, stat
+from os.path import exists, join
+from threading import Lock
+from typing import Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigCache:
+    """
+    Cache of the configuration merged from a sequence of YAML files, later files
+    overriding the top level keys of earlier ones. Entries are keyed by the
+    paths, modification times and sizes of the files so that an edited file is
+    read again. Merged configurations are kept pickled for the life of the
+    process and, if folder is given, saved to it so that new processes unpickle
+    them rather than parsing YAML. Unlike JSON, pickling keeps keys that are not
+    strings and values like dates as YAML loaded them. Each call to get returns
+    a new copy that can be changed freely.
+
+    Caching on disk can also be enabled without code changes by setting the
+    environment variable HDX_GEONODE_CONFIG_CACHE to the folder.
+
+    Args:
+        folder (Optional[str]): Folder in which to save merged configurations. Defaults to None (only cache in process).
+    """
+
+    def __init__(self, folder: Optional[str] = None) -> None:
+        self.folder = folder
+        self.lock = Lock()
+        self.configs: Dict[str, bytes] = dict()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_environment(cls) -> "ConfigCache":
+        """
+        Create cache saving to the folder in environment variable
+        HDX_GEONODE_CONFIG_CACHE if it is set
+
+        Returns:
+            ConfigCache: Configuration cache
+        """
+        return cls(environ.get("HDX_GEONODE_CONFIG_CACHE") or None)
+
+    @staticmethod
+    def get_key(paths: Sequence[str]) -> str:
+        """
+        Get key of merged configuration from the paths, modification times and
+        sizes of the YAML files
+
+        Args:
+            paths (Sequence[str]): Paths of YAML files
+
+        Returns:
+            str: Key
+        """
+        files = list()
+        for path in paths:
+            stat_result = stat(path)
+            files.append((path, stat_result.st_mtime_ns, stat_result.st_size))
+        return hashlib.sha256(json.dumps(files).encode("utf-8")).hexdigest()
+
+    def get_path(self, key: str) -> str:
+        """
+        Get path of saved merged configuration
+
+        Args:
+            key (str): Key of merged configuration
+
+        Returns:
+            str: Path of pickle file in folder
+        """
+        return join(self.folder, f"hdx_geonode_config_{key[:32]}.pickle")
+
+    @staticmethod
+    def load(paths: Sequence[str]) -> Dict:
+        """
+        Load and merge YAML files
+
+        Args:
+            paths (Sequence[str]): Paths of YAML files
+
+        Returns:
+            Dict: Merged configuration
+        """
+        from hdx.utilities.loader import load_yaml
+
+        config = dict()
+        for path in paths:
+            config.update(load_yaml(path))
+        return config
+
+    def get(self, paths: Sequence[str]) -> Dict:
+        """
+        Get configuration merged from YAML files
+
+        Args:
+            paths (Sequence[str]): Paths of YAML files
+
+        Returns:
+            Dict: Merged configuration
+        """
+        key = self.get_key(paths)
+        with self.lock:
+            data = self.configs.get(key)
+            if data is not None:
+                self.hits += 1
+                return pickle.loads(data)
+            if self.folder:
+                path = self.get_path(key)
+                if exists(path):
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    try:
+                        config = pickle.loads(data)
+                    except Exception:
+                        # Truncated or garbled pickles fail in many ways
+                        config = None
+                    if isinstance(config, dict):
+                        self.configs[key] = data
+                        self.hits += 1
+                        return config
+                    logger.warning(f"Ignoring corrupt {path}!")
+            self.misses += 1
+            config = self.load(paths)
+            data = pickle.dumps(config, pickle.HIGHEST_PROTOCOL)
+            self.configs[key] = data
+            if self.folder:
+                makedirs(self.folder, exist_ok=True)
+                # Processes starting together may write the same file
+                temp_path = f"{path}.{getpid()}.tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(data)
+                replace(temp_path, path)
+                logger.info(f"Saved merged configuration to {path}")
+        # As on a hit, so that the copy returned can be changed freely
+        return pickle.loads(data)
+
+    def clear(self) -> None:
+        """
+        Clear merged configurations cached in process
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.configs = dict()
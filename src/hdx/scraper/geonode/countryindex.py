@@ -0,0 +1,125 @@
+"""
+Country Index:
+--------------
+
+Frozen ISO3 code to country name lookup built once per process.
+
+"""
+import json
+from threading import Lock
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+
+class CountryIndex:
+    """
+    Process wide, read only mapping from ISO3 code to country name. It is built
+    from HDX Python Country data on first use, or can be set from a prebuilt
+    mapping or JSON file, after which checking whether a region code is a country
+    and getting its name is a single dictionary look up.
+    """
+
+    _index: Optional[Mapping[str, str]] = None
+    _lock = Lock()
+
+    @classmethod
+    def build(cls, use_live: bool = True) -> Mapping[str, str]:
+        """
+        Build mapping from ISO3 code to country name from HDX Python Country data
+
+        Args:
+            use_live (bool): Try to get use latest data from web rather than file in package. Defaults to True.
+
+        Returns:
+            Mapping[str,str]: Read only mapping from ISO3 code to country name
+        """
+        # Country data is slow to import and not needed if the index is loaded
+        from hdx.location.country import Country
+
+        countriesdata = Country.countriesdata(use_live=use_live)
+        index = dict()
+        for iso3 in countriesdata["countries"]:
+            countryname = Country.get_country_name_from_iso3(
+                iso3, use_live=use_live
+            )
+            if countryname is not None:
+                index[iso3] = countryname
+        return MappingProxyType(index)
+
+    @classmethod
+    def get(cls, use_live: bool = True) -> Mapping[str, str]:
+        """
+        Get mapping from ISO3 code to country name building it if needed
+
+        Args:
+            use_live (bool): Try to get use latest data from web rather than file in package. Defaults to True.
+
+        Returns:
+            Mapping[str,str]: Read only mapping from ISO3 code to country name
+        """
+        if cls._index is None:
+            with cls._lock:
+                if cls._index is None:
+                    cls._index = cls.build(use_live)
+        return cls._index
+
+    @classmethod
+    def set(cls, index: Optional[Mapping[str, str]]) -> None:
+        """
+        Set mapping from ISO3 code to country name for example from a prebuilt one.
+        None means build again on next use.
+
+        Args:
+            index (Optional[Mapping[str,str]]): Mapping from ISO3 code to country name
+
+        Returns:
+            None
+        """
+        with cls._lock:
+            if index is None:
+                cls._index = None
+            else:
+                cls._index = MappingProxyType(
+                    {iso3.upper(): name for iso3, name in index.items()}
+                )
+
+    @classmethod
+    def load(cls, path: str) -> None:
+        """
+        Set mapping from ISO3 code to country name from JSON file
+
+        Args:
+            path (str): Path to JSON file
+
+        Returns:
+            None
+        """
+        with open(path, encoding="utf-8") as f:
+            cls.set(json.load(f))
+
+    @classmethod
+    def save(cls, path: str) -> None:
+        """
+        Save mapping from ISO3 code to country name to JSON file
+
+        Args:
+            path (str): Path to JSON file
+
+        Returns:
+            None
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(dict(cls.get()), f, ensure_ascii=False, indent=1)
+
+    @classmethod
+    def get_country_name(cls, iso3: str) -> Optional[str]:
+        """
+        Get country name from ISO3 code
+
+        Args:
+            iso3 (str): ISO3 code
+
+        Returns:
+            Optional[str]: Country name or None if code isn't a country
+        """
+        return cls.get().get(iso3.upper())
@@ -0,0 +1,272 @@
+"""
+GeoNode Federation:
+-------------------
+
+Runs many GeoNode servers in one process sharing a downloader's connection
+pool.
+
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from .geonodetohdx import (
+    GeoNodeToHDX,
+    create_dataset_showcase,
+    delete_from_hdx,
+)
+from .workers import ThreadLocalDownload
+
+if TYPE_CHECKING:
+    from hdx.data.dataset import Dataset
+    from hdx.data.showcase import Showcase
+    from hdx.utilities.downloader import Download
+
+logger = logging.getLogger(__name__)
+
+
+class HostLimitedDownload:
+    """
+    Wrapper around a Download object that can be passed to GeoNodeToHDX in its
+    place. It allows at most max_connections downloads at once in total and at
+    most max_per_host at once to any one host. It can be used from many threads
+    at once: each thread downloads with its own copy of the Download object (see
+    ThreadLocalDownload), so all GeoNodeToHDX objects given the same
+    HostLimitedDownload, and their prefetch threads, share only its downloader's
+    HTTP connection pool.
+
+    Args:
+        downloader (Download): Download object from HDX Python Utilities
+        max_connections (int): Maximum number of downloads at once. Defaults to 10.
+        max_per_host (int): Maximum number of downloads at once from one host. Defaults to 2.
+    """
+
+    # Marks objects that can be shared between threads as is
+    thread_safe = True
+
+    def __init__(
+        self,
+        downloader: "Download",
+        max_connections: int = 10,
+        max_per_host: int = 2,
+    ) -> None:
+        self.downloader = ThreadLocalDownload.wrap(downloader)
+        self.max_per_host = max_per_host
+        self.connections = BoundedSemaphore(max_connections)
+        self.lock = Lock()
+        self.hosts: Dict[str, BoundedSemaphore] = dict()
+
+    def get_host_semaphore(self, url: str) -> BoundedSemaphore:
+        """
+        Get semaphore limiting downloads from host of url
+
+        Args:
+            url (str): Url
+
+        Returns:
+            BoundedSemaphore: Semaphore for host
+        """
+        host = urlsplit(url).netloc.lower()
+        with self.lock:
+            semaphore = self.hosts.get(host)
+            if semaphore is None:
+                semaphore = BoundedSemaphore(self.max_per_host)
+                self.hosts[host] = semaphore
+            return semaphore
+
+    def download(self, url: str, **kwargs: Any) -> Any:
+        """
+        Download url once the host and overall limits allow
+
+        Args:
+            url (str): Url to download
+            **kwargs: Other arguments to pass to downloader's download method
+
+        Returns:
+            Any: Response object
+        """
+        with self.get_host_semaphore(url):
+            with self.connections:
+                return self.downloader.download(url, **kwargs)
+
+
+class GeoNodeFederation:
+    """
+    Runs generate_datasets_and_showcases for many GeoNode servers in one process.
+    Up to max_servers servers are run at once, all downloading through one
+    HostLimitedDownload. Each server config is a dictionary with keys geonode_url
+    and metadata, optionally hdx_geonode_config_yaml and countrydata, and any
+    other keys are passed to generate_datasets_and_showcases. Server urls must be
+    unique. For each server that succeeds, the stale datasets that
+    delete_other_datasets would delete are collected with get_stale_datasets
+    so that they can be reviewed or passed to delete_datasets. A server that
+    fails does not stop the others and has no delete list. Dataset creation,
+    searches for stale datasets and deletions in HDX from all servers are
+    limited to max_hdx_requests at once.
+
+    Args:
+        server_configs (List[Dict]): List of server configs
+        downloader (Download): Download object from HDX Python Utilities
+        max_servers (int): Maximum number of servers run at once. Defaults to 4.
+        max_connections (int): Maximum number of downloads at once. Defaults to 10.
+        max_per_host (int): Maximum number of downloads at once from one host. Defaults to 2.
+        max_hdx_requests (int): Maximum number of HDX calls at once. Defaults to 4.
+    """
+
+    def __init__(
+        self,
+        server_configs: List[Dict],
+        downloader: "Download",
+        max_servers: int = 4,
+        max_connections: int = 10,
+        max_per_host: int = 2,
+        max_hdx_requests: int = 4,
+    ) -> None:
+        geonode_urls = [x["geonode_url"] for x in server_configs]
+        duplicates = sorted(
+            {x for x in geonode_urls if geonode_urls.count(x) > 1}
+        )
+        if duplicates:
+            raise ValueError(
+                f"GeoNode server urls must be unique: {', '.join(duplicates)}!"
+            )
+        self.server_configs = server_configs
+        self.downloader = HostLimitedDownload(
+            downloader, max_connections, max_per_host
+        )
+        self.max_servers = max_servers
+        self.hdx_requests = BoundedSemaphore(max_hdx_requests)
+        self.geonodetohdxs: Dict[str, GeoNodeToHDX] = dict()
+
+    def limit_hdx_requests(self, function: Callable) -> Callable:
+        """
+        Wrap function that calls HDX so that it waits for one of the
+        max_hdx_requests slots shared by all servers
+
+        Args:
+            function (Callable): Function that calls HDX
+
+        Returns:
+            Callable: Wrapped function
+        """
+
+        def limited(*args: Any, **kwargs: Any) -> Any:
+            with self.hdx_requests:
+                return function(*args, **kwargs)
+
+        return limited
+
+    def run_server(
+        self,
+        server_config: Dict,
+        create_dataset_showcase: Callable[
+            ["Dataset", "Showcase", Any], None
+        ] = create_dataset_showcase,
+        **kwargs: Any,
+    ) -> Dict:
+        """
+        Generate datasets and showcases for one GeoNode server and collect the
+        stale datasets to delete
+
+        Args:
+            server_config (Dict): Server config
+            create_dataset_showcase (Callable[["Dataset", "Showcase", Any], None]): Function to call to create dataset and showcase
+            **kwargs: Args to pass to generate_datasets_and_showcases
+
+        Returns:
+            Dict: Result with keys datasets (list of names), delete (list of datasets) and error
+        """
+        server_config = dict(server_config)
+        geonode_url = server_config.pop("geonode_url")
+        metadata = server_config.pop("metadata")
+        hdx_geonode_config_yaml = server_config.pop(
+            "hdx_geonode_config_yaml", None
+        )
+        kwargs.update(server_config)
+        result = {"datasets": list(), "delete": list(), "error": None}
+        try:
+            geonodetohdx = GeoNodeToHDX(
+                geonode_url, self.downloader, hdx_geonode_config_yaml
+            )
+            self.geonodetohdxs[geonode_url] = geonodetohdx
+            result["datasets"] = geonodetohdx.generate_datasets_and_showcases(
+                metadata,
+                create_dataset_showcase=self.limit_hdx_requests(
+                    create_dataset_showcase
+                ),
+                **kwargs,
+            )
+            result["delete"] = self.limit_hdx_requests(
+                geonodetohdx.get_stale_datasets
+            )(result["datasets"], metadata)
+        except Exception as ex:
+            logger.exception(f"GeoNode server {geonode_url} failed!")
+            result["delete"] = list()
+            result["error"] = str(ex)
+        return result
+
+    def run(
+        self,
+        create_dataset_showcase: Callable[
+            ["Dataset", "Showcase", Any], None
+        ] = create_dataset_showcase,
+        **kwargs: Any,
+    ) -> Dict[str, Dict]:
+        """
+        Run all servers
+
+        Args:
+            create_dataset_showcase (Callable[["Dataset", "Showcase", Any], None]): Function to call to create dataset and showcase
+            **kwargs: Args to pass to generate_datasets_and_showcases for all servers
+
+        Returns:
+            Dict[str, Dict]: Server url mapped to result with keys datasets, delete and error
+        """
+        with ThreadPoolExecutor(max_workers=self.max_servers) as executor:
+            futures = [
+                executor.submit(
+                    self.run_server,
+                    server_config,
+                    create_dataset_showcase,
+                    **kwargs,
+                )
+                for server_config in self.server_configs
+            ]
+            results = dict()
+            for server_config, future in zip(self.server_configs, futures):
+                results[server_config["geonode_url"]] = future.result()
+        return results
+
+    def delete_datasets(
+        self,
+        results: Dict[str, Dict],
+        max_deletions: Optional[int] = None,
+        **kwargs: Any,
+    ) -> Dict[str, Dict]:
+        """
+        Delete the stale datasets collected by run for each server that
+        succeeded. Deletions count towards max_hdx_requests.
+
+        Args:
+            results (Dict[str, Dict]): Results returned by run
+            max_deletions (Optional[int]): Maximum number of datasets that may be deleted per server. Defaults to None (no maximum).
+            **kwargs: Args to pass to delete_datasets
+
+        Returns:
+            Dict[str, Dict]: Server url mapped to deletion summary
+        """
+        kwargs["delete_from_hdx"] = self.limit_hdx_requests(
+            kwargs.get("delete_from_hdx", delete_from_hdx)
+        )
+        summaries = dict()
+        for geonode_url, result in results.items():
+            if result["error"] is not None:
+                continue
+            summaries[geonode_url] = self.geonodetohdxs[
+                geonode_url
+            ].delete_datasets(
+                result["delete"], max_deletions=max_deletions, **kwargs
+            )
+        return summaries
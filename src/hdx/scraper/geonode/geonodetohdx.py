@@ -5,30 +5,59 @@ GeoNode Utilities:
 Reads from GeoNode servers and creates datasets.
 
 """
+import hashlib
+import json
 import logging
-from collections import OrderedDict
-from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
-from urllib.parse import quote_plus
-
-from hdx.data.dataset import Dataset
-from hdx.data.organization import Organization
-from hdx.data.resource import Resource
-from hdx.data.showcase import Showcase
-from hdx.location.country import Country
-from hdx.utilities.dateparse import default_date, parse_date
-from hdx.utilities.downloader import Download
-from hdx.utilities.loader import load_yaml
-from hdx.utilities.path import script_dir_plus_file
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from os.path import dirname, join
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+from urllib.parse import quote_plus, urlsplit
+
+from hdx.utilities.dateparse import parse_date
 from hdx.utilities.uuid import get_uuid
-from slugify import slugify
 
 from . import __version__
+from .checkpoint import Checkpoint
+from .config import ConfigCache
+from .countryindex import CountryIndex
+from .hosts import GeoNodeHosts
+from .layer import LayerRecord
+from .matcher import KeywordMatcher
+from .metrics import Metrics
+from .plan import PlanWriter, UploadPlan
+from .profiling import LayerProfiler
+from .state import LayerStateStore
+from .workers import (
+    RateLimiter,
+    SingleFlightCache,
+    ThreadLocalDownload,
+    WorkerPool,
+)
+
+# HDX objects are imported on first use so that importing this module is fast
+if TYPE_CHECKING:
+    from hdx.data.dataset import Dataset
+    from hdx.data.showcase import Showcase
+    from hdx.utilities.downloader import Download
 
 logger = logging.getLogger(__name__)
 
 
 def create_dataset_showcase(
-    dataset: Dataset, showcase: Showcase, **kwargs: Any
+    dataset: "Dataset", showcase: "Showcase", **kwargs: Any
 ) -> None:
     """
     Create dataset and showcase
@@ -50,7 +79,7 @@ def create_dataset_showcase(
     showcase.add_dataset(dataset)
 
 
-def delete_from_hdx(dataset: Dataset) -> None:
+def delete_from_hdx(dataset: "Dataset") -> None:
     """
     Delete dataset and any associated showcases
 
@@ -95,25 +124,37 @@ class GeoNodeToHDX:
         geonode_url (str): GeoNode server url
         downloader (Download): Download object from HDX Python Utilities
         hdx_geonode_config_yaml (Optional[str]): Configuration file for scraper
+        metrics (Optional[Metrics]): Metrics to record stage times and counts in. Defaults to None (new Metrics).
     """
 
+    # Organisation names looked up from HDX, shared by all instances
+    orgname_cache = SingleFlightCache(ttl=3600)
+    # Merged configurations, shared by all instances
+    config_cache = ConfigCache.from_environment()
+
     def __init__(
         self,
         geonode_url: str,
-        downloader: Download,
+        downloader: "Download",
         hdx_geonode_config_yaml: Optional[str] = None,
+        metrics: Optional[Metrics] = None,
     ) -> None:
-        self.geonode_urls = [geonode_url]
-        self.downloader = downloader
-        base_hdx_geonode_config_yaml = script_dir_plus_file(
-            "hdx_geonode.yml", GeoNodeToHDX
-        )
-        geonode_config = load_yaml(base_hdx_geonode_config_yaml)
+        self.geonode_urls = GeoNodeHosts([geonode_url])
+        # Layers are fetched from several threads when prefetching
+        self.downloader = ThreadLocalDownload.wrap(downloader)
+        if metrics is None:
+            metrics = Metrics()
+        self.metrics = metrics
+        self.upload_plan: Optional[UploadPlan] = None
+        config_yamls = [join(dirname(__file__), "hdx_geonode.yml")]
         if hdx_geonode_config_yaml is not None:
-            geonode_config.update(load_yaml(hdx_geonode_config_yaml))
+            config_yamls.append(hdx_geonode_config_yaml)
+        geonode_config = self.config_cache.get(config_yamls)
         self.ignore_data = geonode_config["ignore_data"]
+        self.ignore_matcher = KeywordMatcher(self.ignore_data)
         self.category_mapping = geonode_config["category_mapping"]
         self.titleabstract_mapping = geonode_config["titleabstract_mapping"]
+        self.titleabstract_matcher = self.compile_titleabstract_mapping()
 
     def get_ignore_data(self) -> List[str]:
         """
@@ -123,8 +164,52 @@ class GeoNodeToHDX:
             List[str]: List of terms in the abstract that mean that the dataset should not be added to HDX
 
         """
+        self.ignore_matcher = None
         return self.ignore_data
 
+    def get_ignored_terms(self, layer: Dict) -> List[str]:
+        """
+        Get terms in the abstract of a layer that mean that the dataset should not be
+        added to HDX. All terms are found with a KeywordMatcher. As this needs only
+        the layer, it can be used to filter layers before any dataset is
+        generated.
+
+        Args:
+            layer (Dict): Data about layer from GeoNode
+
+        Returns:
+            List[str]: Terms found in the abstract in the order of ignore_data (empty if layer should be added)
+
+        """
+        if self.ignore_matcher is None:
+            self.ignore_matcher = KeywordMatcher(self.ignore_data)
+        terms = self.ignore_matcher.find(layer["abstract"].lower())
+        if not terms:
+            return list()
+        return [term for term in self.ignore_data if term in terms]
+
+    def log_ignored_terms(self, layer: Dict) -> List[str]:
+        """
+        Get ignored terms present in the abstract of a layer, logging a warning
+        that the layer is ignored if there are any
+
+        Args:
+            layer (Dict): Data about layer from GeoNode
+
+        Returns:
+            List[str]: Ignored terms present in abstract
+        """
+        terms = self.get_ignored_terms(layer)
+        if terms:
+            if len(terms) == 1:
+                termsstr = f"term {terms[0]}"
+            else:
+                termsstr = f"terms {', '.join(terms)}"
+            logger.warning(
+                f"Ignoring {layer['title'].strip()} as {termsstr} present in abstract!"
+            )
+        return terms
+
     def get_category_mapping(self) -> Dict[str, str]:
         """
         Get mappings from the category field category__gn_description to HDX metadata tags
@@ -137,31 +222,62 @@ class GeoNodeToHDX:
 
     def get_titleabstract_mapping(self) -> Dict[str, Union[Dict, List]]:
         """
-        Get mappings from terms in the title or abstract to HDX metadata tags
+        Get mappings from terms in the title or abstract to HDX metadata tags. As
+        the returned dictionary may be changed, it is recompiled on next use.
 
         Returns:
             Dict[str,Union[Dict,List]]: List of mappings from terms in the title or abstract to HDX metadata tags
 
         """
+        self.titleabstract_matcher = None
         return self.titleabstract_mapping
 
-    def get_countries(self, use_count: bool = True) -> List[Dict]:
+    def compile_titleabstract_mapping(self) -> KeywordMatcher:
+        """
+        Compile the terms and nested terms of the title or abstract mappings into a
+        matcher that finds all of them in a text
+
+        Returns:
+            KeywordMatcher: Matcher for terms in the title or abstract mappings
+
+        """
+        terms = list()
+        for key, mapping in self.titleabstract_mapping.items():
+            terms.append(key)
+            if isinstance(mapping, dict):
+                terms.extend(x for x in mapping if x != "else")
+        return KeywordMatcher(terms)
+
+    def get_countries(
+        self,
+        use_count: bool = True,
+        region_index: Optional[Dict[str, List[Dict]]] = None,
+    ) -> List[Dict]:
         """
-        Get countries from GeoNode
+        Get countries from GeoNode or from a region index built by get_region_index
+        in which case no request is made to GeoNode
 
         Args:
             use_count (bool): Whether to use null count metadata to exclude countries. Defaults to True.
+            region_index (Optional[Dict[str, List[Dict]]]): Region code to layers index. Defaults to None (read from GeoNode).
 
         Returns:
             List[Dict]: List of countries in form (iso3 code, name)
 
         """
-        response = self.downloader.download(
-            f"{self.geonode_urls[0]}/api/regions"
-        )
-        jsonresponse = response.json()
+        if region_index is None:
+            with self.metrics.time("regions_fetch"):
+                response = self.downloader.download(
+                    f"{self.geonode_urls[0]}/api/regions"
+                )
+                locations = response.json()["objects"]
+        else:
+            locations = [
+                {"code": code, "name_en": code, "count": len(layers)}
+                for code, layers in region_index.items()
+            ]
         countries = list()
-        for location in jsonresponse["objects"]:
+        for location in locations:
             loccode = location["code"]
             locname = location["name_en"]
             if use_count:
@@ -176,7 +292,7 @@ class GeoNodeToHDX:
                         f"Location {locname} ({loccode}) has empty or zero count!"
                     )
                     continue
-            countryname = Country.get_country_name_from_iso3(loccode)
+            countryname = CountryIndex.get_country_name(loccode)
             if countryname is None:
                 logger.info(f"Location {locname} ({loccode}) isn't a country!")
                 continue
@@ -185,34 +301,222 @@ class GeoNodeToHDX:
             )
         return countries
 
-    def get_layers(self, countryiso: Optional[str] = None) -> List[Dict]:
+    def get_layers(
+        self, countryiso: Optional[str] = None, page_size: Optional[int] = None
+    ) -> List[Dict]:
         """
-        Get layers from GeoNode optionally for a particular country
+        Get layers from GeoNode optionally for a particular country. If page_size is
+        given, all pages of layers are read using iter_layers rather than relying on
+        a single response.
 
         Args:
             countryiso (Optional[str]): ISO 3 code of country from which to get layers. Defaults to None (all countries).
+            page_size (Optional[int]): Number of layers to request per page. Defaults to None (no paging).
 
         Returns:
             List[Dict]: List of layers
         """
+        with self.metrics.time("layers_fetch"):
+            if page_size:
+                return list(self.iter_layers(countryiso, page_size))
+            if countryiso is None:
+                regionstr = ""
+            else:
+                regionstr = f"/?regions__code__in={countryiso}"
+            response = self.downloader.download(
+                f"{self.geonode_urls[0]}/api/layers{regionstr}"
+            )
+            jsonresponse = response.json()
+            return jsonresponse["objects"]
+
+    def iter_layers(
+        self, countryiso: Optional[str] = None, page_size: int = 100
+    ) -> Iterator[Dict]:
+        """
+        Iterate over layers from GeoNode optionally for a particular country
+        reading them one page at a time by following the meta next links of the
+        GeoNode API. Only one page of layers is held in memory at once.
+
+        Args:
+            countryiso (Optional[str]): ISO 3 code of country from which to get layers. Defaults to None (all countries).
+            page_size (int): Number of layers to request per page. Defaults to 100.
+
+        Returns:
+            Iterator[Dict]: Layers
+        """
         if countryiso is None:
             regionstr = ""
         else:
-            regionstr = f"/?regions__code__in={countryiso}"
-        response = self.downloader.download(
-            f"{self.geonode_urls[0]}/api/layers{regionstr}"
-        )
-        jsonresponse = response.json()
-        return jsonresponse["objects"]
+            regionstr = f"regions__code__in={countryiso}&"
+        url = f"{self.geonode_urls[0]}/api/layers/?{regionstr}limit={page_size}&offset=0"
+        first_page = True
+        while url:
+            with self.metrics.time("layers_page_fetch"):
+                response = self.downloader.download(url)
+                jsonresponse = response.json()
+            meta = jsonresponse.get("meta", dict())
+            if first_page:
+                total_count = meta.get("total_count")
+                if total_count is not None:
+                    logger.info(
+                        f"Number of layers in {countryiso or 'all countries'}: {total_count}"
+                    )
+                first_page = False
+            objects = jsonresponse["objects"]
+            url = meta.get("next")
+            if url and not urlsplit(url).netloc:
+                url = f"{self.geonode_urls[0]}{url}"
+            for layer in objects:
+                yield layer
+
+    def get_layer_region_codes(
+        self, layer: Dict, region_codes: Dict[str, str]
+    ) -> List[str]:
+        """
+        Get region codes of a layer from its regions field. Regions can be
+        dictionaries with a code key, resource uris like /api/regions/218/ which are
+        looked up in region_codes or plain region codes.
+
+        Args:
+            layer (Dict): Data about layer from GeoNode
+            region_codes (Dict[str, str]): Cache of region resource uris to codes. Populated from GeoNode on first use.
+
+        Returns:
+            List[str]: List of region codes
+        """
+        codes = list()
+        for region in layer.get("regions") or list():
+            if isinstance(region, dict):
+                code = region.get("code")
+            elif region.startswith("/api/regions/"):
+                if not region_codes:
+                    response = self.downloader.download(
+                        f"{self.geonode_urls[0]}/api/regions"
+                    )
+                    for location in response.json()["objects"]:
+                        region_codes[location["resource_uri"]] = location[
+                            "code"
+                        ]
+                code = region_codes.get(region)
+            else:
+                code = region
+            if code:
+                codes.append(code)
+        return codes
+
+    def get_region_index(
+        self, page_size: int = 100, compact: bool = False
+    ) -> Dict[str, List[Dict]]:
+        """
+        Crawl all layers from GeoNode once, a page at a time, and index them by the
+        codes of the regions they carry. The index can be passed to get_countries
+        and get_countries_layers instead of making one request per country. If
+        compact is True, each layer is stored as a LayerRecord, shared by all the
+        regions of the layer, rather than as the full GeoNode dictionary.
+
+        Args:
+            page_size (int): Number of layers to request per page. Defaults to 100.
+            compact (bool): Whether to store layers as LayerRecords. Defaults to False.
+
+        Returns:
+            Dict[str, List[Dict]]: Region code to layers index
+        """
+        region_index = dict()
+        region_codes = dict()
+        with self.metrics.time("region_index_fetch"):
+            for layer in self.iter_layers(page_size=page_size):
+                codes = self.get_layer_region_codes(layer, region_codes)
+                if compact:
+                    layer = LayerRecord.from_layer(layer)
+                for code in codes:
+                    region_index.setdefault(code, list()).append(layer)
+        return region_index
+
+    def get_countries_layers(
+        self,
+        countries: List[Dict],
+        max_fetch_workers: int = 1,
+        page_size: Optional[int] = None,
+        region_index: Optional[Dict[str, List[Dict]]] = None,
+        compact: bool = False,
+    ) -> Iterator[Tuple[Dict, Iterable[Dict]]]:
+        """
+        Get layers from GeoNode for each country in countries. If max_fetch_workers
+        is more than 1, layers for upcoming countries are prefetched concurrently
+        by a pool of that many workers, each downloading with its own copy of the
+        Download object that shares its connection pool. Results are always yielded
+        in the order of countries. If page_size is given, layers are read a page at a time: without
+        prefetching, layers are yielded lazily by iter_layers, while with
+        prefetching each worker reads all pages for its country. If region_index is
+        given, layers are taken from it without making any requests. If compact is
+        True, fetched layers are converted to LayerRecords so that prefetched
+        countries only hold the fields that the scraper uses.
+
+        Args:
+            countries (List[Dict]): List of countries as returned by get_countries
+            max_fetch_workers (int): Number of workers fetching layers. Defaults to 1 (no prefetching).
+            page_size (Optional[int]): Number of layers to request per page. Defaults to None (no paging).
+            region_index (Optional[Dict[str, List[Dict]]]): Region code to layers index. Defaults to None (read from GeoNode).
+            compact (bool): Whether to convert fetched layers to LayerRecords. Defaults to False.
+
+        Returns:
+            Iterator[Tuple[Dict,Iterable[Dict]]]: Tuples of (country, layers)
+        """
+        if region_index is not None:
+            for countrydata in countries:
+                yield countrydata, region_index.get(countrydata["layers"], [])
+            return
+        if max_fetch_workers <= 1 or len(countries) <= 1:
+            for countrydata in countries:
+                if page_size:
+                    layers = self.iter_layers(countrydata["layers"], page_size)
+                else:
+                    layers = self.get_layers(countrydata["layers"])
+                if compact:
+                    layers = map(LayerRecord.from_layer, layers)
+                yield countrydata, layers
+            return
+        # Only keep a bounded number of countries in flight so that prefetched
+        # layer lists don't all accumulate in memory on big servers
+        max_in_flight = max_fetch_workers * 2
+
+        def fetch(countryiso):
+            layers = self.get_layers(countryiso, page_size)
+            if compact:
+                layers = [LayerRecord.from_layer(x) for x in layers]
+            return layers
+
+        with ThreadPoolExecutor(max_workers=max_fetch_workers) as executor:
+
+            def submit(countrydata):
+                return (
+                    countrydata,
+                    executor.submit(fetch, countrydata["layers"]),
+                )
+
+            futures = deque()
+            countries_iter = iter(countries)
+            for countrydata in countries_iter:
+                futures.append(submit(countrydata))
+                if len(futures) == max_in_flight:
+                    break
+            while futures:
+                countrydata, future = futures.popleft()
+                nextcountry = next(countries_iter, None)
+                if nextcountry is not None:
+                    futures.append(submit(nextcountry))
+                yield countrydata, future.result()
 
     @staticmethod
-    def get_orgname(metadata: Dict, orgclass: Type = Organization) -> str:
+    def get_orgname(metadata: Dict, orgclass: Optional[Type] = None) -> str:
         """
-        Get orgname from Dict if available or use orgid from Dict to look up organisation name
+        Get orgname from Dict if available or use orgid from Dict to look up organisation name.
+        Looked up names are cached in orgname_cache for the whole process for an hour
+        and concurrent look ups of the same organisation make only one request.
 
         Args:
             metadata (Dict): Dictionary containing keys: maintainerid, orgid, updatefreq, subnational
-            orgclass (Type): Class to use for look up. Defaults to Organization.
+            orgclass (Optional[Type]): Class to use for look up. Defaults to None (Organization).
 
         Returns:
             str: Organisation name
@@ -220,74 +524,137 @@ class GeoNodeToHDX:
         """
         orgname = metadata.get("orgname")
         if not orgname:
-            organisation = orgclass.read_from_hdx(metadata["orgid"])
-            orgname = organisation["name"]
+            if orgclass is None:
+                from hdx.data.organization import Organization
+
+                orgclass = Organization
+            orgid = metadata["orgid"]
+
+            def read_orgname():
+                return orgclass.read_from_hdx(orgid)["name"]
+
+            orgname = GeoNodeToHDX.orgname_cache.get(
+                (orgclass, orgid), read_orgname
+            )
             metadata["orgname"] = orgname
         return orgname
 
-    def generate_dataset_and_showcase(
+    def get_geonode_url(self, detail_url: str) -> str:
+        """
+        Get url of the GeoNode server hosting a layer from its detail url. Layers
+        hosted by a remote server have its name in their detail urls and that
+        server is added to geonode_urls.
+
+        Args:
+            detail_url (str): Detail url of layer
+
+        Returns:
+            str: GeoNode server url
+        """
+        if "%3Ageonode%3A" in detail_url:
+            geonode_url = f"https://{detail_url.rsplit('/', 1)[-1].split('%3Ageonode%3A')[0]}"
+            self.geonode_urls.add(geonode_url)
+            return geonode_url
+        return self.geonode_urls[0]
+
+    def get_layer_record(
         self,
         countryiso: str,
-        layer: Dict,
+        layer: Union[Dict, LayerRecord],
         metadata: Dict,
         get_date_from_title: bool = False,
         process_dataset_name: Callable[[str], str] = lambda x: x,
-        dataset_tags_mapping: Dict[str, List] = dict(),
-    ) -> Tuple[Optional[Dataset], Optional[List], Optional[Showcase]]:
+        check_ignored: bool = True,
+    ) -> Optional[LayerRecord]:
         """
-        Generate dataset and showcase for GeoNode layer
+        Get compact record of GeoNode layer with the dataset title, name and date
+        ranges in the layer title worked out, without building the dataset and
+        showcase. Returns None if the layer should not be added to HDX.
 
         Args:
             countryiso (str): ISO 3 code of country
-            layer (Dict): Data about layer from GeoNode
+            layer (Union[Dict, LayerRecord]): Data about layer from GeoNode
             metadata (Dict): Dictionary containing keys: maintainerid, orgid, updatefreq, subnational
             get_date_from_title (bool): Whether to remove dates from title. Defaults to False.
             process_dataset_name (Callable[[str], str]): Function to change the dataset name. Defaults to lambda x: x.
-            dataset_tags_mapping (Dict[str, List]): Mapping from dataset name to additional tags. Defaults to empty dictionary.
+            check_ignored (bool): Whether to check for ignored terms in abstract. Defaults to True.
 
         Returns:
-            Tuple[Optional[Dataset],List,Optional[Showcase]]: Dataset, date ranges in dataset title and Showcase objects or None, None, None
+            Optional[LayerRecord]: Record of layer or None
         """
-        origtitle = layer["title"].strip()
-        notes = layer["abstract"]
-        abstract = notes.lower()
-        for term in self.ignore_data:
-            if term in abstract:
-                logger.warning(
-                    f"Ignoring {origtitle} as term {term} present in abstract!"
-                )
-                return None, None, None
+        from hdx.data.dataset_title_helper import DatasetTitleHelper
+        from slugify import slugify
 
-        dataset = Dataset({"title": origtitle})
+        # A new record for each country as layers can be shared by regions
+        record = LayerRecord.from_layer(layer)
+        origtitle = record.title.strip()
+        if check_ignored and self.log_ignored_terms(record):
+            return None
+        # Registered for every layer that isn't ignored, whether or not it is
+        # uploaded, so that stale datasets on the server can be found
+        self.get_geonode_url(record.detail_url)
         if get_date_from_title:
-            ranges = dataset.remove_dates_from_title(
-                change_title=True, set_dataset_date=True
-            )
+            title, ranges = DatasetTitleHelper.get_dates_from_title(origtitle)
         else:
+            title = origtitle
             ranges = list()
-        title = dataset["title"]
+        slugified_name = slugify(
+            f"{self.get_orgname(metadata)}_geonode_{title}"
+        )
+        slugified_name = process_dataset_name(slugified_name)
+        record.countryiso = countryiso
+        record.dataset_title = title
+        record.name = slugified_name[:90]
+        record.ranges = ranges
+        return record
+
+    def generate_dataset_and_showcase_from_record(
+        self,
+        record: LayerRecord,
+        metadata: Dict,
+        dataset_tags_mapping: Dict[str, List] = dict(),
+    ) -> Tuple["Dataset", "Showcase"]:
+        """
+        Generate dataset and showcase from record of GeoNode layer returned by
+        get_layer_record
+
+        Args:
+            record (LayerRecord): Record of layer
+            metadata (Dict): Dictionary containing keys: maintainerid, orgid, updatefreq, subnational
+            dataset_tags_mapping (Dict[str, List]): Mapping from dataset name to additional tags. Defaults to empty dictionary.
+
+        Returns:
+            Tuple[Dataset,Showcase]: Dataset and Showcase objects
+        """
+        from hdx.data.dataset import Dataset
+        from hdx.data.resource import Resource
+        from hdx.data.showcase import Showcase
+
+        origtitle = record.title.strip()
+        title = record.dataset_title
+        ranges = record.ranges
+        notes = record.abstract
+        dataset = Dataset({"title": title})
         logger.info(f"Creating dataset: {title}")
-        detail_url = layer["detail_url"]
-        supplemental_information = layer["supplemental_information"]
+        detail_url = record.detail_url
+        supplemental_information = record.supplemental_information
         if supplemental_information.lower()[:7] == "no info":
             dataset_notes = notes
         else:
             dataset_notes = f"{notes}\n\n{supplemental_information}"
-        dataset_date = parse_date(layer["date"])
+        dataset_date = parse_date(record.date)
         if origtitle == title:
             dataset.set_date_of_dataset(dataset_date)
         else:
+            if ranges:
+                dataset.set_date_of_dataset(ranges[0][0], ranges[0][1])
             dataset_notes = (
                 f"{dataset_notes}\n\nOriginal dataset title: {origtitle}"
             )
             logger.info(
                 f"Using {ranges[0][0]}-{ranges[0][1]} instead of {dataset_date} for dataset date"
             )
-        slugified_name = slugify(
-            f"{self.get_orgname(metadata)}_geonode_{title}"
-        )
-        slugified_name = process_dataset_name(slugified_name)
-        slugified_name = slugified_name[:90]
+        slugified_name = record.name
         dataset["name"] = slugified_name
         dataset["notes"] = dataset_notes
         dataset.set_maintainer(metadata["maintainerid"])
@@ -296,18 +663,20 @@ class GeoNodeToHDX:
         dataset.set_expected_update_frequency(updatefreq)
         subnational = metadata.get("subnational", True)
         dataset.set_subnational(subnational)
-        dataset.add_country_location(countryiso)
-        tags = dataset_tags_mapping.get(slugified_name, list())
+        dataset.add_country_location(record.countryiso)
+        tags = list(dataset_tags_mapping.get(slugified_name, list()))
         tags.append("geodata")
-        tag = layer.get("category__gn_description", None)
+        tag = record.category__gn_description
         if tag is not None:
             if tag in self.category_mapping:
                 tag = self.category_mapping[tag]
             tags.append(tag)
         title_abstract = f"{title} {notes}".lower()
-        for key in self.titleabstract_mapping:
-            if key in title_abstract:
-                mapping = self.titleabstract_mapping[key]
+        if self.titleabstract_matcher is None:
+            self.titleabstract_matcher = self.compile_titleabstract_mapping()
+        terms = self.titleabstract_matcher.find(title_abstract)
+        for key, mapping in self.titleabstract_mapping.items():
+            if key in terms:
                 if isinstance(mapping, list):
                     tags.extend(mapping)
                 elif isinstance(mapping, dict):
@@ -315,19 +684,14 @@ class GeoNodeToHDX:
                     for subkey in mapping:
                         if subkey == "else":
                             continue
-                        if subkey in title_abstract:
+                        if subkey in terms:
                             tags.extend(mapping[subkey])
                             found = True
                     if not found and "else" in mapping:
                         tags.extend(mapping["else"])
         dataset.add_tags(tags)
-        srid = quote_plus(layer["srid"])
-        if "%3Ageonode%3A" in detail_url:
-            geonode_url = f"https://{detail_url.rsplit('/', 1)[-1].split('%3Ageonode%3A')[0]}"
-            if geonode_url not in self.geonode_urls:
-                self.geonode_urls.append(geonode_url)
-        else:
-            geonode_url = self.geonode_urls[0]
+        srid = quote_plus(record.srid)
+        geonode_url = self.get_geonode_url(detail_url)
         typename = f"geonode:{detail_url.rsplit('geonode%3A', 1)[-1]}"
         resource = Resource(
             {
@@ -354,26 +718,237 @@ class GeoNodeToHDX:
                 "title": title,
                 "notes": notes,
                 "url": f"{self.geonode_urls[0]}{detail_url}",
-                "image_url": layer["thumbnail_url"],
+                "image_url": record.thumbnail_url,
             }
         )
         showcase.add_tags(tags)
-        return dataset, ranges, showcase
+        return dataset, showcase
+
+    def generate_dataset_and_showcase(
+        self,
+        countryiso: str,
+        layer: Union[Dict, LayerRecord],
+        metadata: Dict,
+        get_date_from_title: bool = False,
+        process_dataset_name: Callable[[str], str] = lambda x: x,
+        dataset_tags_mapping: Dict[str, List] = dict(),
+    ) -> Tuple[Optional["Dataset"], Optional[List], Optional["Showcase"]]:
+        """
+        Generate dataset and showcase for GeoNode layer
+
+        Args:
+            countryiso (str): ISO 3 code of country
+            layer (Union[Dict, LayerRecord]): Data about layer from GeoNode
+            metadata (Dict): Dictionary containing keys: maintainerid, orgid, updatefreq, subnational
+            get_date_from_title (bool): Whether to remove dates from title. Defaults to False.
+            process_dataset_name (Callable[[str], str]): Function to change the dataset name. Defaults to lambda x: x.
+            dataset_tags_mapping (Dict[str, List]): Mapping from dataset name to additional tags. Defaults to empty dictionary.
+
+        Returns:
+            Tuple[Optional[Dataset],List,Optional[Showcase]]: Dataset, date ranges in dataset title and Showcase objects or None, None, None
+        """
+        record = self.get_layer_record(
+            countryiso,
+            layer,
+            metadata,
+            get_date_from_title,
+            process_dataset_name,
+        )
+        if record is None:
+            return None, None, None
+        dataset, showcase = self.generate_dataset_and_showcase_from_record(
+            record, metadata, dataset_tags_mapping
+        )
+        return dataset, record.ranges, showcase
+
+    fingerprint_fields = LayerRecord.fields
+
+    def get_config_hash(self) -> str:
+        """
+        Get hash of the configuration used to generate datasets and showcases
+
+        Returns:
+            str: Hash of configuration
+        """
+        config = {
+            "version": __version__,
+            "ignore_data": self.ignore_data,
+            "category_mapping": self.category_mapping,
+            "titleabstract_mapping": self.titleabstract_mapping,
+        }
+        config = json.dumps(config, sort_keys=True, default=str)
+        return hashlib.sha256(config.encode("utf-8")).hexdigest()
+
+    def get_layer_fingerprint(
+        self,
+        countryiso: str,
+        layer: Dict,
+        metadata: Dict,
+        config_hash: str,
+        tags: Optional[List[str]] = None,
+    ) -> str:
+        """
+        Get fingerprint of the fields of a layer that feed generate_dataset_and_showcase
+        together with the configuration and metadata hash. If the fingerprint is
+        unchanged, the generated dataset and showcase will be too.
+
+        Args:
+            countryiso (str): ISO 3 code of country
+            layer (Dict): Data about layer from GeoNode
+            metadata (Dict): Dictionary containing keys: maintainerid, orgid, updatefreq, subnational
+            config_hash (str): Hash of configuration from get_config_hash
+            tags (Optional[List[str]]): Additional tags for dataset. Defaults to None.
+
+        Returns:
+            str: Fingerprint
+        """
+        fingerprint = {
+            "countryiso": countryiso,
+            "layer": {x: layer.get(x) for x in self.fingerprint_fields},
+            # orgname is looked up from orgid and cached in metadata
+            "metadata": {x: y for x, y in metadata.items() if x != "orgname"},
+            "config": config_hash,
+            "tags": tags,
+        }
+        fingerprint = json.dumps(fingerprint, sort_keys=True, default=str)
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+    def plan_uploads(
+        self,
+        countries_layers: Iterable[Tuple[Dict, Iterable[Dict]]],
+        metadata: Dict,
+        get_date_from_title: bool = False,
+        process_dataset_name: Callable[[str], str] = lambda x: x,
+        profiler: Optional[LayerProfiler] = None,
+    ) -> UploadPlan:
+        """
+        Plan which layers to create datasets from before anything is uploaded.
+        Layers are grouped by their dataset name and, for each name, only the
+        layer with the latest maximum date in its title is kept so that each
+        dataset is written once. Ignored and superseded layers are recorded in
+        the plan so that they can be reported. If profiler is given, the
+        parsing of each layer with get_layer_record is profiled and the profile
+        is kept as the context of winning layers so that it can be merged with
+        the profile of their upload. Profiles of layers that lose are dropped
+        and only the fields needed to report them are kept of ignored and
+        superseded layers.
+
+        Args:
+            countries_layers (Iterable[Tuple[Dict, Iterable[Dict]]]): Tuples of (country, layers) as returned by get_countries_layers
+            metadata (Dict): Dictionary containing keys: maintainerid, orgid, updatefreq, subnational
+            get_date_from_title (bool): Whether to remove dates from title. Defaults to False.
+            process_dataset_name (Callable[[str], str]): Function to change the dataset name. Defaults to lambda x: x.
+            profiler (Optional[LayerProfiler]): Profiler of the steps of each uploaded layer. Defaults to None (no profiling).
+
+        Returns:
+            UploadPlan: Plan of layers to create datasets from
+        """
+        plan = UploadPlan()
+        for countrydata, layers in countries_layers:
+            countryiso = countrydata["iso3"]
+            for layer in layers:
+                self.metrics.increment("layers_read")
+                layer_profile = None
+                with self.metrics.time("generate"):
+                    terms = self.log_ignored_terms(layer)
+                    if not terms:
+                        if profiler is not None:
+                            layer_profile = profiler.start(
+                                f"{countryiso} {layer['title']}"
+                            )
+                        record = LayerProfiler.run(
+                            layer_profile,
+                            self.get_layer_record,
+                            countryiso,
+                            layer,
+                            metadata,
+                            get_date_from_title,
+                            process_dataset_name,
+                            check_ignored=False,
+                        )
+                if terms:
+                    self.metrics.increment("layers_ignored")
+                    plan.add_ignored(countryiso, layer["title"], terms)
+                    continue
+                if plan.add(record, layer_profile) is not None:
+                    self.metrics.increment("layers_deduplicated")
+        return plan
+
+    def create_from_record(
+        self,
+        record: LayerRecord,
+        metadata: Dict,
+        create_dataset_showcase: Callable[
+            ["Dataset", "Showcase", Any], None
+        ] = create_dataset_showcase,
+        dataset_tags_mapping: Dict[str, List] = dict(),
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Build the dataset and showcase of a planned layer record and pass them
+        to create_dataset_showcase. Datasets and showcases are only built for
+        layers that are uploaded. If create_dataset_showcase returns decisions
+        like create_changed_dataset_showcase, they are counted in metrics as
+        datasets_created, datasets_updated, datasets_unchanged and the
+        equivalent showcases counters.
+
+        Args:
+            record (LayerRecord): Layer record with dataset name and date ranges
+            metadata (Dict): Dictionary containing keys: maintainerid, orgid, updatefreq, subnational
+            create_dataset_showcase (Callable[[Dataset, Showcase, Any], None]): Function to call to create dataset and showcase
+            dataset_tags_mapping (Dict[str, List]): Mapping from dataset name to additional tags. Defaults to empty dictionary.
+            **kwargs: Args to pass to dataset create_in_hdx call
+
+        Returns:
+            Any: Return value of create_dataset_showcase
+        """
+        with self.metrics.time("generate_objects"):
+            dataset, showcase = self.generate_dataset_and_showcase_from_record(
+                record, metadata, dataset_tags_mapping
+            )
+        with self.metrics.time("create_dataset_showcase"):
+            result = create_dataset_showcase(dataset, showcase, **kwargs)
+        if isinstance(result, dict):
+            for key in ("dataset", "showcase"):
+                decision = result.get(key)
+                if decision:
+                    self.metrics.increment(f"{key}s_{decision}")
+        return result
 
     def generate_datasets_and_showcases(
         self,
         metadata: Dict,
         create_dataset_showcase: Callable[
-            [Dataset, Showcase, Any], None
+            ["Dataset", "Showcase", Any], None
         ] = create_dataset_showcase,
         countrydata: Dict[str, Optional[str]] = None,
         get_date_from_title: bool = False,
         process_dataset_name: Callable[[str], str] = lambda x: x,
         dataset_tags_mapping: Dict[str, List] = dict(),
+        max_fetch_workers: int = 1,
+        page_size: Optional[int] = None,
+        bulk_layers: bool = False,
+        state_store: Optional[LayerStateStore] = None,
+        update_state: bool = True,
+        max_upload_workers: int = 1,
+        upload_rate_limiter: Optional[RateLimiter] = None,
+        checkpoint: Optional[Checkpoint] = None,
+        checkpoint_every: int = 1,
+        resume: bool = False,
+        metrics_path: Optional[str] = None,
+        profiler: Optional[LayerProfiler] = None,
         **kwargs: Any,
     ) -> List[str]:
         """
-        Generate datasets and showcases for all GeoNode layers
+        Generate datasets and showcases for all GeoNode layers. All layers are read
+        and planned with plan_uploads first so that each dataset name is uploaded
+        once from its newest layer. The plan is kept in upload_plan whose
+        get_skipped_report method lists the layers that were superseded. If
+        checkpoint is given,
+        progress is saved to it after every checkpoint_every countries once their
+        uploads have finished and it is deleted when the run completes. With resume,
+        countries done in the last checkpoint are skipped and the names of their
+        datasets are included in the returned list.
 
         Args:
             metadata (Dict): Dictionary containing keys: maintainerid, orgid, updatefreq, subnational
@@ -382,6 +957,18 @@ class GeoNodeToHDX:
             get_date_from_title (bool): Whether to remove dates from title. Defaults to False.
             process_dataset_name (Callable[[str], str]): Function to change the dataset name. Defaults to lambda x: x.
             dataset_tags_mapping (Dict[str, List]): Mapping from dataset name to additional tags. Defaults to empty dictionary.
+            max_fetch_workers (int): Number of workers prefetching layers for countries. Defaults to 1 (no prefetching).
+            page_size (Optional[int]): Number of layers to request per page. Defaults to None (no paging).
+            bulk_layers (bool): Whether to crawl all layers once and index them by region instead of reading regions and then layers per country. Defaults to False.
+            state_store (Optional[LayerStateStore]): Store of layer fingerprints used to skip unchanged layers. Defaults to None (create all).
+            update_state (bool): Whether to record fingerprints of uploaded layers in state_store. Defaults to True.
+            max_upload_workers (int): Number of workers calling create_dataset_showcase. Defaults to 1 (no workers).
+            upload_rate_limiter (Optional[RateLimiter]): Rate limiter for calls to create_dataset_showcase. Defaults to None.
+            checkpoint (Optional[Checkpoint]): Checkpoint in which to save progress. Defaults to None.
+            checkpoint_every (int): Number of countries between checkpoints. Defaults to 1.
+            resume (bool): Whether to resume from checkpoint. Defaults to False.
+            metrics_path (Optional[str]): Path of JSON (.json) or Prometheus textfile to which to write metrics at end. Defaults to None.
+            profiler (Optional[LayerProfiler]): Profiler of the parse, build and create steps of each uploaded layer. Defaults to None (from environment).
             **kwargs: Args to pass to dataset create_in_hdx call
 
         Returns:
@@ -390,74 +977,429 @@ class GeoNodeToHDX:
         """
         logger.info("--------------------------------------------------")
         logger.info(f"> Using HDX Python GeoNode Library {__version__}")
+        region_index = None
         if countrydata:
             countries = [countrydata]
         else:
-            countries = self.get_countries()
+            if bulk_layers:
+                region_index = self.get_region_index(
+                    page_size or 100, compact=True
+                )
+            countries = self.get_countries(region_index=region_index)
             logger.info(f"Number of countries: {len(countries)}")
-        dataset_dates = OrderedDict()
+        countries_done = list()
+        if resume and checkpoint is not None:
+            state = checkpoint.load()
+            if state is not None:
+                countries_done = state["countries"]
+                kwargs.setdefault("batch", state["batch"])
+                for geonode_url in state["geonode_urls"]:
+                    self.geonode_urls.add(geonode_url)
+                logger.info(
+                    f"Resuming from checkpoint with {len(countries_done)} countries done"
+                )
         if "batch" not in kwargs:
             kwargs["batch"] = get_uuid()
+        if state_store is not None:
+            config_hash = self.get_config_hash()
+        if profiler is None:
+            profiler = LayerProfiler.from_environment()
+
+        countries_layers = self.get_countries_layers(
+            countries, max_fetch_workers, page_size, region_index, compact=True
+        )
+        plan = self.plan_uploads(
+            countries_layers,
+            metadata,
+            get_date_from_title,
+            process_dataset_name,
+            profiler,
+        )
+        self.upload_plan = plan
+
+        def upload(planned, fingerprint):
+            # The profile of parsing the layer in plan_uploads is merged with
+            # that of its upload. Only layers that are uploaded are kept.
+            layer_profile = planned.context
+            try:
+                LayerProfiler.run(
+                    layer_profile,
+                    self.create_from_record,
+                    planned.record,
+                    metadata,
+                    create_dataset_showcase,
+                    dataset_tags_mapping,
+                    **kwargs,
+                )
+            finally:
+                planned.release()
+            self.metrics.increment("layers_written")
+            LayerProfiler.finish(layer_profile)
+            if fingerprint is not None and update_state:
+                state_store.set_fingerprint(planned.name, fingerprint)
+
+        upload_pool = WorkerPool(max_upload_workers, upload_rate_limiter)
+        country_winners = plan.get_country_winners()
+        done = set(countries_done)
         for countrydata in countries:
-            layers = self.get_layers(countrydata["layers"])
+            countryiso = countrydata["iso3"]
+            if countryiso in done:
+                continue
+            winners = country_winners.get(countryiso, list())
             logger.info(
-                f'Number of datasets to upload in {countrydata["name"]}: {len(layers)}'
+                f'Number of datasets to upload in {countrydata["name"]}: {len(winners)}'
             )
-            for layer in layers:
-                dataset, ranges, showcase = self.generate_dataset_and_showcase(
-                    countrydata["iso3"],
-                    layer,
-                    metadata,
-                    get_date_from_title,
-                    process_dataset_name,
-                    dataset_tags_mapping=dataset_tags_mapping,
-                )
-                if dataset:
-                    dataset_name = dataset["name"]
-                    max_date = default_date
-                    for range in ranges:
-                        if range[1] > max_date:
-                            max_date = range[1]
-                    prev_max = dataset_dates.get(dataset_name)
-                    if prev_max and prev_max > max_date:
-                        logger.warning(
-                            f'Ignoring {layer["title"]} with max date {max_date}!'
-                            f" {dataset_name} (dates removed) with max date {prev_max} has been created already!"
+            for planned in winners:
+                record = planned.record
+                dataset_name = record.name
+                fingerprint = None
+                if state_store is not None:
+                    fingerprint = self.get_layer_fingerprint(
+                        countryiso,
+                        record,
+                        metadata,
+                        config_hash,
+                        dataset_tags_mapping.get(dataset_name),
+                    )
+                    if (
+                        state_store.get_fingerprint(dataset_name)
+                        == fingerprint
+                    ):
+                        logger.info(
+                            f"Not updating {dataset_name} as layer is unchanged"
                         )
+                        self.metrics.increment("layers_unchanged")
+                        plan.add_unchanged(planned)
                         continue
-                    create_dataset_showcase(dataset, showcase, **kwargs)
-                    dataset_dates[dataset_name] = max_date
-        return list(dataset_dates.keys())
+                upload_pool.submit(dataset_name, upload, planned, fingerprint)
+            if checkpoint is not None:
+                countries_done.append(countryiso)
+                if len(countries_done) % checkpoint_every == 0:
+                    # Only record countries whose uploads have all finished
+                    upload_pool.join()
+                    checkpoint.save(
+                        countries_done,
+                        kwargs["batch"],
+                        self.geonode_urls,
+                    )
+        upload_pool.wait()
+        if checkpoint is not None:
+            checkpoint.delete()
+        if metrics_path:
+            self.metrics.write(metrics_path)
+        if profiler is not None:
+            profiler.write()
+        return plan.get_names()
 
-    def delete_other_datasets(
+    search_fields = ["id", "name", "title", "maintainer", "res_url"]
+
+    def iter_organisation_datasets(
+        self, metadata: Dict, page_size: int = 1000, by_maintainer: bool = True
+    ) -> Iterator["Dataset"]:
+        """
+        Iterate over datasets in HDX of the organisation and, if by_maintainer is
+        True, maintainer in metadata. The filters are applied by HDX, only the
+        fields in search_fields are requested and datasets are read a page at a
+        time. HDX's package_search is called directly as Dataset.search_in_hdx
+        does its own paging. Paging stops once the number of matching datasets it
+        returns have been read. As in Dataset.search_in_hdx, the count is checked
+        on every page: if it changes, datasets were added or deleted while paging
+        so offsets may have shifted and paging restarts from the first page,
+        skipping datasets already yielded. HDXError is raised if the count is
+        still changing after Dataset.max_attempts attempts.
+
+        Args:
+            metadata (Dict): Dictionary containing keys: maintainerid, orgid, updatefreq, subnational
+            page_size (int): Number of datasets to request per page. Defaults to 1000.
+            by_maintainer (bool): Whether to only include datasets of maintainer. Defaults to True.
+
+        Returns:
+            Iterator[Dataset]: Datasets of organisation and maintainer
+        """
+        from hdx.api.configuration import Configuration
+        from hdx.data.dataset import Dataset
+        from hdx.data.hdxobject import HDXError
+
+        fq = f"organization:{self.get_orgname(metadata)}"
+        if by_maintainer:
+            fq = f'{fq} AND maintainer:"{metadata["maintainerid"]}"'
+        configuration = Configuration.read()
+        yielded = set()
+        attempts = 1
+        count = None
+        start = 0
+        while True:
+            result = configuration.call_remoteckan(
+                Dataset.actions()["search"],
+                {
+                    "q": "*:*",
+                    "fq": fq,
+                    "fl": self.search_fields,
+                    "rows": page_size,
+                    "start": start,
+                    "sort": "metadata_created asc",
+                },
+            )
+            if count is None:
+                count = result["count"]
+            elif result["count"] != count:
+                if attempts == Dataset.max_attempts:
+                    raise HDXError(
+                        "Maximum attempts reached for searching for datasets!"
+                    )
+                logger.warning(
+                    f"Number of datasets changed from {count} to {result['count']} while paging. Restarting search!"
+                )
+                attempts += 1
+                count = None
+                start = 0
+                continue
+            results = result["results"]
+            for datasetdict in results:
+                name = datasetdict["name"]
+                if name in yielded:
+                    continue
+                yielded.add(name)
+                yield Dataset(datasetdict)
+            start += len(results)
+            if not results or start >= count:
+                break
+
+    @staticmethod
+    def get_resource_url(dataset: "Dataset") -> str:
+        """
+        Get url of first resource of dataset from the res_url search field if present
+        or otherwise from the dataset's resources
+
+        Args:
+            dataset (Dataset): Dataset
+
+        Returns:
+            str: Url of first resource or empty string if there are no resources
+        """
+        res_urls = dataset.get("res_url")
+        if res_urls:
+            return res_urls[0]
+        resources = dataset.get_resources()
+        if resources:
+            return resources[0]["url"]
+        return ""
+
+    def delete_datasets(
+        self,
+        datasets: List["Dataset"],
+        delete_from_hdx: Callable[["Dataset"], None] = delete_from_hdx,
+        max_delete_workers: int = 1,
+        delete_rate_limiter: Optional[RateLimiter] = None,
+        max_deletions: Optional[int] = None,
+    ) -> Dict:
+        """
+        Delete datasets and associated showcases using up to max_delete_workers
+        threads optionally rate limited by delete_rate_limiter. A failure to delete
+        one dataset is logged and does not stop the others being deleted. If there
+        are more than max_deletions datasets, nothing is deleted as this suggests a
+        misconfigured run.
+
+        Args:
+            datasets (List[Dataset]): Datasets to delete
+            delete_from_hdx (Callable[[Dataset], None]): Function to call to delete dataset
+            max_delete_workers (int): Number of datasets to delete concurrently. Defaults to 1.
+            delete_rate_limiter (Optional[RateLimiter]): Rate limiter applied to deletions. Defaults to None.
+            max_deletions (Optional[int]): Maximum number of datasets that may be deleted. Defaults to None (no maximum).
+
+        Returns:
+            Dict: Summary with keys stale, deleted (list of names), failed (dictionary of name to error) and capped
+        """
+        if max_deletions is not None and len(datasets) > max_deletions:
+            logger.error(
+                f"Not deleting {len(datasets)} stale datasets of {self.geonode_urls[0]} as this is more than the maximum of {max_deletions}!"
+            )
+            return {
+                "stale": len(datasets),
+                "deleted": list(),
+                "failed": dict(),
+                "capped": True,
+            }
+        deleted = list()
+        failed = dict()
+
+        def delete(dataset: "Dataset") -> None:
+            name = dataset["name"]
+            logger.info(f"Deleting {dataset['title']}")
+            try:
+                with self.metrics.time("delete"):
+                    delete_from_hdx(dataset)
+            except Exception as ex:
+                logger.exception(f"Failed to delete {name}!")
+                self.metrics.increment("deletions_failed")
+                failed[name] = str(ex)
+            else:
+                self.metrics.increment("datasets_deleted")
+                deleted.append(name)
+
+        delete_pool = WorkerPool(max_delete_workers, delete_rate_limiter)
+        for dataset in datasets:
+            delete_pool.submit(dataset["name"], delete, dataset)
+        delete_pool.wait()
+        logger.info(
+            f"Deleted {len(deleted)} of {len(datasets)} stale datasets with {len(failed)} failures"
+        )
+        return {
+            "stale": len(datasets),
+            "deleted": deleted,
+            "failed": failed,
+            "capped": False,
+        }
+
+    def get_stale_datasets(
         self,
         datasets_to_keep: List[str],
         metadata: Dict,
-        delete_from_hdx: Callable[[Dataset], None] = delete_from_hdx,
-    ) -> None:
+        page_size: int = 1000,
+        datasets: Optional[Iterable["Dataset"]] = None,
+    ) -> List["Dataset"]:
         """
-        Delete all GeoNode datasets and associated showcases in HDX where layers have been deleted from
-        the GeoNode server.
+        Get GeoNode datasets in HDX of the organisation and maintainer in metadata
+        that are not in datasets_to_keep and have resources on one of the GeoNode
+        servers
 
         Args:
             datasets_to_keep (List[str]): List of dataset names that are to be kept (they were added or updated)
             metadata (Dict): Dictionary containing keys: maintainerid, orgid, updatefreq, subnational
-            delete_from_hdx (Callable[[Dataset], None]): Function to call to delete dataset
+            page_size (int): Number of datasets to request per page when searching HDX. Defaults to 1000.
+            datasets (Optional[Iterable[Dataset]]): Datasets to check. Defaults to None (search HDX).
 
         Returns:
-            None
-
+            List[Dataset]: Stale datasets
         """
-        for dataset in Dataset.search_in_hdx(
-            fq=f"organization:{self.get_orgname(metadata)}"
-        ):
+        if datasets is None:
+            datasets = self.iter_organisation_datasets(metadata, page_size)
+        datasets_to_keep = set(datasets_to_keep)
+        stale_datasets = list()
+        for dataset in datasets:
             if dataset["maintainer"] != metadata["maintainerid"]:
                 continue
             if dataset["name"] in datasets_to_keep:
                 continue
-            if not any(
-                x in dataset.get_resource()["url"] for x in self.geonode_urls
-            ):
+            if not self.geonode_urls.matches(self.get_resource_url(dataset)):
                 continue
-            logger.info(f"Deleting {dataset['title']}")
-            delete_from_hdx(dataset)
+            stale_datasets.append(dataset)
+        return stale_datasets
+
+    def delete_other_datasets(
+        self,
+        datasets_to_keep: List[str],
+        metadata: Dict,
+        delete_from_hdx: Callable[["Dataset"], None] = delete_from_hdx,
+        page_size: int = 1000,
+        max_delete_workers: int = 1,
+        delete_rate_limiter: Optional[RateLimiter] = None,
+        max_deletions: Optional[int] = None,
+    ) -> Dict:
+        """
+        Delete all GeoNode datasets and associated showcases in HDX where layers have been deleted from
+        the GeoNode server. All datasets to delete are found before any are deleted so that deletions
+        do not shift the pages of search results. If there are more than max_deletions datasets to
+        delete, nothing is deleted as this suggests a misconfigured run.
+
+        Args:
+            datasets_to_keep (List[str]): List of dataset names that are to be kept (they were added or updated)
+            metadata (Dict): Dictionary containing keys: maintainerid, orgid, updatefreq, subnational
+            delete_from_hdx (Callable[[Dataset], None]): Function to call to delete dataset
+            page_size (int): Number of datasets to request per page when searching HDX. Defaults to 1000.
+            max_delete_workers (int): Number of datasets to delete concurrently. Defaults to 1.
+            delete_rate_limiter (Optional[RateLimiter]): Rate limiter applied to deletions. Defaults to None.
+            max_deletions (Optional[int]): Maximum number of datasets that may be deleted. Defaults to None (no maximum).
+
+        Returns:
+            Dict: Summary with keys stale, deleted (list of names), failed (dictionary of name to error) and capped
+
+        """
+        datasets_to_delete = self.get_stale_datasets(
+            datasets_to_keep, metadata, page_size
+        )
+        return self.delete_datasets(
+            datasets_to_delete,
+            delete_from_hdx,
+            max_delete_workers,
+            delete_rate_limiter,
+            max_deletions,
+        )
+
+    def write_plan(
+        self,
+        path: str,
+        metadata: Dict,
+        countrydata: Dict[str, Optional[str]] = None,
+        get_date_from_title: bool = False,
+        process_dataset_name: Callable[[str], str] = lambda x: x,
+        dataset_tags_mapping: Dict[str, List] = dict(),
+        max_fetch_workers: int = 1,
+        page_size: Optional[int] = None,
+        bulk_layers: bool = False,
+        state_store: Optional[LayerStateStore] = None,
+        delete_page_size: int = 1000,
+        max_deletions: Optional[int] = None,
+    ) -> Dict:
+        """
+        Dry run of generate_datasets_and_showcases followed by delete_other_datasets
+        that writes nothing to HDX or state_store. The datasets of the organisation,
+        whatever their maintainer, are read from HDX once to tell creates from
+        updates and to find stale datasets. The plan, with the payload of every dataset and showcase that
+        would be created or updated, every skipped layer with the reason and every
+        dataset that would be deleted, is written to path as JSON (if it ends in
+        .json) or JSON Lines.
+
+        Args:
+            path (str): Path of file to which to write plan
+            metadata (Dict): Dictionary containing keys: maintainerid, orgid, updatefreq, subnational
+            countrydata (Dict[str, Optional[str]]): Dictionary of countrydata. Defaults to None (read from GeoNode).
+            get_date_from_title (bool): Whether to remove dates from title. Defaults to False.
+            process_dataset_name (Callable[[str], str]): Function to change the dataset name. Defaults to lambda x: x.
+            dataset_tags_mapping (Dict[str, List]): Mapping from dataset name to additional tags. Defaults to empty dictionary.
+            max_fetch_workers (int): Number of workers prefetching layers for countries. Defaults to 1 (no prefetching).
+            page_size (Optional[int]): Number of layers to request per page. Defaults to None (no paging).
+            bulk_layers (bool): Whether to crawl all layers once and index them by region instead of reading regions and then layers per country. Defaults to False.
+            state_store (Optional[LayerStateStore]): Store of layer fingerprints used to skip unchanged layers. Defaults to None (create all).
+            delete_page_size (int): Number of datasets to request per page when searching HDX. Defaults to 1000.
+            max_deletions (Optional[int]): Maximum number of datasets that may be deleted. Defaults to None (no maximum).
+
+        Returns:
+            Dict: Summary with keys create, update, skip, delete and capped
+        """
+        # Names are unique in HDX so an update may be of another maintainer's
+        # dataset. Only datasets of the maintainer can be stale.
+        existing = list(
+            self.iter_organisation_datasets(
+                metadata, delete_page_size, by_maintainer=False
+            )
+        )
+        plan_writer = PlanWriter(x["name"] for x in existing)
+        datasets_to_keep = self.generate_datasets_and_showcases(
+            metadata,
+            create_dataset_showcase=plan_writer.create_dataset_showcase,
+            countrydata=countrydata,
+            get_date_from_title=get_date_from_title,
+            process_dataset_name=process_dataset_name,
+            dataset_tags_mapping=dataset_tags_mapping,
+            max_fetch_workers=max_fetch_workers,
+            page_size=page_size,
+            bulk_layers=bulk_layers,
+            state_store=state_store,
+            update_state=False,
+        )
+        plan_writer.add_skips(self.upload_plan.get_skipped_report())
+        stale_datasets = self.get_stale_datasets(
+            datasets_to_keep, metadata, datasets=existing
+        )
+        capped = (
+            max_deletions is not None and len(stale_datasets) > max_deletions
+        )
+        plan_writer.add_deletes(stale_datasets, capped)
+        plan_writer.write(path)
+        summary = plan_writer.get_summary()
+        logger.info(
+            f"Plan written to {path}: {summary['create']} creates, {summary['update']} updates, "
+            f"{summary['skip']} skips and {summary['delete']} deletes"
+        )
+        return summary
@@ -0,0 +1,161 @@
+"""
+GeoNode Hosts:
+--------------
+
+Sequence of GeoNode server urls with a matcher for urls on those servers.
+
+"""
+import re
+from collections.abc import Sequence
+from threading import RLock
+from typing import (
+    Any,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Set,
+    Union,
+)
+
+
+class GeoNodeHosts(Sequence):
+    """
+    Sequence of GeoNode server urls that wraps a list and can only be changed
+    through append, extend (or +=), insert and add so that the set of urls and
+    the pattern used to check whether a url is on a known GeoNode server are
+    always up to date. As when the urls were kept in a plain list, a url is on
+    a GeoNode server if any of the server urls is contained in it. That is
+    checked with one regular expression search whose cost still grows with the
+    number of server urls, since urls like proxy urls can contain a server url
+    anywhere. Checking whether a server url is already known when adding it is
+    a set lookup. The first url is the main server. Changes are thread safe.
+
+    Args:
+        urls (Iterable[str]): GeoNode server urls
+    """
+
+    def __init__(self, urls: Iterable[str] = tuple()) -> None:
+        self.lock = RLock()
+        self.urls: List[str] = list()
+        self.url_set: Set[str] = set()
+        self.pattern: Optional[Pattern] = None
+        self.extend(urls)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        return self.urls[index]
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.urls))
+
+    def __contains__(self, url: Any) -> bool:
+        return url in self.url_set
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, GeoNodeHosts):
+            other = other.urls
+        return self.urls == other
+
+    def __repr__(self) -> str:
+        return f"GeoNodeHosts({self.urls!r})"
+
+    def __iadd__(self, urls: Iterable[str]) -> "GeoNodeHosts":
+        self.extend(urls)
+        return self
+
+    def compile_pattern(self) -> None:
+        """
+        Update the set of GeoNode server urls and compile the pattern matching any
+        of them. Must be called with the lock held.
+
+        Returns:
+            None
+        """
+        self.url_set = set(self.urls)
+        if self.urls:
+            # Longest first so that alternation order never matters
+            urls = sorted(set(self.urls), key=len, reverse=True)
+            self.pattern = re.compile("|".join(re.escape(x) for x in urls))
+        else:
+            self.pattern = None
+
+    def append(self, url: str) -> None:
+        """
+        Append GeoNode server url
+
+        Args:
+            url (str): GeoNode server url
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.urls.append(url)
+            self.compile_pattern()
+
+    def extend(self, urls: Iterable[str]) -> None:
+        """
+        Append GeoNode server urls
+
+        Args:
+            urls (Iterable[str]): GeoNode server urls
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.urls.extend(urls)
+            self.compile_pattern()
+
+    def insert(self, index: int, url: str) -> None:
+        """
+        Insert GeoNode server url
+
+        Args:
+            index (int): Position at which to insert url
+            url (str): GeoNode server url
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.urls.insert(index, url)
+            self.compile_pattern()
+
+    def add(self, url: str) -> bool:
+        """
+        Append GeoNode server url if it isn't already in list
+
+        Args:
+            url (str): GeoNode server url
+
+        Returns:
+            bool: True if url was appended, False if it was already in list
+        """
+        with self.lock:
+            if url in self.url_set:
+                return False
+            self.append(url)
+            return True
+
+    def matches(self, url: Optional[str]) -> bool:
+        """
+        Check if url is on a known GeoNode server ie. contains one of the GeoNode
+        server urls
+
+        Args:
+            url (Optional[str]): Url to check
+
+        Returns:
+            bool: True if url contains a GeoNode server url
+        """
+        if not url:
+            return False
+        pattern = self.pattern
+        if pattern is None:
+            return False
+        return pattern.search(url) is not None
@@ -0,0 +1,96 @@
+"""
+Layer Record:
+-------------
+
+Compact record of the fields of a GeoNode layer that the scraper uses.
+
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+class LayerRecord:
+    """
+    Compact record of a GeoNode layer keeping only the fields in fields rather
+    than the dozens returned by the GeoNode API. Fields can be read like those of
+    a dictionary so that a record can be used wherever a layer dictionary is. It
+    also holds the ISO 3 code of the country, the dataset title and name and the
+    date ranges in the layer title, which are worked out before deciding whether
+    a dataset needs to be created for the layer.
+
+    Args:
+        **kwargs: Values of fields. Missing fields are None.
+    """
+
+    fields = (
+        "title",
+        "abstract",
+        "supplemental_information",
+        "date",
+        "category__gn_description",
+        "srid",
+        "detail_url",
+        "thumbnail_url",
+    )
+    __slots__ = fields + ("countryiso", "dataset_title", "name", "ranges")
+
+    def __init__(self, **kwargs: Any) -> None:
+        for field in self.fields:
+            setattr(self, field, kwargs.get(field))
+        self.countryiso: Optional[str] = None
+        self.dataset_title: Optional[str] = None
+        self.name: Optional[str] = None
+        self.ranges: List[Tuple[datetime, datetime]] = list()
+
+    @classmethod
+    def from_layer(cls, layer: Union[Dict, "LayerRecord"]) -> "LayerRecord":
+        """
+        Create record from GeoNode layer dictionary or from the fields of
+        another record. The new record has no country, dataset title, name or
+        ranges so that a record shared by several regions can be given those of
+        each country.
+
+        Args:
+            layer (Union[Dict, LayerRecord]): Data about layer from GeoNode or a record
+
+        Returns:
+            LayerRecord: New record of layer
+        """
+        if isinstance(layer, LayerRecord):
+            return cls(**layer.to_dict())
+        return cls(**{x: layer.get(x) for x in cls.fields})
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get value of field
+
+        Args:
+            key (str): Field
+            default (Any): Value to return if field isn't in record or is None. Defaults to None.
+
+        Returns:
+            Any: Value of field
+        """
+        if key not in self.fields:
+            return default
+        value = getattr(self, key)
+        if value is None:
+            return default
+        return value
+
+    def to_dict(self) -> Dict:
+        """
+        Get fields of record as a dictionary
+
+        Returns:
+            Dict: Fields of record
+        """
+        return {x: getattr(self, x) for x in self.fields}
+
+    def __repr__(self) -> str:
+        return f"LayerRecord({self.title!r})"
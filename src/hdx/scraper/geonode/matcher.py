@@ -0,0 +1,103 @@
+"""
+Keyword Matcher:
+----------------
+
+Finds which of many keywords occur in a text, checking each keyword in turn for
+short keyword lists and in one pass using the Aho-Corasick algorithm for long
+ones.
+
+"""
+from collections import deque
+from typing import FrozenSet, Iterable, List, Optional, Set
+
+
+class KeywordMatcher:
+    """
+    Matcher for a collection of keywords. find returns every keyword that occurs
+    anywhere in a text, the same result as checking keyword in text for each
+    keyword. The substring checks run in C so they are quicker than a pure
+    Python automaton until there are about a hundred keywords (see
+    benchmarks/benchmark_matcher.py). With more than max_substring_keywords
+    keywords, an Aho-Corasick automaton is compiled instead and find makes a
+    single pass over the text.
+
+    Args:
+        keywords (Iterable[str]): Keywords to match
+        max_substring_keywords (int): Maximum number of keywords checked one by one. Defaults to 100.
+    """
+
+    def __init__(
+        self, keywords: Iterable[str], max_substring_keywords: int = 100
+    ) -> None:
+        self.keywords = list(keywords)
+        self.always = set()
+        self.goto: Optional[List[dict]] = None
+        self.fail: Optional[List[int]] = None
+        self.outputs: Optional[List[FrozenSet[str]]] = None
+        if len(self.keywords) > max_substring_keywords:
+            self.compile()
+
+    def compile(self) -> None:
+        """
+        Compile keywords into an Aho-Corasick automaton
+
+        Returns:
+            None
+        """
+        goto: List[dict] = [dict()]
+        outputs: List[Set[str]] = [set()]
+        for keyword in self.keywords:
+            if not keyword:
+                # The empty string is in every text
+                self.always.add(keyword)
+                continue
+            node = 0
+            for char in keyword:
+                nextnode = goto[node].get(char)
+                if nextnode is None:
+                    nextnode = len(goto)
+                    goto.append(dict())
+                    outputs.append(set())
+                    goto[node][char] = nextnode
+                node = nextnode
+            outputs[node].add(keyword)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, nextnode in goto[node].items():
+                queue.append(nextnode)
+                failnode = fail[node]
+                while failnode and char not in goto[failnode]:
+                    failnode = fail[failnode]
+                fail[nextnode] = goto[failnode].get(char, 0)
+                outputs[nextnode] |= outputs[fail[nextnode]]
+        self.goto = goto
+        self.fail = fail
+        self.outputs = [frozenset(output) for output in outputs]
+
+    def find(self, text: str) -> Set[str]:
+        """
+        Find all keywords that occur in text
+
+        Args:
+            text (str): Text to search
+
+        Returns:
+            Set[str]: Keywords found in text
+        """
+        goto = self.goto
+        if goto is None:
+            return {keyword for keyword in self.keywords if keyword in text}
+        found = set(self.always)
+        fail = self.fail
+        outputs = self.outputs
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            output = outputs[node]
+            if output:
+                found.update(output)
+        return found
@@ -0,0 +1,199 @@
+"""
+Metrics:
+--------
+
+Timings of the stages of a run and counts of what happened to layers, which can
+be written as a Prometheus textfile or a JSON summary.
+
+"""
+import json
+import time
+from contextlib import contextmanager
+from os import replace
+from threading import Lock
+from typing import Dict, Iterator, Sequence
+
+
+class Metrics:
+    """
+    Thread safe histograms of the time taken by each stage of a run and counters
+    of events such as layers ignored or written. Stage times are in seconds and
+    are put in cumulative buckets with upper bounds given by buckets as in
+    Prometheus histograms.
+
+    Args:
+        buckets (Sequence[float]): Upper bounds of histogram buckets in seconds. Defaults to default_buckets.
+    """
+
+    default_buckets = (
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+        30.0,
+        60.0,
+    )
+
+    def __init__(self, buckets: Sequence[float] = default_buckets) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.lock = Lock()
+        self.counters: Dict[str, int] = dict()
+        self.stages: Dict[str, Dict] = dict()
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """
+        Add value to counter
+
+        Args:
+            name (str): Name of counter
+            value (int): Value to add. Defaults to 1.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """
+        Record time taken by a stage
+
+        Args:
+            stage (str): Name of stage
+            seconds (float): Time taken in seconds
+
+        Returns:
+            None
+        """
+        with self.lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = {
+                    "count": 0,
+                    "sum": 0.0,
+                    "max": 0.0,
+                    "buckets": [0] * len(self.buckets),
+                }
+                self.stages[stage] = histogram
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+            if seconds > histogram["max"]:
+                histogram["max"] = seconds
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram["buckets"][i] += 1
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """
+        Context manager recording the time taken by the code it wraps as a stage
+
+        Args:
+            stage (str): Name of stage
+
+        Returns:
+            Iterator[None]: Context manager
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def get_summary(self) -> Dict:
+        """
+        Get summary of counters and stage times. For each stage, it has the count,
+        total, mean and maximum seconds and the cumulative bucket counts.
+
+        Returns:
+            Dict: Summary with keys counters and stages
+        """
+        with self.lock:
+            stages = dict()
+            for stage, histogram in self.stages.items():
+                stages[stage] = {
+                    "count": histogram["count"],
+                    "sum": histogram["sum"],
+                    "mean": histogram["sum"] / histogram["count"],
+                    "max": histogram["max"],
+                    "buckets": {
+                        str(bound): count
+                        for bound, count in zip(
+                            self.buckets, histogram["buckets"]
+                        )
+                    },
+                }
+            return {"counters": dict(self.counters), "stages": stages}
+
+    def get_prometheus_text(self, prefix: str = "hdx_geonode") -> str:
+        """
+        Get counters and stage times in Prometheus text exposition format
+
+        Args:
+            prefix (str): Prefix of metric names. Defaults to "hdx_geonode".
+
+        Returns:
+            str: Metrics in Prometheus text format
+        """
+        lines = list()
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                metric = f"{prefix}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+            if self.stages:
+                metric = f"{prefix}_stage_seconds"
+                lines.append(
+                    f"# HELP {metric} Time taken by each stage of a run"
+                )
+                lines.append(f"# TYPE {metric} histogram")
+            for stage, histogram in sorted(self.stages.items()):
+                label = f'stage="{stage}"'
+                for bound, count in zip(self.buckets, histogram["buckets"]):
+                    lines.append(
+                        f'{metric}_bucket{{{label},le="{bound}"}} {count}'
+                    )
+                lines.append(
+                    f'{metric}_bucket{{{label},le="+Inf"}} {histogram["count"]}'
+                )
+                lines.append(f'{metric}_sum{{{label}}} {histogram["sum"]}')
+                lines.append(f'{metric}_count{{{label}}} {histogram["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        Write metrics atomically to a JSON summary if path ends in .json or a
+        Prometheus textfile otherwise
+
+        Args:
+            path (str): Path of file to write
+
+        Returns:
+            None
+        """
+        if path.endswith(".json"):
+            text = json.dumps(self.get_summary(), indent=1)
+        else:
+            text = self.get_prometheus_text()
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        replace(temp_path, path)
+
+    def clear(self) -> None:
+        """
+        Delete all counters and stage times
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.counters = dict()
+            self.stages = dict()
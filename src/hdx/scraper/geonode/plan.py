@@ -0,0 +1,428 @@
+"""
+Upload Plan:
+------------
+
+Plan of the datasets to create from GeoNode layers made before anything is
+uploaded so that each dataset name is written once, and the writer of dry run
+plans of what a run would do in HDX.
+
+"""
+import json
+import logging
+from datetime import datetime
+from os import replace
+from threading import Lock
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+)
+
+from hdx.utilities.dateparse import default_date
+
+from .layer import LayerRecord
+
+if TYPE_CHECKING:
+    from hdx.data.dataset import Dataset
+    from hdx.data.showcase import Showcase
+
+logger = logging.getLogger(__name__)
+
+
+class PlannedLayer:
+    """
+    Layer record in a plan with the maximum date of the ranges in its title and
+    any context, like a layer profile, that is needed when it is uploaded. The
+    country, title and dataset name are copied from the record so that release
+    can drop the record, with its abstract, once the layer has been uploaded.
+
+    Args:
+        record (LayerRecord): Layer record with dataset name and date ranges
+        max_date (datetime): Maximum date of ranges in title
+        context (Any): Context to keep with layer record. Defaults to None.
+    """
+
+    __slots__ = (
+        "record",
+        "countryiso",
+        "title",
+        "name",
+        "max_date",
+        "context",
+    )
+
+    def __init__(
+        self, record: LayerRecord, max_date: datetime, context: Any = None
+    ) -> None:
+        self.record: Optional[LayerRecord] = record
+        self.countryiso = record.countryiso
+        self.title = record.title
+        self.name = record.name
+        self.max_date = max_date
+        self.context = context
+
+    def release(self) -> None:
+        """
+        Drop the layer record and context once they are no longer needed
+
+        Returns:
+            None
+        """
+        self.record = None
+        self.context = None
+
+
+class SkippedLayer:
+    """
+    Layer that is not uploaded keeping only what is needed to report it rather
+    than its whole layer record
+
+    Args:
+        countryiso (str): ISO 3 code of country
+        title (str): Title of layer
+        name (Optional[str]): Dataset name. Defaults to None.
+        max_date (Optional[datetime]): Maximum date of ranges in title. Defaults to None.
+        terms (Optional[List[str]]): Ignored terms found in abstract. Defaults to None.
+    """
+
+    __slots__ = ("countryiso", "title", "name", "max_date", "terms")
+
+    def __init__(
+        self,
+        countryiso: str,
+        title: str,
+        name: Optional[str] = None,
+        max_date: Optional[datetime] = None,
+        terms: Optional[List[str]] = None,
+    ) -> None:
+        self.countryiso = countryiso
+        self.title = title
+        self.name = name
+        self.max_date = max_date
+        self.terms = terms
+
+    @classmethod
+    def from_planned(cls, planned: PlannedLayer) -> "SkippedLayer":
+        """
+        Create skipped layer from planned layer
+
+        Args:
+            planned (PlannedLayer): Planned layer
+
+        Returns:
+            SkippedLayer: Skipped layer
+        """
+        return cls(
+            planned.countryiso, planned.title, planned.name, planned.max_date
+        )
+
+
+class UploadPlan:
+    """
+    Layer records grouped by the name of the dataset that would be created from
+    them. For each name, the layer with the latest maximum date in its title
+    wins. If several layers have the same maximum date, the last one wins as it
+    is the one that would have been left in HDX had they all been uploaded in
+    turn. Names keep the order in which they were first seen. Layers that lose
+    are kept in skipped so that they can be reported along with layers that were
+    ignored and winners that were not uploaded as they were unchanged. Only the
+    fields needed for the report are kept for them.
+    """
+
+    def __init__(self) -> None:
+        self.winners: Dict[str, PlannedLayer] = dict()
+        self.skipped: List[SkippedLayer] = list()
+        self.ignored: List[SkippedLayer] = list()
+        self.unchanged: List[SkippedLayer] = list()
+
+    @staticmethod
+    def get_max_date(record: LayerRecord) -> datetime:
+        """
+        Get the maximum date from the date ranges in a layer record's title
+
+        Args:
+            record (LayerRecord): Layer record
+
+        Returns:
+            datetime: Maximum date or default date if there are no ranges
+        """
+        max_date = default_date
+        for range in record.ranges:
+            if range[1] > max_date:
+                max_date = range[1]
+        return max_date
+
+    def add(
+        self, record: LayerRecord, context: Any = None
+    ) -> Optional[PlannedLayer]:
+        """
+        Add layer record to plan replacing the current winner for its dataset
+        name if it is not newer
+
+        Args:
+            record (LayerRecord): Layer record with dataset name and date ranges
+            context (Any): Context to keep with layer record. Defaults to None.
+
+        Returns:
+            Optional[PlannedLayer]: Layer that was skipped (either the record or the one it replaced) or None
+        """
+        planned = PlannedLayer(record, self.get_max_date(record), context)
+        current = self.winners.get(record.name)
+        if current is None:
+            self.winners[record.name] = planned
+            return None
+        if current.max_date > planned.max_date:
+            loser, winner = planned, current
+        else:
+            # Replacing the value keeps the position of the name
+            self.winners[record.name] = planned
+            loser, winner = current, planned
+        logger.warning(
+            f"Ignoring {loser.title} with max date {loser.max_date}!"
+            f" {record.name} (dates removed) is created from {winner.title} with max date {winner.max_date}!"
+        )
+        self.skipped.append(SkippedLayer.from_planned(loser))
+        return loser
+
+    def add_ignored(
+        self, countryiso: str, title: str, terms: List[str]
+    ) -> None:
+        """
+        Add layer that was ignored because of terms in its abstract
+
+        Args:
+            countryiso (str): ISO 3 code of country
+            title (str): Title of layer
+            terms (List[str]): Ignored terms found in abstract
+
+        Returns:
+            None
+        """
+        self.ignored.append(SkippedLayer(countryiso, title, terms=terms))
+
+    def add_unchanged(self, planned: PlannedLayer) -> None:
+        """
+        Add winning layer that was not uploaded as it is unchanged releasing its
+        layer record
+
+        Args:
+            planned (PlannedLayer): Winning layer
+
+        Returns:
+            None
+        """
+        self.unchanged.append(SkippedLayer.from_planned(planned))
+        planned.release()
+
+    def __len__(self) -> int:
+        return len(self.winners)
+
+    def get_names(self) -> List[str]:
+        """
+        Get dataset names in the order they were first seen
+
+        Returns:
+            List[str]: Dataset names
+        """
+        return list(self.winners.keys())
+
+    def get_country_winners(self) -> Dict[str, List[PlannedLayer]]:
+        """
+        Get winning layers grouped by the ISO 3 code of their country. Within
+        each country, layers are in the order their dataset names were first
+        seen.
+
+        Returns:
+            Dict[str, List[PlannedLayer]]: ISO 3 code to winning layers
+        """
+        country_winners = dict()
+        for planned in self.winners.values():
+            countryiso = planned.countryiso
+            country_winners.setdefault(countryiso, list()).append(planned)
+        return country_winners
+
+    def get_skipped_report(self) -> List[Dict]:
+        """
+        Get report of skipped layers giving for each the reason (ignored,
+        superseded or unchanged), its country and title. Ignored layers have the
+        ignored terms found in their abstracts. Superseded and unchanged layers
+        have the dataset name and maximum date and superseded layers also have
+        the title and maximum date of the layer from which the dataset is
+        created.
+
+        Returns:
+            List[Dict]: Skipped layers
+        """
+        report = list()
+        for skipped in self.ignored:
+            report.append(
+                {
+                    "reason": "ignored",
+                    "countryiso": skipped.countryiso,
+                    "title": skipped.title,
+                    "terms": skipped.terms,
+                }
+            )
+        for skipped in self.skipped:
+            winner = self.winners[skipped.name]
+            report.append(
+                {
+                    "reason": "superseded",
+                    "countryiso": skipped.countryiso,
+                    "title": skipped.title,
+                    "name": skipped.name,
+                    "max_date": skipped.max_date.isoformat(),
+                    "winner_title": winner.title,
+                    "winner_max_date": winner.max_date.isoformat(),
+                }
+            )
+        for skipped in self.unchanged:
+            report.append(
+                {
+                    "reason": "unchanged",
+                    "countryiso": skipped.countryiso,
+                    "title": skipped.title,
+                    "name": skipped.name,
+                    "max_date": skipped.max_date.isoformat(),
+                }
+            )
+        return report
+
+
+class PlanWriter:
+    """
+    Records what a run would do in HDX without writing to it. Its
+    create_dataset_showcase method can be passed to
+    generate_datasets_and_showcases in place of the function that writes to HDX
+    and records the dataset and showcase payloads, classed as a create or an
+    update depending on whether the dataset name is in existing_names. Skipped
+    layers and stale datasets that would be deleted are added afterwards. write
+    saves the plan as compact JSON (if the path ends in .json) or JSON Lines.
+
+    Args:
+        existing_names (Iterable[str]): Names of datasets already in HDX. Defaults to empty list.
+    """
+
+    def __init__(self, existing_names: Iterable[str] = tuple()) -> None:
+        self.existing_names: Set[str] = set(existing_names)
+        self.lock = Lock()
+        self.upserts: List[Dict] = list()
+        self.skips: List[Dict] = list()
+        self.deletes: List[Dict] = list()
+        self.capped = False
+
+    def create_dataset_showcase(
+        self, dataset: "Dataset", showcase: "Showcase", **kwargs: Any
+    ) -> None:
+        """
+        Record dataset and showcase that would be created or updated. As in
+        create_dataset_showcase, the dataset is first updated from the static
+        dataset YAML of HDX Python API so that its payload is what would be
+        sent.
+
+        Args:
+            dataset (Dataset): Dataset
+            showcase (Showcase): Showcase
+            **kwargs: Args that would be passed to dataset create_in_hdx call
+
+        Returns:
+            None
+        """
+        if dataset["name"] in self.existing_names:
+            action = "update"
+        else:
+            action = "create"
+        dataset.update_from_yaml()
+        resources = [x.data for x in dataset.get_resources()]
+        entry = {
+            "action": action,
+            "name": dataset["name"],
+            "dataset": dict(dataset.data, resources=resources),
+            "showcase": showcase.data,
+        }
+        with self.lock:
+            self.upserts.append(entry)
+
+    def add_skips(self, report: List[Dict]) -> None:
+        """
+        Add skipped layers from UploadPlan.get_skipped_report
+
+        Args:
+            report (List[Dict]): Skipped layers
+
+        Returns:
+            None
+        """
+        for skipped in report:
+            self.skips.append(dict(action="skip", **skipped))
+
+    def add_deletes(
+        self, datasets: List["Dataset"], capped: bool = False
+    ) -> None:
+        """
+        Add stale datasets that would be deleted
+
+        Args:
+            datasets (List[Dataset]): Stale datasets
+            capped (bool): Whether nothing would be deleted as there are too many stale datasets. Defaults to False.
+
+        Returns:
+            None
+        """
+        for dataset in datasets:
+            self.deletes.append(
+                {
+                    "action": "delete",
+                    "name": dataset["name"],
+                    "title": dataset.get("title"),
+                }
+            )
+        self.capped = capped
+
+    def get_summary(self) -> Dict:
+        """
+        Get number of datasets that would be created, updated and deleted and
+        number of layers skipped
+
+        Returns:
+            Dict: Summary with keys create, update, skip, delete and capped
+        """
+        summary = {"create": 0, "update": 0}
+        for entry in self.upserts:
+            summary[entry["action"]] += 1
+        summary["skip"] = len(self.skips)
+        summary["delete"] = len(self.deletes)
+        summary["capped"] = self.capped
+        return summary
+
+    def write(self, path: str) -> None:
+        """
+        Write plan atomically as a JSON object with keys summary and actions if
+        path ends in .json or otherwise as JSON Lines with the summary first
+        followed by one action per line
+
+        Args:
+            path (str): Path of file to write
+
+        Returns:
+            None
+        """
+        actions = self.upserts + self.skips + self.deletes
+        summary = self.get_summary()
+        separators = (",", ":")
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                plan = {"summary": summary, "actions": actions}
+                json.dump(plan, f, separators=separators, default=str)
+            else:
+                for entry in [dict(action="summary", **summary)] + actions:
+                    f.write(
+                        json.dumps(entry, separators=separators, default=str)
+                    )
+                    f.write("\n")
+        replace(temp_path, path)
@@ -0,0 +1,291 @@
+"""
+Layer Profiling:
+----------------
+
+Opt-in profiling of the parse, build and create steps of each uploaded layer
+keeping the slowest layers.
+
+"""
+import cProfile
+import heapq
+import json
+import logging
+import pstats
+import time
+from itertools import count
+from os import environ, makedirs
+from os.path import basename, join
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class LayerProfile:
+    """
+    Profile and total time of the steps run for one layer
+
+    Args:
+        profiler (LayerProfiler): Profiler that keeps the slowest layers
+        key (str): Key identifying layer
+    """
+
+    def __init__(self, profiler: "LayerProfiler", key: str) -> None:
+        self.profiler = profiler
+        self.key = key
+        self.seconds = 0.0
+        self.profiles: List[cProfile.Profile] = list()
+
+    def get_stats(self) -> Optional[pstats.Stats]:
+        """
+        Get profile stats of all steps run for layer
+
+        Returns:
+            Optional[pstats.Stats]: Profile stats or None if no step was profiled
+        """
+        if not self.profiles:
+            return None
+        return pstats.Stats(*self.profiles)
+
+
+class LayerProfiler:
+    """
+    Profiles the parse, build and create steps of each uploaded layer, keeping
+    the top_n slowest layers with their profile stats. A LayerProfile can be
+    started when a layer is parsed and finished once it has been uploaded so
+    that all its steps are merged into one profile. Only one step is profiled at
+    a time as Python allows only one active profiler. Steps run concurrently with a
+    profiled step are only timed. write saves the stats of the slowest layers,
+    a JSON summary and their collapsed stacks, which can be turned into a flame
+    graph by tools like flamegraph.pl or speedscope, to output_folder.
+
+    Profiling can also be enabled without code changes by setting the
+    environment variable HDX_GEONODE_PROFILE to the output folder and optionally
+    HDX_GEONODE_PROFILE_TOP to the number of layers to keep.
+
+    Args:
+        output_folder (str): Folder to which to write results. Defaults to "profiles".
+        top_n (int): Number of slowest layers to keep. Defaults to 10.
+    """
+
+    profile_lock = Lock()
+
+    def __init__(
+        self, output_folder: str = "profiles", top_n: int = 10
+    ) -> None:
+        self.output_folder = output_folder
+        self.top_n = top_n
+        self.lock = Lock()
+        self.slowest: List[Tuple[float, int, LayerProfile]] = list()
+        self.counter = count()
+
+    @classmethod
+    def from_environment(cls) -> Optional["LayerProfiler"]:
+        """
+        Create profiler if environment variable HDX_GEONODE_PROFILE is set
+
+        Returns:
+            Optional[LayerProfiler]: Profiler or None if profiling isn't enabled
+        """
+        output_folder = environ.get("HDX_GEONODE_PROFILE")
+        if not output_folder:
+            return None
+        top_n = int(environ.get("HDX_GEONODE_PROFILE_TOP", 10))
+        return cls(output_folder, top_n)
+
+    def start(self, key: str) -> LayerProfile:
+        """
+        Start profiling layer
+
+        Args:
+            key (str): Key identifying layer
+
+        Returns:
+            LayerProfile: Profile of layer to pass to run and finish
+        """
+        return LayerProfile(self, key)
+
+    @staticmethod
+    def run(
+        layer_profile: Optional[LayerProfile],
+        function: Callable,
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Run a step for a layer, profiling it if layer_profile is given
+
+        Args:
+            layer_profile (Optional[LayerProfile]): Profile of layer or None to not profile
+            function (Callable): Function to call
+            *args: Positional arguments to pass to function
+            **kwargs: Keyword arguments to pass to function
+
+        Returns:
+            Any: Return value of function
+        """
+        if layer_profile is None:
+            return function(*args, **kwargs)
+        profiling = LayerProfiler.profile_lock.acquire(blocking=False)
+        start = time.perf_counter()
+        try:
+            if not profiling:
+                return function(*args, **kwargs)
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(function, *args, **kwargs)
+            finally:
+                layer_profile.profiles.append(profile)
+        finally:
+            layer_profile.seconds += time.perf_counter() - start
+            if profiling:
+                LayerProfiler.profile_lock.release()
+
+    @staticmethod
+    def finish(layer_profile: Optional[LayerProfile]) -> None:
+        """
+        Finish profiling layer keeping it if it is one of the slowest
+
+        Args:
+            layer_profile (Optional[LayerProfile]): Profile of layer or None if not profiling
+
+        Returns:
+            None
+        """
+        if layer_profile is None:
+            return
+        profiler = layer_profile.profiler
+        entry = (layer_profile.seconds, next(profiler.counter), layer_profile)
+        with profiler.lock:
+            if len(profiler.slowest) < profiler.top_n:
+                heapq.heappush(profiler.slowest, entry)
+            elif entry[0] > profiler.slowest[0][0]:
+                heapq.heapreplace(profiler.slowest, entry)
+
+    def get_slowest(self) -> List[LayerProfile]:
+        """
+        Get profiles of slowest layers
+
+        Returns:
+            List[LayerProfile]: Profiles of slowest layers, slowest first
+        """
+        with self.lock:
+            slowest = sorted(self.slowest, key=lambda x: (-x[0], x[1]))
+        return [x[2] for x in slowest]
+
+    @staticmethod
+    def get_frame(function: Tuple[str, int, str]) -> str:
+        """
+        Get frame name for collapsed stacks from a pstats function key
+
+        Args:
+            function (Tuple[str, int, str]): Filename, line number and function name
+
+        Returns:
+            str: Frame name
+        """
+        from hdx.utilities.text import multiple_replace
+
+        filename, lineno, name = function
+        if filename == "~":
+            frame = name
+        else:
+            frame = f"{basename(filename)}:{lineno}:{name}"
+        return multiple_replace(frame, {";": ",", " ": "_"})
+
+    @classmethod
+    def get_collapsed_stacks(
+        cls, root: str, stats: pstats.Stats, min_microseconds: int = 10
+    ) -> Dict[str, int]:
+        """
+        Get collapsed stacks in microseconds from profile stats. As profile stats
+        only record calls between pairs of functions, the time of a function
+        called from several places is split between its callers in proportion
+        to the time spent in the function from each of them. Calls taking less
+        than min_microseconds in total are left out.
+
+        Args:
+            root (str): Name of root frame
+            stats (pstats.Stats): Profile stats
+            min_microseconds (int): Minimum time of calls to include. Defaults to 10.
+
+        Returns:
+            Dict[str, int]: Collapsed stack mapped to microseconds
+        """
+        callees: Dict[Tuple, Dict[Tuple, float]] = dict()
+        roots = list()
+        for function, (_, _, _, _, callers) in stats.stats.items():
+            # Leave out the call that stops the profiler
+            if not callers and "_lsprof.Profiler" not in function[2]:
+                roots.append(function)
+            for caller, caller_stats in callers.items():
+                callees.setdefault(caller, dict())[function] = caller_stats[3]
+        stacks = dict()
+
+        def walk(function, stack, fraction, seen):
+            _, _, tt, ct, _ = stats.stats[function]
+            stack = f"{stack};{cls.get_frame(function)}"
+            microseconds = int(tt * fraction * 1000000)
+            if microseconds > 0:
+                stacks[stack] = stacks.get(stack, 0) + microseconds
+            seen = seen | {function}
+            for callee, edge_time in callees.get(function, dict()).items():
+                if callee in seen:
+                    continue
+                callee_time = stats.stats[callee][3]
+                if fraction * edge_time * 1000000 < min_microseconds:
+                    continue
+                walk(callee, stack, fraction * edge_time / callee_time, seen)
+
+        for function in roots:
+            walk(function, root, 1.0, frozenset())
+        return stacks
+
+    def write(self) -> List[LayerProfile]:
+        """
+        Write profile stats of each of the slowest layers, a JSON summary
+        (slowest_layers.json) and collapsed stacks of the slowest layers
+        (collapsed_stacks.txt) to output_folder
+
+        Returns:
+            List[LayerProfile]: Profiles of slowest layers, slowest first
+        """
+        from slugify import slugify
+
+        makedirs(self.output_folder, exist_ok=True)
+        slowest = self.get_slowest()
+        summary = list()
+        collapsed = list()
+        for i, layer_profile in enumerate(slowest):
+            entry = {
+                "key": layer_profile.key,
+                "seconds": layer_profile.seconds,
+            }
+            stats = layer_profile.get_stats()
+            if stats is not None:
+                filename = (
+                    f"{i + 1:02d}_{slugify(layer_profile.key)[:60]}.prof"
+                )
+                stats.dump_stats(join(self.output_folder, filename))
+                entry["profile"] = filename
+                root = self.get_frame(("~", 0, layer_profile.key))
+                stacks = self.get_collapsed_stacks(root, stats)
+                collapsed.extend(f"{x} {y}" for x, y in stacks.items())
+            summary.append(entry)
+        with open(
+            join(self.output_folder, "slowest_layers.json"),
+            "w",
+            encoding="utf-8",
+        ) as f:
+            json.dump(summary, f, indent=1)
+        with open(
+            join(self.output_folder, "collapsed_stacks.txt"),
+            "w",
+            encoding="utf-8",
+        ) as f:
+            for line in collapsed:
+                f.write(f"{line}\n")
+        logger.info(
+            f"Profiles of {len(slowest)} slowest layers written to {self.output_folder}"
+        )
+        return slowest
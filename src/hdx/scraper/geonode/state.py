@@ -0,0 +1,106 @@
+"""
+Layer State Store:
+------------------
+
+Persists fingerprints of the GeoNode layers from which datasets were created so
+that unchanged layers can be skipped on later runs.
+
+"""
+import sqlite3
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Any, Optional
+
+
+class LayerStateStore:
+    """
+    SQLite store of dataset name to fingerprint of the layer data, configuration
+    and metadata from which the dataset was last created in HDX. It can be used
+    as a context manager which closes the database on exit.
+
+    Args:
+        path (str): Path to SQLite database file. Created if it doesn't exist.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS layer_state "
+                "(name TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, "
+                "updated TEXT NOT NULL)"
+            )
+
+    def __enter__(self) -> "LayerStateStore":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def get_fingerprint(self, name: str) -> Optional[str]:
+        """
+        Get fingerprint stored for dataset name
+
+        Args:
+            name (str): Dataset name
+
+        Returns:
+            Optional[str]: Fingerprint or None if dataset has no stored fingerprint
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT fingerprint FROM layer_state WHERE name = ?", (name,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def set_fingerprint(self, name: str, fingerprint: str) -> None:
+        """
+        Store fingerprint for dataset name
+
+        Args:
+            name (str): Dataset name
+            fingerprint (str): Fingerprint
+
+        Returns:
+            None
+        """
+        with self.lock:
+            with self.connection:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO layer_state "
+                    "(name, fingerprint, updated) VALUES (?, ?, ?)",
+                    (
+                        name,
+                        fingerprint,
+                        datetime.now(timezone.utc).isoformat(),
+                    ),
+                )
+
+    def delete_fingerprint(self, name: str) -> None:
+        """
+        Delete fingerprint stored for dataset name
+
+        Args:
+            name (str): Dataset name
+
+        Returns:
+            None
+        """
+        with self.lock:
+            with self.connection:
+                self.connection.execute(
+                    "DELETE FROM layer_state WHERE name = ?", (name,)
+                )
+
+    def close(self) -> None:
+        """
+        Close the database
+
+        Returns:
+            None
+        """
+        self.connection.close()
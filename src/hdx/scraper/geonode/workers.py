@@ -0,0 +1,364 @@
+"""
+Worker Utilities:
+-----------------
+
+Bounded, rate limited worker pool used to run HDX API calls concurrently, a
+single flight cache for values shared between workers and a wrapper giving each
+thread its own Download object.
+
+"""
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from copy import copy
+from threading import BoundedSemaphore, Lock, local
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    from hdx.utilities.downloader import Download
+
+
+class RateLimiter:
+    """
+    Thread safe rate limiter that spaces calls evenly so that no more than
+    calls_per_second are made. One RateLimiter can be shared by several worker
+    pools to apply a common limit.
+
+    Args:
+        calls_per_second (float): Maximum number of calls per second
+    """
+
+    def __init__(self, calls_per_second: float) -> None:
+        self.interval = 1.0 / calls_per_second
+        self.lock = Lock()
+        self.next_time = time.monotonic()
+
+    def wait(self) -> None:
+        """
+        Block until the next call is allowed
+
+        Returns:
+            None
+        """
+        with self.lock:
+            now = time.monotonic()
+            call_time = max(now, self.next_time)
+            self.next_time = call_time + self.interval
+        delay = call_time - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class WorkerPool:
+    """
+    Pool of worker threads that runs submitted calls, optionally rate limited.
+    Calls submitted with the same key are run one after the other in the order
+    they were submitted. At most twice max_workers calls are queued at once so
+    that submitting blocks rather than holding an unbounded backlog in memory. If
+    max_workers is 1, calls are run immediately in the calling thread. Can be
+    used as a context manager which waits for all calls on exit.
+
+    Args:
+        max_workers (int): Number of worker threads. Defaults to 1 (no threads).
+        rate_limiter (Optional[RateLimiter]): Rate limiter applied to every call. Defaults to None.
+    """
+
+    def __init__(
+        self, max_workers: int = 1, rate_limiter: Optional[RateLimiter] = None
+    ) -> None:
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter
+        if max_workers > 1:
+            self.executor = ThreadPoolExecutor(max_workers=max_workers)
+            self.slots = BoundedSemaphore(max_workers * 2)
+        else:
+            self.executor = None
+            self.slots = None
+        self.last_futures: Dict[Hashable, Future] = dict()
+        self.futures: List[Future] = list()
+        self.joined = 0
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, exc_type: Any, *args: Any) -> None:
+        if exc_type is None:
+            self.wait()
+        else:
+            self.shutdown()
+
+    def run(
+        self,
+        previous: Optional[Future],
+        function: Callable,
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Run a call once any previous call with the same key has finished and the
+        rate limiter allows
+
+        Args:
+            previous (Optional[Future]): Future of previous call with the same key
+            function (Callable): Function to call
+            *args: Positional arguments to pass to function
+            **kwargs: Keyword arguments to pass to function
+
+        Returns:
+            Any: Return value of function
+        """
+        if previous is not None:
+            # Wait but don't fail if an earlier call with the same key failed
+            previous.exception()
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait()
+        return function(*args, **kwargs)
+
+    def submit(
+        self, key: Hashable, function: Callable, *args: Any, **kwargs: Any
+    ) -> Future:
+        """
+        Submit a call to the pool
+
+        Args:
+            key (Hashable): Key such as dataset name. Calls with the same key are not run concurrently.
+            function (Callable): Function to call
+            *args: Positional arguments to pass to function
+            **kwargs: Keyword arguments to pass to function
+
+        Returns:
+            Future: Future holding the result of the call
+        """
+        if self.executor is None:
+            future = Future()
+            future.set_result(self.run(None, function, *args, **kwargs))
+            self.futures.append(future)
+            return future
+        self.slots.acquire()
+        # Earlier futures are ahead in the executor queue so waiting on them from
+        # a worker cannot deadlock
+        previous = self.last_futures.get(key)
+        future = self.executor.submit(
+            self.run, previous, function, *args, **kwargs
+        )
+        future.add_done_callback(lambda _: self.slots.release())
+        self.last_futures[key] = future
+        self.futures.append(future)
+        return future
+
+    def join(self) -> None:
+        """
+        Wait for all calls submitted so far to finish without shutting down the
+        pool. Raises the first exception raised by any of them.
+
+        Returns:
+            None
+        """
+        futures = self.futures[self.joined :]
+        for future in futures:
+            future.result()
+        self.joined += len(futures)
+
+    def wait(self) -> List[Any]:
+        """
+        Wait for all submitted calls to finish and shut down the pool. Raises the
+        first exception raised by any call.
+
+        Returns:
+            List[Any]: Results of calls in the order they were submitted
+        """
+        try:
+            return [future.result() for future in self.futures]
+        finally:
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        """
+        Shut down the pool waiting for running calls to finish
+
+        Returns:
+            None
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+        self.last_futures = dict()
+
+
+class SingleFlightCache:
+    """
+    Thread safe cache of values with an optional time to live. If several threads
+    ask for the same missing key at once, the function to get the value is only
+    called once and all of them receive its result.
+
+    Args:
+        ttl (Optional[float]): Seconds for which a value is kept. Defaults to None (forever).
+    """
+
+    def __init__(self, ttl: Optional[float] = None) -> None:
+        self.ttl = ttl
+        self.lock = Lock()
+        self.values: Dict[Hashable, Tuple[Any, Optional[float]]] = dict()
+        self.in_flight: Dict[Hashable, Future] = dict()
+
+    def get(self, key: Hashable, function: Callable[[], Any]) -> Any:
+        """
+        Get value for key calling function to get it if it isn't cached or has
+        expired
+
+        Args:
+            key (Hashable): Key
+            function (Callable[[], Any]): Function returning value for key
+
+        Returns:
+            Any: Value for key
+        """
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is not None:
+                value, expiry = entry
+                if expiry is None or time.monotonic() < expiry:
+                    return value
+                del self.values[key]
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.in_flight[key] = future
+        if not leader:
+            return future.result()
+        try:
+            value = function()
+        except BaseException as ex:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(ex)
+            raise
+        if self.ttl is None:
+            expiry = None
+        else:
+            expiry = time.monotonic() + self.ttl
+        with self.lock:
+            self.values[key] = (value, expiry)
+            del self.in_flight[key]
+        future.set_result(value)
+        return value
+
+    def clear(self) -> None:
+        """
+        Delete all cached values
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.values = dict()
+
+
+class ThreadLocalDownload:
+    """
+    Wrapper around a Download object that can be used from many threads at once.
+    Download keeps the response of its last request on the object so sharing one
+    between threads can hand one thread the response of another. Each thread
+    instead gets its own shallow copy of the Download object that shares its
+    session, and so its HTTP connection pool, but keeps its own response.
+    Wrappers such as ResponseCache that keep the object they wrap in a downloader
+    attribute are copied in the same way. Objects that can't be copied safely, for
+    example a rate limited Download whose setup is bound to the original object,
+    are shared and called one at a time.
+
+    Args:
+        downloader (Download): Download object from HDX Python Utilities
+    """
+
+    # Marks objects that can be shared between threads as is
+    thread_safe = True
+
+    def __init__(self, downloader: "Download") -> None:
+        self.downloader = downloader
+        self.local = local()
+        self.lock = Lock()
+
+    @classmethod
+    def wrap(cls, downloader: "Download") -> Any:
+        """
+        Wrap Download object unless it can already be shared between threads
+
+        Args:
+            downloader (Download): Download object from HDX Python Utilities
+
+        Returns:
+            Any: ThreadLocalDownload or downloader if it is thread safe
+        """
+        if getattr(downloader, "thread_safe", False):
+            return downloader
+        return cls(downloader)
+
+    @classmethod
+    def copy_downloader(cls, downloader: Any) -> Optional[Any]:
+        """
+        Copy Download object or wrapper of one so that the copy shares the session
+        but not the response of the original
+
+        Args:
+            downloader (Any): Download object or wrapper of one
+
+        Returns:
+            Optional[Any]: Copy or None if downloader can't be copied safely
+        """
+        if getattr(downloader, "thread_safe", False):
+            return downloader
+        if hasattr(downloader, "normal_setup"):
+            if getattr(downloader.setup, "__self__", None) is not downloader:
+                return None
+            copied = copy(downloader)
+            copied.response = None
+            copied.setup = copied.normal_setup
+            return copied
+        wrapped = getattr(downloader, "downloader", None)
+        if wrapped is None:
+            return None
+        wrapped = cls.copy_downloader(wrapped)
+        if wrapped is None:
+            return None
+        copied = copy(downloader)
+        copied.downloader = wrapped
+        return copied
+
+    def get_downloader(self) -> Optional[Any]:
+        """
+        Get copy of Download object for the current thread
+
+        Returns:
+            Optional[Any]: Copy or None if downloader can't be copied safely
+        """
+        try:
+            return self.local.downloader
+        except AttributeError:
+            downloader = self.copy_downloader(self.downloader)
+            self.local.downloader = downloader
+            return downloader
+
+    def download(self, url: str, **kwargs: Any) -> Any:
+        """
+        Download url with the current thread's copy of the Download object
+
+        Args:
+            url (str): Url to download
+            **kwargs: Other arguments to pass to downloader's download method
+
+        Returns:
+            Any: Response object
+        """
+        downloader = self.get_downloader()
+        if downloader is None:
+            with self.lock:
+                return self.downloader.download(url, **kwargs)
+        return downloader.download(url, **kwargs)
@@ -0,0 +1,57 @@
+"""Shared fixtures for Geonode scraper Tests"""
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+from hdx.utilities.downloader import Download
+
+
+class SlowDownload(Download):
+    """Download that widens the window between storing its response and
+    returning it so that sharing one between threads fails reliably"""
+
+    def normal_setup(self, *args, **kwargs):
+        super().normal_setup(*args, **kwargs)
+        time.sleep(0.001)
+        return self.response
+
+
+@pytest.fixture(scope="session")
+def stub_geonode_url():
+    """Local GeoNode API whose layers for country XXX are titled XXX 0, XXX 1
+    and so on. Responses are slightly delayed so that concurrent requests
+    overlap."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = dict(parse_qsl(urlsplit(self.path).query))
+            code = query.get("regions__code__in", "ALL")
+            time.sleep(random.random() * 0.005)
+            layers = [{"title": f"{code} {i}"} for i in range(3)]
+            body = json.dumps({"objects": layers}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    yield f"http://{host}:{port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def slow_downloader():
+    with SlowDownload(user_agent="test") as downloader:
+        yield downloader
@@ -0,0 +1,158 @@
+"""HTTP cache Tests"""
+import json
+
+import pytest
+from hdx.utilities.downloader import DownloadError
+
+from hdx.scraper.geonode.cache import (
+    ConditionalGetCache,
+    DiskStore,
+    ResponseCache,
+)
+
+
+class Response:
+    def __init__(self, status_code, body, headers):
+        self.status_code = status_code
+        self.content = json.dumps(body).encode("utf-8") if body else b""
+        self.headers = headers
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class Download:
+    def __init__(self):
+        self.etags = dict()
+        self.bodies = dict()
+        self.requests = list()
+
+    def download(self, url, headers=None):
+        self.requests.append((url, headers))
+        etag = self.etags[url]
+        if headers and headers.get("If-None-Match") == etag:
+            return Response(304, None, {"ETag": etag})
+        return Response(200, self.bodies[url], {"ETag": etag})
+
+
+class TestDiskStore:
+    def test_last_used(self, tmp_path):
+        url = "http://xxx/1"
+        store = DiskStore(tmp_path, save_every=2)
+        store.put(url, b"1")
+
+        def get_saved_last_used():
+            return store.load_index()[store.get_key(url)]["last_used"]
+
+        stored = get_saved_last_used()
+        store.get(url)
+        assert get_saved_last_used() == stored
+        last_used = store.get(url)["last_used"]
+        assert get_saved_last_used() == last_used
+        last_used = store.get(url)["last_used"]
+        store.flush()
+        assert get_saved_last_used() == last_used
+
+    def test_shared_folder(self, tmp_path):
+        store1 = DiskStore(tmp_path, max_entries=3)
+        store2 = DiskStore(tmp_path, max_entries=3)
+        store1.put("http://xxx/1", b"1")
+        store2.put("http://xxx/2", b"2")
+        store1.put("http://xxx/3", b"3")
+        assert len(store1) == 3
+        assert len(DiskStore(tmp_path)) == 3
+        # Eviction by one process is seen by the other
+        store2.put("http://xxx/4", b"4")
+        store1.put("http://xxx/5", b"5")
+        store = DiskStore(tmp_path)
+        assert store.get("http://xxx/1") is None
+        assert store.get("http://xxx/2") is None
+        assert store.get_body("http://xxx/5") == b"5"
+        assert len(store) == 3
+        store2.clear()
+        assert len(DiskStore(tmp_path)) == 0
+
+
+class TestConditionalGetCache:
+    def test_download(self, tmp_path):
+        downloader = Download()
+        url = "http://xxx/api/regions"
+        downloader.etags[url] = '"1"'
+        downloader.bodies[url] = {"objects": [1, 2]}
+        cache = ConditionalGetCache(downloader, tmp_path)
+        assert cache.download(url).json() == {"objects": [1, 2]}
+        assert (cache.hits, cache.misses) == (0, 1)
+        assert cache.download(url).json() == {"objects": [1, 2]}
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert downloader.requests[-1] == (url, {"If-None-Match": '"1"'})
+
+        cache = ConditionalGetCache(downloader, tmp_path)
+        assert cache.download(url).json() == {"objects": [1, 2]}
+        assert cache.hits == 1
+        downloader.etags[url] = '"2"'
+        downloader.bodies[url] = {"objects": [3]}
+        assert cache.download(url).json() == {"objects": [3]}
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        cache.clear()
+        assert len(cache.store) == 0
+        assert cache.download(url).json() == {"objects": [3]}
+        assert (cache.hits, cache.misses) == (0, 1)
+
+    def test_max_entries(self, tmp_path):
+        downloader = Download()
+        urls = [f"http://xxx/api/layers/{i}" for i in range(4)]
+        for i, url in enumerate(urls):
+            downloader.etags[url] = f'"{i}"'
+            downloader.bodies[url] = {"objects": [i]}
+        cache = ConditionalGetCache(downloader, tmp_path, max_entries=2)
+        for url in urls[:2]:
+            cache.download(url)
+        cache.download(urls[0])
+        cache.download(urls[2])
+        assert len(cache.store) == 2
+        assert cache.store.get(urls[0]) is not None
+        assert cache.store.get(urls[1]) is None
+        assert cache.store.get(urls[2]) is not None
+
+
+class TestResponseCache:
+    def test_download(self, tmp_path):
+        downloader = Download()
+        url = "http://xxx/api/regions"
+        downloader.etags[url] = '"1"'
+        downloader.bodies[url] = {"objects": [1, 2]}
+        cache = ResponseCache(downloader, tmp_path)
+        assert cache.download(url).json() == {"objects": [1, 2]}
+        downloader.bodies[url] = {"objects": [3]}
+        assert cache.download(url).json() == {"objects": [1, 2]}
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert len(downloader.requests) == 1
+
+        cache = ResponseCache(downloader, tmp_path, ttl=0)
+        assert cache.download(url).json() == {"objects": [3]}
+        assert (cache.hits, cache.misses) == (0, 1)
+
+        cache = ResponseCache(None, tmp_path, ttl=0, replay_only=True)
+        assert cache.download(url).json() == {"objects": [3]}
+        with pytest.raises(DownloadError):
+            cache.download("http://xxx/api/layers")
+
+    def test_max_size(self, tmp_path):
+        downloader = Download()
+        urls = [f"http://xxx/api/layers/{i}" for i in range(4)]
+        for i, url in enumerate(urls):
+            downloader.etags[url] = f'"{i}"'
+            downloader.bodies[url] = {"objects": [i]}
+        size = len(json.dumps({"objects": [0]}))
+        cache = ResponseCache(downloader, tmp_path, max_size=size * 2)
+        for url in urls[:2]:
+            cache.download(url)
+        cache.download(urls[0])
+        cache.download(urls[2])
+        assert len(cache.store) == 2
+        assert cache.store.get(urls[1]) is None
+        assert cache.download(urls[0]).json() == {"objects": [0]}
+        assert cache.hits == 2
+        cache.clear()
+        assert len(cache.store) == 0
@@ -0,0 +1,68 @@
+"""Configuration Cache Tests"""
+from datetime import date
+from os import listdir, utime
+from os.path import join
+
+from hdx.scraper.geonode.config import ConfigCache
+
+
+class TestConfigCache:
+    def test_get(self, tmp_path):
+        base_path = join(tmp_path, "base.yml")
+        with open(base_path, "w") as f:
+            f.write("ignore_data:\n  - deprecated\nmapping:\n  a: b\n")
+        override_path = join(tmp_path, "override.yml")
+        with open(override_path, "w") as f:
+            f.write("mapping:\n  c: d\n")
+        paths = [base_path, override_path]
+        config_cache = ConfigCache()
+        config = config_cache.get(paths)
+        assert config == {"ignore_data": ["deprecated"], "mapping": {"c": "d"}}
+        assert config_cache.misses == 1
+        config["mapping"]["e"] = "f"
+        assert config_cache.get(paths) == {
+            "ignore_data": ["deprecated"],
+            "mapping": {"c": "d"},
+        }
+        assert config_cache.hits == 1
+
+        with open(override_path, "w") as f:
+            f.write("mapping:\n  g: h\n")
+        utime(override_path, ns=(1, 1))
+        assert config_cache.get(paths)["mapping"] == {"g": "h"}
+        assert config_cache.misses == 2
+
+        folder = join(tmp_path, "cache")
+        config_cache = ConfigCache(folder)
+        config = config_cache.get(paths)
+        assert config_cache.misses == 1
+        filenames = listdir(folder)
+        assert len(filenames) == 1
+        config_cache = ConfigCache(folder)
+        assert config_cache.get(paths) == config
+        assert config_cache.hits == 1
+        assert config_cache.misses == 0
+
+        with open(join(folder, filenames[0]), "w") as f:
+            f.write("{")
+        config_cache = ConfigCache(folder)
+        assert config_cache.get(paths) == config
+        assert config_cache.misses == 1
+        config_cache.clear()
+        assert config_cache.configs == dict()
+
+    def test_get_same_on_miss_and_hit(self, tmp_path):
+        path = join(tmp_path, "config.yml")
+        with open(path, "w") as f:
+            f.write("mapping:\n  1: a\nstart: 2020-05-06\n")
+        expected = {"mapping": {1: "a"}, "start": date(2020, 5, 6)}
+        folder = join(tmp_path, "cache")
+        config_cache = ConfigCache(folder)
+        miss = config_cache.get([path])
+        hit = config_cache.get([path])
+        assert config_cache.misses == 1 and config_cache.hits == 1
+        # Integer keys and dates are kept as YAML loaded them
+        assert miss == hit == expected
+        config_cache = ConfigCache(folder)
+        assert config_cache.get([path]) == expected
+        assert config_cache.hits == 1 and config_cache.misses == 0
@@ -0,0 +1,34 @@
+"""Country index Tests"""
+from os.path import join
+
+import pytest
+from hdx.location.country import Country
+
+from hdx.scraper.geonode.countryindex import CountryIndex
+
+
+class TestCountryIndex:
+    @pytest.fixture(scope="function")
+    def country_index(self):
+        Country.countriesdata(False)
+        CountryIndex.set(None)
+        yield CountryIndex
+        CountryIndex.set(None)
+
+    def test_get_country_name(self, country_index):
+        assert country_index.get_country_name("SDN") == "Sudan"
+        assert country_index.get_country_name("mmr") == "Myanmar"
+        assert country_index.get_country_name("SAF") is None
+        index = country_index.get()
+        assert index is country_index.get()
+        with pytest.raises(TypeError):
+            index["SAF"] = "Southern Africa"
+
+    def test_prebuilt(self, country_index, tmp_path):
+        path = join(tmp_path, "countries.json")
+        country_index.save(path)
+        country_index.set({"sdn": "Sudan"})
+        assert country_index.get_country_name("SDN") == "Sudan"
+        assert country_index.get_country_name("MMR") is None
+        country_index.load(path)
+        assert country_index.get_country_name("MMR") == "Myanmar"
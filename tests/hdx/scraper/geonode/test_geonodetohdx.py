@@ -1,16 +1,36 @@
 """Geonode scraper Tests"""
+import asyncio
 import copy
+import json
+import pstats
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from os.path import join
+from threading import Lock
+from urllib.parse import parse_qsl, urlsplit
 
 import pytest
 from hdx.api.configuration import Configuration
 from hdx.api.locations import Locations
 from hdx.data.dataset import Dataset
+from hdx.data.hdxobject import HDXError
+from hdx.data.showcase import Showcase
 from hdx.data.vocabulary import Vocabulary
 from hdx.location.country import Country
 
+from hdx.scraper.geonode.asyncgeonodetohdx import AsyncGeoNodeToHDX
+from hdx.scraper.geonode.checkpoint import Checkpoint
+from hdx.scraper.geonode.compare import create_changed_dataset_showcase
+from hdx.scraper.geonode.federation import (
+    GeoNodeFederation,
+    HostLimitedDownload,
+)
 from hdx.scraper.geonode.geonodetohdx import GeoNodeToHDX
+from hdx.scraper.geonode.layer import LayerRecord
+from hdx.scraper.geonode.profiling import LayerProfiler
+from hdx.scraper.geonode.state import LayerStateStore
+from hdx.scraper.geonode.workers import RateLimiter
 
 
 class TestGeoNodeToHDX:
@@ -640,7 +660,7 @@ class TestGeoNodeToHDX:
             @staticmethod
             def download(url):
                 response = Response()
-                if url == "http://xxx/api/regions":
+                if url in ("http://xxx/api/regions", "http://ccc/api/regions"):
 
                     def fn():
                         return {"objects": TestGeoNodeToHDX.wfplocationsdata}
@@ -675,6 +695,43 @@ class TestGeoNodeToHDX:
                             + [TestGeoNodeToHDX.mimulayersdata[0]]
                         }
 
+                    response.json = fn
+                elif url.startswith("http://bbb/api/layers/?"):
+                    query = dict(parse_qsl(urlsplit(url).query))
+                    limit = int(query["limit"])
+                    offset = int(query["offset"])
+                    layers = TestGeoNodeToHDX.mimulayersdata + [
+                        TestGeoNodeToHDX.oldmimulayer
+                    ]
+                    if offset + limit < len(layers):
+                        next = f"/api/layers/?limit={limit}&offset={offset + limit}"
+                    else:
+                        next = None
+
+                    def fn():
+                        return {
+                            "meta": {
+                                "limit": limit,
+                                "next": next,
+                                "offset": offset,
+                                "previous": None,
+                                "total_count": len(layers),
+                            },
+                            "objects": layers[offset : offset + limit],
+                        }
+
+                    response.json = fn
+                elif url.startswith("http://ccc/api/layers/?"):
+                    layers = copy.deepcopy(TestGeoNodeToHDX.wfplayersdata)
+                    layers[0]["regions"] = [{"code": "SDN"}, {"code": "SAF"}]
+                    layers[1]["regions"] = ["/api/regions/218/"]
+
+                    def fn():
+                        return {
+                            "meta": {"next": None, "total_count": 2},
+                            "objects": layers,
+                        }
+
                     response.json = fn
                 return response
 
@@ -686,9 +743,16 @@ class TestGeoNodeToHDX:
 
     @pytest.fixture(scope="function")
     def search_datasets(self, monkeypatch):
-        def search_in_hdx(fq):
-            if self.wfpmetadata["orgid"] in fq:
-                return [
+        searches = list()
+
+        def call_remoteckan(configuration, action, data):
+            assert action == "package_search"
+            fq, fl, rows, start = (
+                data[x] for x in ("fq", "fl", "rows", "start")
+            )
+            searches.append((fq, rows, start))
+            if self.wfpmetadata["maintainerid"] in fq:
+                datasets = [
                     self.construct_dataset(dataset, resources)
                     for dataset, resources in zip(
                         (self.wfpdatasets + self.mimudatasets),
@@ -696,7 +760,7 @@ class TestGeoNodeToHDX:
                     )
                 ]
             else:
-                return [
+                datasets = [
                     self.construct_dataset(
                         dataset,
                         resources,
@@ -708,10 +772,30 @@ class TestGeoNodeToHDX:
                         (self.wfpresources + self.mimuresources),
                     )
                 ]
+            if "maintainer:" in fq:
+                datasets = [
+                    x
+                    for x in datasets
+                    if f'maintainer:"{x["maintainer"]}"' in fq
+                ]
+            else:
+                # Dataset of the organisation with another maintainer
+                other = self.construct_dataset(
+                    self.mimudatasets[0],
+                    self.mimuresources[0],
+                    self.wfpmetadata["maintainerid"],
+                )
+                other["name"] = "mimu-geonode-ica-sudan-land-degradation"
+                datasets.append(other)
+            results = list()
+            for dataset in datasets[start : start + rows]:
+                result = {x: dataset.get(x) for x in fl if x != "res_url"}
+                result["res_url"] = [x["url"] for x in dataset.get_resources()]
+                results.append(result)
+            return {"count": len(datasets), "results": results}
 
-        monkeypatch.setattr(
-            Dataset, "search_in_hdx", staticmethod(search_in_hdx)
-        )
+        monkeypatch.setattr(Configuration, "call_remoteckan", call_remoteckan)
+        return searches
 
     def test_get_countries(self, configuration, downloader):
         geonodetohdx = GeoNodeToHDX("http://xxx", downloader)
@@ -732,6 +816,88 @@ class TestGeoNodeToHDX:
         layers = geonodetohdx.get_layers()
         assert layers == TestGeoNodeToHDX.mimulayersdata
 
+    def test_iter_layers(self, downloader):
+        geonodetohdx = GeoNodeToHDX("http://bbb", downloader)
+        expected_layers = TestGeoNodeToHDX.mimulayersdata + [
+            TestGeoNodeToHDX.oldmimulayer
+        ]
+        for page_size in (1, 2, 100):
+            layers = geonodetohdx.iter_layers(page_size=page_size)
+            assert not isinstance(layers, list)
+            assert list(layers) == expected_layers
+            layers = geonodetohdx.get_layers(page_size=page_size)
+            assert layers == expected_layers
+
+    def test_get_region_index(self, configuration, downloader):
+        geonodetohdx = GeoNodeToHDX("http://ccc", downloader)
+        region_index = geonodetohdx.get_region_index()
+        assert list(region_index.keys()) == ["SDN", "SAF"]
+        assert [x["title"] for x in region_index["SDN"]] == [
+            x["title"] for x in TestGeoNodeToHDX.wfplayersdata
+        ]
+        assert len(region_index["SAF"]) == 1
+        countries = geonodetohdx.get_countries(region_index=region_index)
+        assert countries == [{"iso3": "SDN", "name": "Sudan", "layers": "SDN"}]
+        countries_layers = list(
+            geonodetohdx.get_countries_layers(
+                countries, region_index=region_index
+            )
+        )
+        assert countries_layers == [(countries[0], region_index["SDN"])]
+        compact_index = geonodetohdx.get_region_index(compact=True)
+        assert [x.to_dict() for x in compact_index["SDN"]] == [
+            LayerRecord.from_layer(x).to_dict()
+            for x in TestGeoNodeToHDX.wfplayersdata
+        ]
+        assert compact_index["SAF"][0] in compact_index["SDN"]
+
+    def test_get_countries_layers(self, downloader):
+        geonodetohdx = GeoNodeToHDX("http://xxx", downloader)
+        countries = [
+            {"iso3": "SDN", "name": f"Sudan {i}", "layers": "SDN"}
+            for i in range(10)
+        ]
+        for max_fetch_workers in (1, 3):
+            results = list(
+                geonodetohdx.get_countries_layers(countries, max_fetch_workers)
+            )
+            assert [x[0] for x in results] == countries
+            for _, layers in results:
+                assert layers == TestGeoNodeToHDX.wfplayersdata
+
+        expected = [
+            LayerRecord.from_layer(x).to_dict()
+            for x in TestGeoNodeToHDX.wfplayersdata
+        ]
+        for max_fetch_workers in (1, 3):
+            for _, layers in geonodetohdx.get_countries_layers(
+                countries, max_fetch_workers, compact=True
+            ):
+                assert [x.to_dict() for x in layers] == expected
+
+    def test_get_countries_layers_concurrent(
+        self, stub_geonode_url, slow_downloader
+    ):
+        countries = [
+            {"iso3": f"C{i:02d}", "name": f"C{i:02d}", "layers": f"C{i:02d}"}
+            for i in range(60)
+        ]
+        geonodetohdx = GeoNodeToHDX(stub_geonode_url, slow_downloader)
+        for page_size in (None, 2):
+            results = list(
+                geonodetohdx.get_countries_layers(
+                    countries, max_fetch_workers=12, page_size=page_size
+                )
+            )
+            assert [x[0] for x in results] == countries
+            for countrydata, layers in results:
+                iso3 = countrydata["iso3"]
+                assert [x["title"] for x in layers] == [
+                    f"{iso3} 0",
+                    f"{iso3} 1",
+                    f"{iso3} 2",
+                ]
+
     def test_generate_dataset_and_showcase(self, configuration, downloader):
         geonodetohdx = GeoNodeToHDX("http://xxx", downloader)
         dataset, ranges, showcase = geonodetohdx.generate_dataset_and_showcase(
@@ -795,6 +961,71 @@ class TestGeoNodeToHDX:
         ]
         assert showcase == self.mimushowcases[1]
 
+    def test_get_layer_record(self, configuration, downloader):
+        geonodetohdx = GeoNodeToHDX("http://xxx", downloader)
+        shared = LayerRecord.from_layer(TestGeoNodeToHDX.wfplayersdata[1])
+        record = geonodetohdx.get_layer_record(
+            "SDN", shared, self.wfpmetadata, get_date_from_title=True
+        )
+        # A layer shared by regions gets a record per country
+        other = geonodetohdx.get_layer_record(
+            "SSD", shared, self.wfpmetadata, get_date_from_title=True
+        )
+        assert record is not shared and other is not record
+        assert shared.countryiso is None
+        assert other.countryiso == "SSD"
+        assert record.countryiso == "SDN"
+        assert record.name == self.wfpdatasets[1]["name"]
+        assert record.dataset_title == self.wfpdatasets[1]["title"]
+        assert record.ranges == [
+            (datetime(2014, 1, 1, 0, 0), datetime(2014, 12, 31, 0, 0)),
+            (datetime(2018, 1, 1, 0, 0), datetime(2018, 12, 31, 0, 0)),
+        ]
+        # Remote GeoNode host is recorded whether or not the dataset is built
+        assert list(geonodetohdx.geonode_urls) == [
+            "http://xxx",
+            "https://ogcserver.gis.wfp.org",
+        ]
+        (
+            dataset,
+            showcase,
+        ) = geonodetohdx.generate_dataset_and_showcase_from_record(
+            record, self.wfpmetadata
+        )
+        assert dataset == self.wfpdatasets[1]
+        assert dataset.get_resources() == self.wfpresources[1]
+        assert showcase == self.wfpshowcases[1]
+        assert geonodetohdx.geonode_urls[1] == "https://ogcserver.gis.wfp.org"
+
+        layer = copy.deepcopy(TestGeoNodeToHDX.wfplayersdata[0])
+        layer["abstract"] = f'{layer["abstract"]} deprecated'
+        record = geonodetohdx.get_layer_record("SDN", layer, self.wfpmetadata)
+        assert record is None
+
+    def test_plan_uploads_ignored(self, configuration, downloader):
+        geonodetohdx = GeoNodeToHDX("http://xxx", downloader)
+        get_ignored_terms = geonodetohdx.get_ignored_terms
+        calls = list()
+
+        def count_calls(layer):
+            calls.append(layer["title"])
+            return get_ignored_terms(layer)
+
+        geonodetohdx.get_ignored_terms = count_calls
+        layers = copy.deepcopy(TestGeoNodeToHDX.wfplayersdata)
+        layers[0]["abstract"] = f'{layers[0]["abstract"]} deprecated'
+        plan = geonodetohdx.plan_uploads(
+            [({"iso3": "SDN"}, layers)],
+            self.wfpmetadata,
+            get_date_from_title=True,
+        )
+        # Ignored terms are looked for once per layer
+        assert calls == [x["title"] for x in layers]
+        assert plan.get_names() == [self.wfpnames[1]]
+        assert [x["terms"] for x in plan.get_skipped_report()] == [
+            ["deprecated"]
+        ]
+
     def test_mappings(self, configuration, downloader, yaml_config):
         geonodetohdx = GeoNodeToHDX("http://yyy", downloader)
         layersdata = copy.deepcopy(TestGeoNodeToHDX.mimulayersdata[0])
@@ -818,8 +1049,14 @@ class TestGeoNodeToHDX:
         )
         assert dataset is None
         assert showcase is None
+        assert geonodetohdx.get_ignored_terms(layersdata) == ["abcd"]
         layersdata["abstract"] = f"{abstract} hdx"
+        assert geonodetohdx.get_ignored_terms(layersdata) == []
         geonodetohdx.get_ignore_data().append("hdx")
+        assert geonodetohdx.get_ignored_terms(layersdata) == ["hdx"]
+        layersdata["abstract"] = f"{abstract} HDX abcd"
+        assert geonodetohdx.get_ignored_terms(layersdata) == ["abcd", "hdx"]
+        layersdata["abstract"] = f"{abstract} hdx"
         dataset, ranges, showcase = geonodetohdx.generate_dataset_and_showcase(
             "MMR", layersdata, self.mimumetadata, get_date_from_title=True
         )
@@ -964,7 +1201,9 @@ class TestGeoNodeToHDX:
             ],
         }
 
-    def test_generate_datasets_and_showcases(self, configuration, downloader):
+    def test_generate_datasets_and_showcases(
+        self, configuration, downloader, tmp_path
+    ):
         geonodetohdx = GeoNodeToHDX("http://xxx", downloader)
         datasets = list()
         showcases = list()
@@ -982,6 +1221,34 @@ class TestGeoNodeToHDX:
         assert showcases == self.wfpshowcases
         assert datasets_to_keep == self.wfpnames
 
+        geonodetohdx = GeoNodeToHDX("http://xxx", downloader)
+        datasets = list()
+        showcases = list()
+        datasets_to_keep = geonodetohdx.generate_datasets_and_showcases(
+            self.wfpmetadata,
+            create_dataset_showcase=create_dataset_showcase,
+            get_date_from_title=True,
+            max_fetch_workers=4,
+        )
+        assert datasets == self.wfpdatasets
+        assert showcases == self.wfpshowcases
+        assert datasets_to_keep == self.wfpnames
+
+        geonodetohdx = GeoNodeToHDX("http://ccc", downloader)
+        datasets = list()
+        showcases = list()
+        datasets_to_keep = geonodetohdx.generate_datasets_and_showcases(
+            self.wfpmetadata,
+            create_dataset_showcase=create_dataset_showcase,
+            get_date_from_title=True,
+            bulk_layers=True,
+        )
+        assert datasets == self.wfpdatasets
+        assert [x["name"] for x in showcases] == [
+            x["name"] for x in self.wfpshowcases
+        ]
+        assert datasets_to_keep == self.wfpnames
+
         geonodetohdx = GeoNodeToHDX("http://yyy", downloader)
         datasets = list()
         showcases = list()
@@ -996,23 +1263,72 @@ class TestGeoNodeToHDX:
         assert showcases == self.mimushowcases
         assert datasets_to_keep == self.mimunames
 
+        def create_changed_dataset_showcase(dataset, showcase, batch):
+            create_dataset_showcase(dataset, showcase, batch)
+            return {"dataset": "created", "showcase": "unchanged"}
+
         geonodetohdx = GeoNodeToHDX("http://zzz", downloader)
         datasets = list()
         showcases = list()
+        metrics_path = join(tmp_path, "metrics.json")
+        profiles_folder = join(tmp_path, "profiles")
         datasets_to_keep = geonodetohdx.generate_datasets_and_showcases(
             self.mimumetadata,
-            create_dataset_showcase=create_dataset_showcase,
+            create_dataset_showcase=create_changed_dataset_showcase,
             countrydata={"iso3": "MMR", "name": "Myanmar", "layers": None},
             get_date_from_title=True,
             dataset_tags_mapping=self.dataset_tags_mapping,
+            metrics_path=metrics_path,
+            profiler=LayerProfiler(profiles_folder, top_n=5),
         )
         assert datasets == self.mimudatasets
+        with open(metrics_path) as f:
+            summary = json.load(f)
+        assert summary["counters"] == {
+            "layers_read": 3,
+            "layers_deduplicated": 1,
+            "layers_written": 2,
+            "datasets_created": 2,
+            "showcases_unchanged": 2,
+        }
+        assert summary["stages"]["layers_fetch"]["count"] == 1
+        assert summary["stages"]["generate"]["count"] == 3
+        assert summary["stages"]["create_dataset_showcase"]["count"] == 2
+        with open(join(profiles_folder, "slowest_layers.json")) as f:
+            slowest = json.load(f)
+        # Only the two layers that are uploaded are profiled
+        assert len(slowest) == 2
+        assert all(x["key"].startswith("MMR ") for x in slowest)
+        assert slowest[0]["seconds"] >= slowest[1]["seconds"]
+        # Parsing in plan_uploads and the upload are in the same profile
+        stats = pstats.Stats(join(profiles_folder, slowest[0]["profile"]))
+        functions = {x[2] for x in stats.stats}
+        assert "get_layer_record" in functions
+        assert "create_from_record" in functions
         mimushowcases = copy.deepcopy(self.mimushowcases)
         mimushowcases[0]["url"] = mimushowcases[0]["url"].replace("yyy", "zzz")
         mimushowcases[1]["url"] = mimushowcases[1]["url"].replace("yyy", "zzz")
         assert showcases == mimushowcases
         assert datasets_to_keep == self.mimunames
 
+        geonodetohdx = GeoNodeToHDX("http://bbb", downloader)
+        datasets = list()
+        showcases = list()
+        datasets_to_keep = geonodetohdx.generate_datasets_and_showcases(
+            self.mimumetadata,
+            create_dataset_showcase=create_dataset_showcase,
+            countrydata={"iso3": "MMR", "name": "Myanmar", "layers": None},
+            get_date_from_title=True,
+            dataset_tags_mapping=self.dataset_tags_mapping,
+            page_size=1,
+        )
+        assert datasets == self.mimudatasets
+        mimushowcases = copy.deepcopy(self.mimushowcases)
+        mimushowcases[0]["url"] = mimushowcases[0]["url"].replace("yyy", "bbb")
+        mimushowcases[1]["url"] = mimushowcases[1]["url"].replace("yyy", "bbb")
+        assert showcases == mimushowcases
+        assert datasets_to_keep == self.mimunames
+
         geonodetohdx = GeoNodeToHDX("http://aaa", downloader)
         datasets = list()
         showcases = list()
@@ -1022,9 +1338,582 @@ class TestGeoNodeToHDX:
             countrydata={"iso3": "MMR", "name": "Myanmar", "layers": None},
             get_date_from_title=False,
         )
-        assert datasets == self.mimudatasets_withdates
-        assert showcases == self.mimushowcases_withdates
+        # The repeated layer is planned once so each dataset is written once
+        assert datasets == self.mimudatasets_withdates[:2]
+        assert showcases == self.mimushowcases_withdates[:2]
+        assert datasets_to_keep == self.mimunames_withdates
+        assert geonodetohdx.upload_plan.get_skipped_report() == [
+            {
+                "reason": "superseded",
+                "countryiso": "MMR",
+                "title": "Myanmar Town 2019 July",
+                "name": "mimu-geonode-myanmar-town-2019-july",
+                "max_date": "0001-01-01T00:00:00",
+                "winner_title": "Myanmar Town 2019 July",
+                "winner_max_date": "0001-01-01T00:00:00",
+            }
+        ]
+        # Records, with their abstracts, are dropped once uploaded
+        winners = geonodetohdx.upload_plan.winners.values()
+        assert all(x.record is None for x in winners)
+
+        geonodetohdx = GeoNodeToHDX("http://aaa", downloader)
+        datasets = list()
+        showcases = list()
+        datasets_to_keep = geonodetohdx.generate_datasets_and_showcases(
+            self.mimumetadata,
+            create_dataset_showcase=create_dataset_showcase,
+            countrydata={"iso3": "MMR", "name": "Myanmar", "layers": None},
+            get_date_from_title=False,
+            max_upload_workers=3,
+            upload_rate_limiter=RateLimiter(100),
+        )
+        assert sorted(x["name"] for x in datasets) == sorted(
+            self.mimunames_withdates
+        )
+        assert datasets_to_keep == self.mimunames_withdates
+
+    def test_generate_datasets_and_showcases_state_store(
+        self, configuration, downloader, tmp_path
+    ):
+        datasets = list()
+
+        def create_dataset_showcase(dataset, showcase, batch):
+            datasets.append(dataset)
+
+        path = join(tmp_path, "state.sqlite")
+        for expected_datasets in (self.mimudatasets, list()):
+            geonodetohdx = GeoNodeToHDX("http://zzz", downloader)
+            datasets = list()
+            with LayerStateStore(path) as state_store:
+                datasets_to_keep = (
+                    geonodetohdx.generate_datasets_and_showcases(
+                        self.mimumetadata,
+                        create_dataset_showcase=create_dataset_showcase,
+                        countrydata={
+                            "iso3": "MMR",
+                            "name": "Myanmar",
+                            "layers": None,
+                        },
+                        get_date_from_title=True,
+                        dataset_tags_mapping=self.dataset_tags_mapping,
+                        state_store=state_store,
+                    )
+                )
+            assert datasets == expected_datasets
+            assert datasets_to_keep == self.mimunames
+
+        geonodetohdx = GeoNodeToHDX("http://zzz", downloader)
+        geonodetohdx.get_category_mapping()["Location"] = "acronyms"
+        datasets = list()
+        with LayerStateStore(path) as state_store:
+            datasets_to_keep = geonodetohdx.generate_datasets_and_showcases(
+                self.mimumetadata,
+                create_dataset_showcase=create_dataset_showcase,
+                countrydata={"iso3": "MMR", "name": "Myanmar", "layers": None},
+                get_date_from_title=True,
+                state_store=state_store,
+            )
+        assert len(datasets) == 2
+        assert datasets_to_keep == self.mimunames
+
+    def test_unchanged_layers_register_hosts(
+        self, configuration, downloader, tmp_path
+    ):
+        datasets = list()
+
+        def create_dataset_showcase(dataset, showcase, batch):
+            datasets.append(dataset)
+
+        path = join(tmp_path, "state.sqlite")
+        for expected_datasets in (self.wfpdatasets, list()):
+            geonodetohdx = GeoNodeToHDX("http://xxx", downloader)
+            datasets = list()
+            with LayerStateStore(path) as state_store:
+                geonodetohdx.generate_datasets_and_showcases(
+                    self.wfpmetadata,
+                    create_dataset_showcase=create_dataset_showcase,
+                    get_date_from_title=True,
+                    state_store=state_store,
+                )
+            assert datasets == expected_datasets
+            # Host of remote layer is known even when nothing is uploaded
+            assert (
+                geonodetohdx.geonode_urls[1] == "https://ogcserver.gis.wfp.org"
+            )
+
+    def test_generate_datasets_and_showcases_checkpoint(
+        self, configuration, downloader, tmp_path
+    ):
+        datasets = list()
+        crash = [True]
+
+        def create_dataset_showcase(dataset, showcase, batch):
+            if crash[0] and len(datasets) == 1:
+                raise ValueError("Crash!")
+            datasets.append(dataset)
+
+        checkpoint = Checkpoint(join(tmp_path, "checkpoint.json"))
+        geonodetohdx = GeoNodeToHDX("http://xxx", downloader)
+        with pytest.raises(ValueError):
+            geonodetohdx.generate_datasets_and_showcases(
+                self.wfpmetadata,
+                create_dataset_showcase=create_dataset_showcase,
+                get_date_from_title=True,
+                checkpoint=checkpoint,
+                resume=True,
+            )
+        # Sudan was not finished so nothing is recorded
+        assert checkpoint.load() is None
+
+        saves = list()
+
+        class MyCheckpoint(Checkpoint):
+            def save(self, *args):
+                super().save(*args)
+                saves.append(self.load())
+
+        checkpoint = MyCheckpoint(join(tmp_path, "checkpoint.json"))
+        datasets = list()
+        crash[0] = False
+        geonodetohdx = GeoNodeToHDX("http://xxx", downloader)
+        datasets_to_keep = geonodetohdx.generate_datasets_and_showcases(
+            self.wfpmetadata,
+            create_dataset_showcase=create_dataset_showcase,
+            get_date_from_title=True,
+            checkpoint=checkpoint,
+            batch="1234",
+        )
+        assert datasets == self.wfpdatasets
+        assert datasets_to_keep == self.wfpnames
+        assert len(saves) == 1
+        assert saves[0] == {
+            "countries": ["SDN"],
+            "batch": "1234",
+            "geonode_urls": ["http://xxx", "https://ogcserver.gis.wfp.org"],
+        }
+        assert checkpoint.load() is None
+
+        checkpoint.save(["SDN"], "5678", saves[0]["geonode_urls"])
+        datasets = list()
+        geonodetohdx = GeoNodeToHDX("http://xxx", downloader)
+        datasets_to_keep = geonodetohdx.generate_datasets_and_showcases(
+            self.wfpmetadata,
+            create_dataset_showcase=create_dataset_showcase,
+            get_date_from_title=True,
+            checkpoint=checkpoint,
+            resume=True,
+        )
+        assert datasets == list()
+        assert datasets_to_keep == self.wfpnames
+        assert geonodetohdx.geonode_urls[1] == "https://ogcserver.gis.wfp.org"
+        assert checkpoint.load() is None
+
+    def test_federation(self, search_datasets, configuration, downloader):
+        datasets = list()
+        lock = Lock()
+
+        def create_dataset_showcase(dataset, showcase, batch):
+            with lock:
+                datasets.append(dataset["name"])
+
+        server_configs = [
+            {"geonode_url": "http://xxx", "metadata": self.wfpmetadata},
+            {
+                "geonode_url": "http://yyy",
+                "metadata": self.mimumetadata,
+                "countrydata": {
+                    "iso3": "MMR",
+                    "name": "Myanmar",
+                    "layers": None,
+                },
+                "dataset_tags_mapping": self.dataset_tags_mapping,
+            },
+            {"geonode_url": "http://nothing", "metadata": self.wfpmetadata},
+        ]
+        federation = GeoNodeFederation(
+            server_configs, downloader, max_servers=3, max_per_host=1
+        )
+        results = federation.run(
+            create_dataset_showcase=create_dataset_showcase,
+            get_date_from_title=True,
+        )
+        assert sorted(datasets) == sorted(self.wfpnames + self.mimunames)
+        assert list(results) == ["http://xxx", "http://yyy", "http://nothing"]
+        assert results["http://xxx"]["datasets"] == self.wfpnames
+        assert results["http://xxx"]["delete"] == list()
+        assert results["http://xxx"]["error"] is None
+        assert results["http://yyy"]["datasets"] == self.mimunames
+        assert results["http://yyy"]["error"] is None
+        assert results["http://nothing"]["datasets"] == list()
+        assert results["http://nothing"]["error"] is not None
+
+        assert results["http://yyy"]["delete"] == list()
+        results["http://yyy"]["delete"] = [
+            Dataset({"name": x, "title": x}) for x in ("a", "b")
+        ]
+        deleted = list()
+        summaries = federation.delete_datasets(
+            results, delete_from_hdx=deleted.append
+        )
+        assert list(summaries) == ["http://xxx", "http://yyy"]
+        assert summaries["http://yyy"]["deleted"] == ["a", "b"]
+        assert [x["name"] for x in deleted] == ["a", "b"]
+        summaries = federation.delete_datasets(results, max_deletions=1)
+        assert summaries["http://yyy"]["capped"] is True
+
+        with pytest.raises(ValueError):
+            GeoNodeFederation(server_configs + server_configs[:1], downloader)
+
+    def test_host_limited_download_concurrent(
+        self, stub_geonode_url, slow_downloader
+    ):
+        downloader = HostLimitedDownload(slow_downloader, 8, 4)
+        # Several servers, each with its own prefetch threads, share it
+        geonodetohdxs = [
+            GeoNodeToHDX(stub_geonode_url, downloader) for _ in range(3)
+        ]
+        countries = [
+            {"iso3": f"C{i:02d}", "name": f"C{i:02d}", "layers": f"C{i:02d}"}
+            for i in range(30)
+        ]
+
+        def run(geonodetohdx):
+            return list(
+                geonodetohdx.get_countries_layers(
+                    countries, max_fetch_workers=6
+                )
+            )
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            results = list(executor.map(run, geonodetohdxs))
+        for result in results:
+            for countrydata, layers in result:
+                iso3 = countrydata["iso3"]
+                assert [x["title"] for x in layers] == [
+                    f"{iso3} 0",
+                    f"{iso3} 1",
+                    f"{iso3} 2",
+                ]
+
+    def test_federation_stale_and_hdx_requests(
+        self, search_datasets, configuration, downloader
+    ):
+        in_progress = [0, 0]
+        lock = Lock()
+
+        def create_dataset_showcase(dataset, showcase, batch):
+            with lock:
+                in_progress[0] += 1
+                in_progress[1] = max(in_progress)
+            time.sleep(0.01)
+            with lock:
+                in_progress[0] -= 1
+
+        server_configs = [
+            {"geonode_url": "http://xxx", "metadata": self.mimumetadata},
+            {
+                "geonode_url": "http://yyy",
+                "metadata": self.mimumetadata,
+                "countrydata": {
+                    "iso3": "MMR",
+                    "name": "Myanmar",
+                    "layers": None,
+                },
+            },
+        ]
+        federation = GeoNodeFederation(
+            server_configs, downloader, max_servers=2, max_hdx_requests=1
+        )
+        results = federation.run(
+            create_dataset_showcase=create_dataset_showcase,
+            max_upload_workers=2,
+        )
+        assert in_progress[1] == 1
+        # WFP datasets are stale for the xxx run with MIMU metadata as the
+        # datasets it creates have other names
+        stale = results["http://xxx"]["delete"]
+        assert [x["name"] for x in stale] == [
+            x["name"] for x in self.wfpdatasets
+        ]
+        geonodetohdx = federation.geonodetohdxs["http://xxx"]
+        assert (
+            geonodetohdx.metrics.get_summary()["counters"].get(
+                "datasets_deleted", 0
+            )
+            == 0
+        )
+
+    def test_async_generate_datasets_and_showcases(
+        self, configuration, downloader
+    ):
+        geonodetohdx = AsyncGeoNodeToHDX(
+            "http://xxx", downloader, max_concurrency=3
+        )
+        countries = asyncio.run(geonodetohdx.get_countries())
+        assert countries == [{"iso3": "SDN", "name": "Sudan", "layers": "SDN"}]
+        layers = asyncio.run(geonodetohdx.get_layers("SDN"))
+        assert layers == TestGeoNodeToHDX.wfplayersdata
+
+        datasets = list()
+        showcases = list()
+
+        def create_dataset_showcase(dataset, showcase, batch):
+            datasets.append(dataset)
+            showcases.append(showcase)
+
+        datasets_to_keep = asyncio.run(
+            geonodetohdx.generate_datasets_and_showcases(
+                self.wfpmetadata,
+                create_dataset_showcase=create_dataset_showcase,
+                get_date_from_title=True,
+            )
+        )
+        key = lambda x: x["name"]  # noqa: E731
+        assert sorted(datasets, key=key) == sorted(self.wfpdatasets, key=key)
+        assert sorted(showcases, key=key) == sorted(self.wfpshowcases, key=key)
+        assert datasets_to_keep == self.wfpnames
+
+        geonodetohdx = AsyncGeoNodeToHDX("http://aaa", downloader)
+        datasets = list()
+        showcases = list()
+        datasets_to_keep = asyncio.run(
+            geonodetohdx.generate_datasets_and_showcases(
+                self.mimumetadata,
+                create_dataset_showcase=create_dataset_showcase,
+                countrydata={"iso3": "MMR", "name": "Myanmar", "layers": None},
+                get_date_from_title=False,
+            )
+        )
+        # The older layer of the same dataset name is not written
+        assert sorted(datasets, key=key) == sorted(
+            self.mimudatasets_withdates[:2], key=key
+        )
         assert datasets_to_keep == self.mimunames_withdates
+        skipped = geonodetohdx.geonodetohdx.upload_plan.get_skipped_report()
+        assert [x["reason"] for x in skipped] == ["superseded"]
+        geonodetohdx.close()
+
+    def test_async_context_manager(self, configuration, downloader):
+        async def run():
+            async with AsyncGeoNodeToHDX(
+                "http://xxx", downloader, max_concurrency=2
+            ) as geonodetohdx:
+                countries = await geonodetohdx.get_countries()
+                # Synchronous methods of the wrapped object still work
+                assert geonodetohdx.geonodetohdx.get_countries() == countries
+            return geonodetohdx
+
+        geonodetohdx = asyncio.run(run())
+        with pytest.raises(RuntimeError):
+            geonodetohdx.executor.submit(print)
+
+    def test_async_get_layers_concurrent(
+        self, stub_geonode_url, slow_downloader
+    ):
+        codes = [f"C{i:02d}" for i in range(60)]
+
+        async def run():
+            async with AsyncGeoNodeToHDX(
+                stub_geonode_url, slow_downloader, max_concurrency=12
+            ) as geonodetohdx:
+                return await asyncio.gather(
+                    *[geonodetohdx.get_layers(code) for code in codes]
+                )
+
+        countries_layers = asyncio.run(run())
+        for code, layers in zip(codes, countries_layers):
+            assert [x["title"] for x in layers] == [
+                f"{code} 0",
+                f"{code} 1",
+                f"{code} 2",
+            ]
+
+    def test_create_changed_dataset_showcase(self, configuration, monkeypatch):
+        calls = list()
+
+        def record(name):
+            def fn(self, *args, **kwargs):
+                calls.append((name, self["name"]))
+
+            return fn
+
+        monkeypatch.setattr(Dataset, "update_from_yaml", lambda x: None)
+        monkeypatch.setattr(Dataset, "create_in_hdx", record("dataset"))
+        monkeypatch.setattr(Showcase, "create_in_hdx", record("showcase"))
+        monkeypatch.setattr(Showcase, "add_dataset", record("add"))
+        existing = dict()
+
+        class MyDataset:
+            @staticmethod
+            def read_from_hdx(name):
+                dataset = existing.get(name)
+                if dataset is None:
+                    return None
+                dataset = self.construct_dataset(*dataset)
+                dataset["id"] = "1234"
+                return dataset
+
+        class MyShowcase:
+            @staticmethod
+            def read_from_hdx(name):
+                showcase = existing.get(name)
+                if showcase is None:
+                    return None
+                return Showcase(copy.deepcopy(showcase))
+
+        def create(index):
+            dataset = self.construct_dataset(
+                self.wfpdatasets[index], self.wfpresources[index]
+            )
+            showcase = Showcase(copy.deepcopy(self.wfpshowcases[index]))
+            return create_changed_dataset_showcase(
+                dataset,
+                showcase,
+                datasetclass=MyDataset,
+                showcaseclass=MyShowcase,
+            )
+
+        dataset_name = self.wfpdatasets[0]["name"]
+        showcase_name = self.wfpshowcases[0]["name"]
+        assert create(0) == {"dataset": "created", "showcase": "created"}
+        assert calls == [
+            ("dataset", dataset_name),
+            ("showcase", showcase_name),
+            ("add", showcase_name),
+        ]
+        existing[dataset_name] = (self.wfpdatasets[0], self.wfpresources[0])
+        existing[showcase_name] = self.wfpshowcases[0]
+        calls = list()
+        assert create(0) == {"dataset": "unchanged", "showcase": "unchanged"}
+        assert calls == list()
+        existing[dataset_name] = (self.wfpdatasets[1], self.wfpresources[0])
+        assert create(0) == {"dataset": "updated", "showcase": "unchanged"}
+        assert calls == [("dataset", dataset_name)]
+        existing[dataset_name] = (self.wfpdatasets[0], self.wfpresources[1])
+        existing[showcase_name] = self.wfpshowcases[1]
+        calls = list()
+        assert create(0) == {"dataset": "updated", "showcase": "updated"}
+        assert calls == [
+            ("dataset", dataset_name),
+            ("showcase", showcase_name),
+        ]
+
+    def test_write_plan(
+        self, search_datasets, configuration, downloader, tmp_path, monkeypatch
+    ):
+        def update_from_yaml(dataset):
+            dataset["dataset_preview"] = "resource_id"
+
+        monkeypatch.setattr(Dataset, "update_from_yaml", update_from_yaml)
+        path = join(tmp_path, "plan.jsonl")
+        geonodetohdx = GeoNodeToHDX("http://xxx", downloader)
+        summary = geonodetohdx.write_plan(
+            path, self.mimumetadata, get_date_from_title=True
+        )
+        # Existing datasets of the organisation are updated whoever maintains
+        # them but only those of the maintainer are deleted
+        assert summary == {
+            "create": 1,
+            "update": 1,
+            "skip": 0,
+            "delete": 2,
+            "capped": False,
+        }
+        with open(path) as f:
+            entries = [json.loads(x) for x in f]
+        assert entries[0] == dict(action="summary", **summary)
+        assert [(x["action"], x["name"]) for x in entries[1:]] == [
+            ("update", "mimu-geonode-ica-sudan-land-degradation"),
+            (
+                "create",
+                "mimu-geonode-ica-sudan-most-predominant-livelihood-zones",
+            ),
+            ("delete", self.wfpnames[0]),
+            ("delete", self.wfpnames[1]),
+        ]
+        assert entries[1]["dataset"]["resources"][0]["format"] == "shp"
+        # Payload is updated from the static dataset YAML as on create
+        assert entries[1]["dataset"]["dataset_preview"] == "resource_id"
+        assert entries[1]["showcase"]["name"] == (
+            "mimu-geonode-ica-sudan-land-degradation-showcase"
+        )
+
+        path = join(tmp_path, "plan.json")
+        state_path = join(tmp_path, "state.sqlite")
+        geonodetohdx = GeoNodeToHDX("http://xxx", downloader)
+        with LayerStateStore(state_path) as state_store:
+            summary = geonodetohdx.write_plan(
+                path,
+                self.wfpmetadata,
+                get_date_from_title=True,
+                state_store=state_store,
+                max_deletions=0,
+            )
+            assert state_store.get_fingerprint(self.wfpnames[0]) is None
+        assert summary == {
+            "create": 0,
+            "update": 2,
+            "skip": 0,
+            "delete": 0,
+            "capped": False,
+        }
+        with open(path) as f:
+            plan = json.load(f)
+        assert plan["summary"] == summary
+        assert [x["name"] for x in plan["actions"]] == self.wfpnames
+
+    def test_iter_organisation_datasets(
+        self, search_datasets, configuration, downloader
+    ):
+        geonodetohdx = GeoNodeToHDX("http://xxx", downloader)
+        expected = [x["name"] for x in self.wfpdatasets]
+        for page_size, starts in ((1000, [0]), (2, [0]), (1, [0, 1])):
+            del search_datasets[:]
+            datasets = geonodetohdx.iter_organisation_datasets(
+                self.wfpmetadata, page_size=page_size
+            )
+            assert [x["name"] for x in datasets] == expected
+            # Exactly one request per page
+            assert [x[2] for x in search_datasets] == starts
+            assert {x[1] for x in search_datasets} == {page_size}
+
+    def test_iter_organisation_datasets_count_changes(
+        self, configuration, downloader, monkeypatch
+    ):
+        names = ["a", "b", "c"]
+        searches = list()
+
+        def call_remoteckan(configuration, action, data):
+            start, rows = data["start"], data["rows"]
+            searches.append(start)
+            results = [{"name": x} for x in names[start : start + rows]]
+            result = {"count": len(names), "results": results}
+            # The first dataset is deleted after the first page is read
+            if names[0] == "a":
+                names.remove("a")
+            return result
+
+        monkeypatch.setattr(Configuration, "call_remoteckan", call_remoteckan)
+        geonodetohdx = GeoNodeToHDX("http://xxx", downloader)
+        datasets = geonodetohdx.iter_organisation_datasets(
+            self.wfpmetadata, page_size=1
+        )
+        # Without restarting, b would be skipped as it moved to the first page
+        assert [x["name"] for x in datasets] == ["a", "b", "c"]
+        assert searches == [0, 1, 0, 1]
+
+        def call_remoteckan(configuration, action, data):
+            names.append(f"new{len(names)}")
+            return {"count": len(names), "results": [{"name": names[0]}]}
+
+        monkeypatch.setattr(Configuration, "call_remoteckan", call_remoteckan)
+        with pytest.raises(HDXError):
+            list(
+                geonodetohdx.iter_organisation_datasets(
+                    self.wfpmetadata, page_size=1
+                )
+            )
 
     def test_delete_other_datasets(
         self, search_datasets, configuration, downloader
@@ -1053,12 +1942,83 @@ class TestGeoNodeToHDX:
         )
         assert len(datasets) == 0
 
+        geonodetohdx = GeoNodeToHDX("http://xxx", downloader)
+        geonodetohdx.geonode_urls.append("https://ogcserver.gis.wfp.org")
+        geonodetohdx.delete_other_datasets(
+            self.mimunames,
+            self.mimumetadata,
+            delete_from_hdx=delete_from_hdx,
+            page_size=1,
+        )
+        assert [x["name"] for x in datasets] == [
+            x["name"] for x in self.wfpdatasets
+        ]
+
+        datasets = list()
+        summary = geonodetohdx.delete_other_datasets(
+            self.mimunames,
+            self.mimumetadata,
+            delete_from_hdx=delete_from_hdx,
+            max_deletions=1,
+        )
+        assert len(datasets) == 0
+        assert summary == {
+            "stale": 2,
+            "deleted": list(),
+            "failed": dict(),
+            "capped": True,
+        }
+
+        def fail_delete_from_hdx(dataset):
+            if dataset["name"] == self.wfpdatasets[0]["name"]:
+                raise ValueError("Delete failed!")
+            time.sleep(0.01)
+            datasets.append(dataset)
+
+        summary = geonodetohdx.delete_other_datasets(
+            self.mimunames,
+            self.mimumetadata,
+            delete_from_hdx=fail_delete_from_hdx,
+            max_delete_workers=2,
+            delete_rate_limiter=RateLimiter(100),
+            max_deletions=2,
+        )
+        assert [x["name"] for x in datasets] == [self.wfpdatasets[1]["name"]]
+        assert summary == {
+            "stale": 2,
+            "deleted": [self.wfpdatasets[1]["name"]],
+            "failed": {self.wfpdatasets[0]["name"]: "Delete failed!"},
+            "capped": False,
+        }
+
     def test_get_orgname(self):
         metadata = {"orgid": "12345"}
 
+        calls = list()
+
         class MyOrg:
             @staticmethod
             def read_from_hdx(id):
+                calls.append(id)
+                time.sleep(0.05)
                 return {"name": "abc"}
 
+        GeoNodeToHDX.orgname_cache.clear()
         assert GeoNodeToHDX.get_orgname(metadata, orgclass=MyOrg) == "abc"
+        assert metadata["orgname"] == "abc"
+        assert GeoNodeToHDX.get_orgname({"orgid": "12345"}, MyOrg) == "abc"
+        assert calls == ["12345"]
+
+        calls = list()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            orgnames = list(
+                executor.map(
+                    lambda _: GeoNodeToHDX.get_orgname(
+                        {"orgid": "678"}, MyOrg
+                    ),
+                    range(8),
+                )
+            )
+        assert orgnames == ["abc"] * 8
+        assert calls == ["678"]
+        GeoNodeToHDX.orgname_cache.clear()
@@ -0,0 +1,88 @@
+"""GeoNode hosts Tests"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hdx.scraper.geonode.hosts import GeoNodeHosts
+
+
+class TestGeoNodeHosts:
+    def test_matches(self):
+        hosts = GeoNodeHosts(["http://xxx"])
+        assert hosts == ["http://xxx"]
+        assert hosts.matches("http://xxx/geoserver/wfs?typename=abc")
+        # Server urls are matched anywhere in the url as they always were
+        assert hosts.matches("https://proxy.org/?url=http://xxx/geoserver")
+        assert hosts.matches("http://xxx.org/geoserver/wms")
+        assert not hosts.matches("https://xxx/geoserver/wms")
+        assert not hosts.matches("http://yyy/geoserver/wms")
+        assert not hosts.matches("")
+        assert not hosts.matches(None)
+        hosts.append("https://ogcserver.gis.wfp.org")
+        assert hosts[1] == "https://ogcserver.gis.wfp.org"
+        assert hosts.matches("https://ogcserver.gis.wfp.org/geoserver/wfs")
+        hosts.insert(0, "http://zzz:8080")
+        assert hosts[0] == "http://zzz:8080"
+        assert hosts.matches("http://zzz:8080/geoserver/wfs")
+        assert not hosts.matches("http://zzz/geoserver/wfs")
+        hosts += ["http://aaa"]
+        assert hosts.matches("http://aaa/geoserver/wfs")
+        assert list(hosts) == [
+            "http://zzz:8080",
+            "http://xxx",
+            "https://ogcserver.gis.wfp.org",
+            "http://aaa",
+        ]
+        assert GeoNodeHosts().matches("http://xxx") is False
+
+    def test_same_as_substring_search(self):
+        servers = [
+            "http://xxx",
+            "https://ogcserver.gis.wfp.org",
+            "http://zzz:8080",
+            "http://aaa/geonode",
+        ]
+        urls = [
+            "http://xxx",
+            "http://xxx/geoserver/wfs",
+            "http://xxx?service=wfs",
+            "http://xxx#top",
+            "http://xxx.org/geoserver/wms",
+            "http://xxx:8080/geoserver",
+            "https://xxx/geoserver/wms",
+            "HTTP://xxx/geoserver/wms",
+            "https://proxy.org/?url=http://xxx/geoserver",
+            "https://ogcserver.gis.wfp.org/geoserver/wfs",
+            "https://ogcserver.gis.wfp.org.evil.com/wfs",
+            "http://zzz:8080/geoserver/wfs",
+            "http://zzz/geoserver/wfs",
+            "http://zzz:80801/geoserver/wfs",
+            "http://aaa/geonode/layers",
+            "http://aaa/geoserver/wfs",
+            "xxx/geoserver/wfs",
+            "ftp://http://xxx/",
+        ]
+        for number in range(len(servers) + 1):
+            hosts = GeoNodeHosts(servers[:number])
+            for url in urls:
+                expected = any(x in url for x in servers[:number])
+                assert hosts.matches(url) is expected, url
+
+    def test_immutable(self):
+        hosts = GeoNodeHosts(["http://xxx"])
+        with pytest.raises(TypeError):
+            hosts[0] = "http://yyy"
+        for method in ("remove", "pop", "clear"):
+            assert not hasattr(hosts, method)
+        assert hosts.matches("http://xxx/geoserver/wfs")
+
+    def test_add(self):
+        hosts = GeoNodeHosts(["http://xxx"])
+        assert hosts.add("http://xxx") is False
+        assert "http://xxx" in hosts
+        urls = [f"https://server{i % 10}.org" for i in range(100)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(hosts.add, urls))
+        assert sum(results) == 10
+        assert len(hosts) == 11
+        assert hosts.matches("https://server9.org/geoserver/wfs")
@@ -0,0 +1,46 @@
+"""Layer Record Tests"""
+import pytest
+
+from hdx.scraper.geonode.layer import LayerRecord
+
+
+class TestLayerRecord:
+    def test_from_layer(self):
+        layer = {
+            "title": "Sudan Roads",
+            "abstract": "Roads of Sudan",
+            "date": "2019-07-01T00:00:00",
+            "detail_url": "/layers/geonode%3Asdn_roads",
+            "srid": "EPSG:4326",
+            "id": 123,
+            "regions": ["/api/regions/218/"],
+        }
+        record = LayerRecord.from_layer(layer)
+        record.countryiso = "SDN"
+        record.name = "sudan-roads"
+        copied = LayerRecord.from_layer(record)
+        assert copied is not record
+        assert copied.to_dict() == record.to_dict()
+        assert copied.countryiso is None
+        assert copied.name is None
+        assert record["title"] == "Sudan Roads"
+        assert record.srid == "EPSG:4326"
+        assert record["thumbnail_url"] is None
+        assert record.get("thumbnail_url", "abc") == "abc"
+        assert record.get("regions") is None
+        with pytest.raises(KeyError):
+            record["regions"]
+        with pytest.raises(AttributeError):
+            record.regions = list()
+        assert record.to_dict() == {
+            "title": "Sudan Roads",
+            "abstract": "Roads of Sudan",
+            "supplemental_information": None,
+            "date": "2019-07-01T00:00:00",
+            "category__gn_description": None,
+            "srid": "EPSG:4326",
+            "detail_url": "/layers/geonode%3Asdn_roads",
+            "thumbnail_url": None,
+        }
+        assert copied.ranges == list()
+        assert repr(record) == "LayerRecord('Sudan Roads')"
@@ -0,0 +1,41 @@
+"""Keyword matcher Tests"""
+import pytest
+
+from hdx.scraper.geonode.matcher import KeywordMatcher
+
+
+class TestKeywordMatcher:
+    keywords = [
+        "he",
+        "she",
+        "his",
+        "hers",
+        "camp",
+        "idp",
+        "food security",
+        "security",
+        "admin boundaries",
+    ]
+
+    @pytest.mark.parametrize("max_substring_keywords", (0, 100))
+    def test_find(self, max_substring_keywords):
+        matcher = KeywordMatcher(self.keywords, max_substring_keywords)
+        assert (matcher.goto is None) == bool(max_substring_keywords)
+        assert matcher.find("ushers") == {"he", "she", "hers"}
+        assert matcher.find("refugee camp idp") == {"camp", "idp"}
+        assert matcher.find("food security") == {"food security", "security"}
+        assert matcher.find("foods security") == {"security"}
+        assert matcher.find("") == set()
+        assert matcher.find("xyz") == set()
+
+    @pytest.mark.parametrize("max_substring_keywords", (0, 100))
+    def test_same_as_substring_search(self, max_substring_keywords):
+        matcher = KeywordMatcher(self.keywords + [""], max_substring_keywords)
+        texts = [
+            "Towns are urban areas divided into wards. admin boundaries",
+            "hishersheshe camp camping idps",
+            "Myanmar’s forest cover",
+        ]
+        for text in texts:
+            expected = {x for x in self.keywords + [""] if x in text}
+            assert matcher.find(text) == expected
@@ -0,0 +1,55 @@
+"""Metrics Tests"""
+import json
+from os.path import join
+
+from hdx.scraper.geonode.metrics import Metrics
+
+
+class TestMetrics:
+    def test_metrics(self, tmp_path):
+        metrics = Metrics(buckets=(0.1, 1.0))
+        metrics.increment("layers_read")
+        metrics.increment("layers_read", 2)
+        metrics.observe("generate", 0.05)
+        metrics.observe("generate", 0.5)
+        metrics.observe("generate", 2.0)
+        with metrics.time("delete"):
+            pass
+        summary = metrics.get_summary()
+        assert summary["counters"] == {"layers_read": 3}
+        assert summary["stages"]["generate"] == {
+            "count": 3,
+            "sum": 2.55,
+            "mean": 0.85,
+            "max": 2.0,
+            "buckets": {"0.1": 1, "1.0": 2},
+        }
+        assert summary["stages"]["delete"]["count"] == 1
+
+        path = join(tmp_path, "metrics.json")
+        metrics.write(path)
+        with open(path) as f:
+            assert json.load(f) == summary
+
+        path = join(tmp_path, "metrics.prom")
+        metrics.write(path)
+        with open(path) as f:
+            lines = f.read().splitlines()
+        assert lines[:5] == [
+            "# TYPE hdx_geonode_layers_read_total counter",
+            "hdx_geonode_layers_read_total 3",
+            "# HELP hdx_geonode_stage_seconds Time taken by each stage of a run",
+            "# TYPE hdx_geonode_stage_seconds histogram",
+            'hdx_geonode_stage_seconds_bucket{stage="delete",le="0.1"} 1',
+        ]
+        assert lines[-5:] == [
+            'hdx_geonode_stage_seconds_bucket{stage="generate",le="0.1"} 1',
+            'hdx_geonode_stage_seconds_bucket{stage="generate",le="1.0"} 2',
+            'hdx_geonode_stage_seconds_bucket{stage="generate",le="+Inf"} 3',
+            'hdx_geonode_stage_seconds_sum{stage="generate"} 2.55',
+            'hdx_geonode_stage_seconds_count{stage="generate"} 3',
+        ]
+
+        metrics.clear()
+        assert metrics.get_summary() == {"counters": {}, "stages": {}}
+        assert metrics.get_prometheus_text() == "\n"
@@ -0,0 +1,156 @@
+"""Upload Plan Tests"""
+import json
+from datetime import datetime
+from os.path import join
+
+import pytest
+from hdx.api.configuration import Configuration
+from hdx.data.dataset import Dataset
+from hdx.data.showcase import Showcase
+
+from hdx.scraper.geonode.layer import LayerRecord
+from hdx.scraper.geonode.plan import PlanWriter, SkippedLayer, UploadPlan
+
+
+class TestUploadPlan:
+    @pytest.fixture(scope="function")
+    def configuration(self):
+        Configuration._create(
+            hdx_read_only=True,
+            user_agent="test",
+            project_config_yaml=join(
+                "tests", "config", "project_configuration.yml"
+            ),
+        )
+
+    @staticmethod
+    def get_record(countryiso, title, name, year=None):
+        record = LayerRecord(title=title)
+        record.countryiso = countryiso
+        record.name = name
+        if year:
+            record.ranges = [
+                (datetime(year, 1, 1, 0, 0), datetime(year, 12, 31, 0, 0))
+            ]
+        return record
+
+    def test_add(self):
+        plan = UploadPlan()
+        old = self.get_record("SDN", "Roads 2015", "roads", 2015)
+        assert plan.add(old, "old") is None
+        assert plan.add(self.get_record("SDN", "Rivers", "rivers")) is None
+        new = self.get_record("SSD", "Roads 2018", "roads", 2018)
+        skipped = plan.add(new, "new")
+        assert skipped.record is old
+        assert skipped.context == "old"
+        older = self.get_record("SDN", "Roads 2010", "roads", 2010)
+        assert plan.add(older).record is older
+        same = self.get_record("SSD", "Roads (2018)", "roads", 2018)
+        assert plan.add(same).record is new
+        assert len(plan) == 2
+        assert plan.get_names() == ["roads", "rivers"]
+        assert plan.winners["roads"].record is same
+        assert plan.winners["roads"].max_date == datetime(2018, 12, 31, 0, 0)
+        country_winners = plan.get_country_winners()
+        assert list(country_winners) == ["SSD", "SDN"]
+        assert [x.name for x in country_winners["SDN"]] == ["rivers"]
+        assert all(isinstance(x, SkippedLayer) for x in plan.skipped)
+        assert not hasattr(plan.skipped[0], "record")
+        report = plan.get_skipped_report()
+        assert [x["title"] for x in report] == [
+            "Roads 2015",
+            "Roads 2010",
+            "Roads 2018",
+        ]
+        assert report[0] == {
+            "reason": "superseded",
+            "countryiso": "SDN",
+            "title": "Roads 2015",
+            "name": "roads",
+            "max_date": "2015-12-31T00:00:00",
+            "winner_title": "Roads (2018)",
+            "winner_max_date": "2018-12-31T00:00:00",
+        }
+
+    def test_skipped_report(self):
+        plan = UploadPlan()
+        plan.add_ignored("SDN", "Old Roads", ["deprecated"])
+        plan.add(self.get_record("SDN", "Rivers", "rivers"), "profile")
+        planned = plan.winners["rivers"]
+        plan.add_unchanged(planned)
+        assert planned.record is None
+        assert planned.context is None
+        assert planned.name == "rivers"
+        assert isinstance(plan.ignored[0], SkippedLayer)
+        assert plan.get_skipped_report() == [
+            {
+                "reason": "ignored",
+                "countryiso": "SDN",
+                "title": "Old Roads",
+                "terms": ["deprecated"],
+            },
+            {
+                "reason": "unchanged",
+                "countryiso": "SDN",
+                "title": "Rivers",
+                "name": "rivers",
+                "max_date": "0001-01-01T00:00:00",
+            },
+        ]
+
+    def test_plan_writer(self, configuration, tmp_path, monkeypatch):
+        def update_from_yaml(dataset):
+            dataset["dataset_preview"] = "resource_id"
+
+        monkeypatch.setattr(Dataset, "update_from_yaml", update_from_yaml)
+        plan_writer = PlanWriter(["roads"])
+        for name in ("roads", "rivers"):
+            dataset = Dataset({"name": name, "title": name.capitalize()})
+            dataset.add_update_resource(
+                {
+                    "name": f"{name}.shp",
+                    "url": f"http://xxx/{name}.shp",
+                    "format": "shp",
+                }
+            )
+            showcase = Showcase({"name": f"{name}-showcase"})
+            plan_writer.create_dataset_showcase(dataset, showcase, batch="1")
+        plan_writer.add_skips(
+            [{"reason": "ignored", "countryiso": "SDN", "title": "Old"}]
+        )
+        plan_writer.add_deletes([Dataset({"name": "lakes", "title": "Lakes"})])
+        summary = {
+            "create": 1,
+            "update": 1,
+            "skip": 1,
+            "delete": 1,
+            "capped": False,
+        }
+        assert plan_writer.get_summary() == summary
+        path = join(tmp_path, "plan.json")
+        plan_writer.write(path)
+        with open(path) as f:
+            plan = json.load(f)
+        assert plan["summary"] == summary
+        assert plan["actions"][0]["action"] == "update"
+        assert (
+            plan["actions"][0]["dataset"]["dataset_preview"] == "resource_id"
+        )
+        resources = plan["actions"][0]["dataset"]["resources"]
+        assert [x["url"] for x in resources] == ["http://xxx/roads.shp"]
+        assert plan["actions"][1]["showcase"] == {"name": "rivers-showcase"}
+        assert plan["actions"][2:] == [
+            {
+                "action": "skip",
+                "reason": "ignored",
+                "countryiso": "SDN",
+                "title": "Old",
+            },
+            {"action": "delete", "name": "lakes", "title": "Lakes"},
+        ]
+        path = join(tmp_path, "plan.jsonl")
+        plan_writer.write(path)
+        with open(path) as f:
+            lines = f.read().splitlines()
+        assert len(lines) == 5
+        assert json.loads(lines[0]) == dict(action="summary", **summary)
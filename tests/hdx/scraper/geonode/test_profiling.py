@@ -0,0 +1,51 @@
+"""Layer profiling Tests"""
+import json
+import time
+from os.path import exists, join
+
+from hdx.scraper.geonode.profiling import LayerProfiler
+
+
+def slow(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+class TestLayerProfiler:
+    def test_layer_profiler(self, tmp_path):
+        profiler = LayerProfiler(tmp_path, top_n=2)
+        for key, seconds in (("a", 0.01), ("b", 0.03), ("c", 0.02)):
+            layer_profile = profiler.start(key)
+            assert LayerProfiler.run(layer_profile, slow, seconds) == seconds
+            LayerProfiler.run(layer_profile, slow, 0)
+            LayerProfiler.finish(layer_profile)
+        assert LayerProfiler.run(None, slow, 0) == 0
+        LayerProfiler.finish(None)
+        slowest = profiler.get_slowest()
+        assert [x.key for x in slowest] == ["b", "c"]
+        assert slowest[0].seconds >= 0.03
+        assert len(slowest[0].profiles) == 2
+
+        profiler.write()
+        with open(join(tmp_path, "slowest_layers.json")) as f:
+            summary = json.load(f)
+        assert [x["key"] for x in summary] == ["b", "c"]
+        assert summary[0]["profile"] == "01_b.prof"
+        assert exists(join(tmp_path, "01_b.prof"))
+        with open(join(tmp_path, "collapsed_stacks.txt")) as f:
+            lines = f.read().splitlines()
+        stacks = dict(x.rsplit(" ", 1) for x in lines)
+        stack = "b;test_profiling.py:9:slow;<built-in_method_time.sleep>"
+        assert stack in stacks
+        assert int(stacks[stack]) >= 25000
+        assert all(x.split(";")[0] in ("b", "c") for x in stacks)
+        assert not any("_lsprof" in x for x in stacks)
+
+    def test_from_environment(self, monkeypatch, tmp_path):
+        monkeypatch.delenv("HDX_GEONODE_PROFILE", raising=False)
+        assert LayerProfiler.from_environment() is None
+        monkeypatch.setenv("HDX_GEONODE_PROFILE", str(tmp_path))
+        monkeypatch.setenv("HDX_GEONODE_PROFILE_TOP", "3")
+        profiler = LayerProfiler.from_environment()
+        assert profiler.output_folder == str(tmp_path)
+        assert profiler.top_n == 3
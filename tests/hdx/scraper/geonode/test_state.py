@@ -0,0 +1,20 @@
+"""Layer state store Tests"""
+from os.path import join
+
+from hdx.scraper.geonode.state import LayerStateStore
+
+
+class TestLayerStateStore:
+    def test_fingerprints(self, tmp_path):
+        path = join(tmp_path, "state.sqlite")
+        with LayerStateStore(path) as state_store:
+            assert state_store.get_fingerprint("abc") is None
+            state_store.set_fingerprint("abc", "123")
+            state_store.set_fingerprint("def", "456")
+            state_store.set_fingerprint("abc", "789")
+            assert state_store.get_fingerprint("abc") == "789"
+        with LayerStateStore(path) as state_store:
+            assert state_store.get_fingerprint("abc") == "789"
+            assert state_store.get_fingerprint("def") == "456"
+            state_store.delete_fingerprint("def")
+            assert state_store.get_fingerprint("def") is None
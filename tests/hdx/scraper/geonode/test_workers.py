@@ -0,0 +1,133 @@
+"""Worker utilities Tests"""
+import time
+from threading import Lock
+
+import pytest
+from hdx.utilities.downloader import Download
+
+from hdx.scraper.geonode.workers import (
+    RateLimiter,
+    SingleFlightCache,
+    ThreadLocalDownload,
+    WorkerPool,
+)
+
+
+class TestWorkers:
+    def test_rate_limiter(self):
+        rate_limiter = RateLimiter(50)
+        start = time.monotonic()
+        for _ in range(6):
+            rate_limiter.wait()
+        assert time.monotonic() - start >= 0.09
+
+    def test_worker_pool(self):
+        calls = list()
+        lock = Lock()
+
+        def call(key, number):
+            # Later calls finish quicker so would overtake earlier ones
+            time.sleep(0.01 * (5 - number))
+            with lock:
+                calls.append((key, number))
+            return number
+
+        with WorkerPool(4) as pool:
+            for number in range(5):
+                pool.submit("a", call, "a", number)
+                pool.submit(number, call, number, number)
+        assert [x[1] for x in calls if x[0] == "a"] == [0, 1, 2, 3, 4]
+        assert len(calls) == 10
+
+        calls = list()
+        pool = WorkerPool(2)
+        for number in range(3):
+            pool.submit(number, call, number, number)
+        pool.join()
+        assert len(calls) == 3
+        pool.submit(3, call, 3, 3)
+        pool.join()
+        assert len(calls) == 4
+        assert pool.wait() == [0, 1, 2, 3]
+
+        pool = WorkerPool(3, RateLimiter(1000))
+        futures = [pool.submit(x, call, x, x) for x in range(5)]
+        assert [x.result() for x in futures] == [0, 1, 2, 3, 4]
+        assert pool.wait() == [0, 1, 2, 3, 4]
+
+    def test_worker_pool_errors(self):
+        def call(number):
+            if number == 2:
+                raise ValueError("Bad number!")
+            return number
+
+        pool = WorkerPool()
+        assert pool.submit(1, call, 1).result() == 1
+        with pytest.raises(ValueError):
+            pool.submit(2, call, 2)
+        pool = WorkerPool(2)
+        for number in range(4):
+            pool.submit(number, call, number)
+        with pytest.raises(ValueError):
+            pool.wait()
+
+    def test_single_flight_cache(self):
+        calls = list()
+
+        def get_value():
+            calls.append(1)
+            time.sleep(0.05)
+            return len(calls)
+
+        cache = SingleFlightCache()
+        pool = WorkerPool(4)
+        for i in range(8):
+            pool.submit(i, cache.get, "a", get_value)
+        assert pool.wait() == [1] * 8
+        assert cache.get("a", get_value) == 1
+        cache = SingleFlightCache(ttl=0)
+        assert cache.get("a", get_value) == 2
+        assert cache.get("a", get_value) == 3
+
+        def fail():
+            raise ValueError("Failed!")
+
+        with pytest.raises(ValueError):
+            cache.get("b", fail)
+        assert cache.get("b", get_value) == 4
+
+    def test_thread_local_download(self, stub_geonode_url, slow_downloader):
+        class Wrapper:
+            def __init__(self, downloader):
+                self.downloader = downloader
+
+            def download(self, url, **kwargs):
+                return self.downloader.download(url, **kwargs)
+
+        wrapper = Wrapper(slow_downloader)
+        downloader = ThreadLocalDownload.wrap(wrapper)
+        assert ThreadLocalDownload.wrap(downloader) is downloader
+        copied = downloader.get_downloader()
+        assert copied is not wrapper
+        assert copied.downloader is not slow_downloader
+        assert copied.downloader.session is slow_downloader.session
+        assert downloader.get_downloader() is copied
+
+        def fetch(code):
+            url = f"{stub_geonode_url}/api/layers/?regions__code__in={code}"
+            response = downloader.download(url)
+            return response.json()["objects"][0]["title"]
+
+        codes = [f"C{i:02d}" for i in range(50)]
+        pool = WorkerPool(10)
+        for code in codes:
+            pool.submit(code, fetch, code)
+        assert pool.wait() == [f"{code} 0" for code in codes]
+
+        with Download(
+            user_agent="test", rate_limit={"calls": 100, "period": 1}
+        ) as rate_limited:
+            downloader = ThreadLocalDownload(rate_limited)
+            assert downloader.get_downloader() is None
+            response = downloader.download(f"{stub_geonode_url}/api/layers")
+            assert response.json()["objects"][0]["title"] == "ALL 0"